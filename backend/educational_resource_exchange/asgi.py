@@ -5,6 +5,21 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+To serve it, from backend/ (gunicorn.conf.py still applies):
+
+    ASYNC_ACTIONS=True gunicorn educational_resource_exchange.asgi:application \
+        -k uvicorn_worker.UvicornWorker --workers 2
+
+ASYNC_ACTIONS routes download, create and saved_resources to their
+async-native views (resources/async_views.py) and turns off persistent
+database connections, which Django does not support for async requests.
+Each uvicorn worker is one event loop: async views share it and sync
+views run in a thread per request, so one worker per core is enough.
+whitenoise and corsheaders are sync-only middleware, and Django adapts
+around them on every request; that costs little next to a storage call.
+The worker sends lifespan events, so the middleware below flushes the
+buffers on shutdown as well as gunicorn's worker_exit hook.
 """
 
 import os
@@ -13,4 +28,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educational_resource_exchange.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from resources.lifecycle import LifespanShutdownMiddleware  # noqa: E402  (needs the app registry)
+
+# Flush buffered download events and counts on lifespan.shutdown
+application = LifespanShutdownMiddleware(django_application)
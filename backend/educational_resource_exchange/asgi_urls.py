@@ -0,0 +1,15 @@
+"""
+URL configuration for ASGI deployments with ASYNC_ACTIONS on.
+
+The async-native download, create and saved_resources views
+(resources/async_views.py) answer their URLs ahead of the DRF router;
+everything else is routed as in urls.py.
+"""
+from django.urls import path, include
+
+from resources.urls import async_urlpatterns
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+] + sync_urlpatterns
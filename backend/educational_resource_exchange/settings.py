@@ -1,9 +1,6 @@
 import os
 import dj_database_url
 from pathlib import Path
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -14,10 +11,6 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'fallback-secret-key-for-local-
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False').strip() == 'True'
 
-
-# Add some debugging output to verify settings (remove after troubleshooting)
-print(f"DEBUG mode is: {DEBUG}")
-
 # Dynamically set allowed hosts
 ALLOWED_HOSTS = [
     'edushare-backend-okqs.onrender.com',
@@ -35,7 +28,6 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'cloudinary_storage',  # Must come before django.contrib.staticfiles
     'django.contrib.staticfiles',
-    'cloudinary',  # Must come after django.contrib.staticfiles
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -73,29 +65,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Serving under ASGI with the async-native download, create and saved_resources views
+# (see asgi.py and resources/async_views.py)
+ASYNC_ACTIONS = os.environ.get('ASYNC_ACTIONS', 'False').strip() == 'True'
+
 # Database Configuration
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
-        conn_max_age=600
+        # Under ASGI sync code runs in per-request threads, and persistent connections would pile up
+        conn_max_age=0 if ASYNC_ACTIONS else 600
     )
 }
 
-ROOT_URLCONF = 'educational_resource_exchange.urls'
+ROOT_URLCONF = 'educational_resource_exchange.asgi_urls' if ASYNC_ACTIONS else 'educational_resource_exchange.urls'
 
 # Static files configuration
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# First, set up direct Cloudinary configuration - needs to be before CLOUDINARY_STORAGE
-cloudinary.config( 
-    cloud_name = os.environ.get('CLOUDINARY_CLOUD_NAME'),
-    api_key = os.environ.get('CLOUDINARY_API_KEY'),
-    api_secret = os.environ.get('CLOUDINARY_API_SECRET'),
-    secure = True
-)
-
-# Then configure Django-Cloudinary-Storage
+# Django-Cloudinary-Storage configures the Cloudinary SDK from this when the
+# storage is first used (see resources/storage.py); nothing is imported here
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME'),
     'API_KEY': os.environ.get('CLOUDINARY_API_KEY'),
@@ -108,15 +98,9 @@ CLOUDINARY_STORAGE = {
     'UNSIGNED': True  # Makes uploads publicly accessible
 }
 
-# Print cloudinary config values for debugging (without secrets)
-print(f"CLOUDINARY_CLOUD_NAME: {os.environ.get('CLOUDINARY_CLOUD_NAME', 'Not set')}")
-print(f"CLOUDINARY_API_KEY set: {'Yes' if os.environ.get('CLOUDINARY_API_KEY') else 'No'}")
-print(f"CLOUDINARY_API_SECRET set: {'Yes' if os.environ.get('CLOUDINARY_API_SECRET') else 'No'}")
-
 # Set default file storage to Cloudinary in production
 # We'll always use Cloudinary in production for more reliability
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
-print("Using Cloudinary storage for media files")
 
 # Static files can use different storage based on environment
 if not DEBUG:
@@ -198,7 +182,7 @@ LOGGING = {
 # Rest of your existing configurations remain the same
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'resources.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -211,4 +195,124 @@ REST_FRAMEWORK = {
     ],
 }
 
-AUTH_USER_MODEL = 'resources.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'resources.User'
+
+# Caches. 'default' is per process. With several workers, set SHARED_CACHE_URL to a Redis
+# URL (needs the redis package): friend sets, token lookups and cached responses must be
+# invalidated in every worker, so they are only cached when a shared cache exists
+SHARED_CACHE_URL = os.environ.get('SHARED_CACHE_URL') or None
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if SHARED_CACHE_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SHARED_CACHE_URL,
+    }
+SHARED_CACHE_ALIAS = 'shared' if SHARED_CACHE_URL else None
+
+# Accepted-friend id sets (see resources/friends.py); cached only through a shared cache
+FRIEND_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'LOCAL_TIMEOUT': 30,
+    'CACHE_ALIAS': SHARED_CACHE_ALIAS,
+    'TIMEOUT': 3600,
+}
+
+# Download counting: buffer increments in memory and flush them in batches
+DOWNLOAD_COUNTER = {
+    'BUFFERED': os.environ.get('DOWNLOAD_COUNTER_BUFFERED', 'False').strip() == 'True',
+    'FLUSH_INTERVAL': float(os.environ.get('DOWNLOAD_COUNTER_FLUSH_INTERVAL', '5')),
+    'MAX_PENDING': 1000,
+}
+
+# Download events: 'sync' inserts in the request, 'queued' batches inserts in a background thread
+DOWNLOAD_EVENTS = {
+    'SINK': os.environ.get('DOWNLOAD_EVENTS_SINK', 'sync'),
+    'MAX_QUEUE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'PUT_TIMEOUT': 0.5,
+}
+# File URLs: built URLs are cached per process for TIMEOUT seconds
+FILE_URL_CACHE = {
+    'MAX_ENTRIES': 50000,
+    'TIMEOUT': int(os.environ.get('FILE_URL_CACHE_TIMEOUT', '300')),
+}
+
+# Resource file storage: 'cloudinary' (default) or 'local' for development and on-prem installs
+if os.environ.get('RESOURCE_STORAGE', 'cloudinary') == 'local':
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+    MEDIA_URL = '/media/'
+    RESOURCE_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': MEDIA_ROOT, 'base_url': MEDIA_URL},
+    }
+else:
+    RESOURCE_STORAGE = {'BACKEND': 'cloudinary_storage.storage.MediaCloudinaryStorage'}
+
+# Local file downloads. Behind nginx, set X_ACCEL_REDIRECT to an internal location
+# (location /protected/ { internal; alias <MEDIA_ROOT>/; }) so nginx sends the bytes
+FILE_DOWNLOADS = {
+    'CHUNK_SIZE': 64 * 1024,
+    'LINK_MAX_AGE': 300,
+    'X_ACCEL_REDIRECT': os.environ.get('FILE_DOWNLOADS_X_ACCEL_REDIRECT') or None,
+    'X_SENDFILE': os.environ.get('FILE_DOWNLOADS_X_SENDFILE', 'False').strip() == 'True',
+}
+
+# Resumable uploads: chunks are assembled in DIRECTORY before going to resource storage;
+# run `manage.py purge_upload_sessions` from cron to delete abandoned ones
+UPLOAD_SESSIONS = {
+    'DIRECTORY': os.environ.get('UPLOAD_SESSIONS_DIRECTORY', os.path.join(BASE_DIR, 'uploads-in-progress')),
+    'CHUNK_SIZE': 8 * 1024 * 1024,
+    'MAX_SIZE': 2 * 1024 * 1024 * 1024,
+    'EXPIRES_AFTER': 24 * 60 * 60,
+}
+
+# Resource list/detail response cache; on by default only with a shared cache (SHARED_CACHE_URL),
+# since invalidations must reach every worker
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', str(bool(SHARED_CACHE_ALIAS))).strip() == 'True',
+    'CACHE_ALIAS': SHARED_CACHE_ALIAS or 'default',
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '30')),
+}
+
+# Token authentication cache (see resources/authentication.py); cached only through a shared cache
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'LOCAL_TIMEOUT': 60,
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or SHARED_CACHE_ALIAS,
+    'TIMEOUT': 300,
+}
+
+# Trending scores (see resources/trending.py); run `manage.py refresh_trending` from cron
+TRENDING = {
+    'HALF_LIFE_HOURS': float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '72')),
+    'DOWNLOAD_WEIGHT': 1.0,
+    'RATING_WEIGHT': 2.0,
+    'BATCH_SIZE': 5000,
+}
+
+# Co-download recommendations (see resources/similarity.py); rebuild with `manage.py build_similar_resources`
+SIMILAR_RESOURCES = {
+    'TOP_K': 20,
+    'ITEM_CHUNK': int(os.environ.get('SIMILAR_RESOURCES_ITEM_CHUNK', '2000')),
+    'MAX_BASKET': 500,
+    'MIN_CO_DOWNLOADS': 2,
+}
+
+# Friend suggestions from the in-memory friendship graph (see resources/social_graph.py)
+FRIEND_SUGGESTIONS = {
+    'MAX_WORK': 20000,
+    'REBUILD_INTERVAL': 300,
+    'INSTITUTION_WEIGHT': 2,
+    'MAX_CANDIDATES': 500,
+}
+
+# Friends' activity feed, fan-out on write with fan-in for prolific uploaders (see resources/feed.py)
+ACTIVITY_FEED = {
+    'PROLIFIC_UPLOADS': int(os.environ.get('FEED_PROLIFIC_UPLOADS', '20')),
+    'PROLIFIC_WINDOW_DAYS': 7,
+    'MAX_FANOUT': 2000,
+    'BACKFILL': 20,
+}
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educational_resource_exchange.settings')
 
 application = get_wsgi_application()
+
+from resources.lifecycle import shutdown  # noqa: E402  (needs the app registry)
+
+# WSGI has no shutdown event; flush buffered download events and counts at exit
+atexit.register(shutdown)
@@ -0,0 +1,7 @@
+# gunicorn.conf.py - picked up automatically when gunicorn starts from backend/
+
+
+def worker_exit(server, worker):
+    # Write buffered download events and counts before the worker goes away
+    from resources.lifecycle import shutdown
+    shutdown()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ResourcesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resources'
+
+    def ready(self):
+        # Connect the model signal receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,165 @@
+# resources/async_views.py
+"""
+Async-native download, create and saved_resources.
+
+Under ASGI a sync view holds a thread for the whole request. That includes
+the time it spends waiting on storage: a Cloudinary upload in create, or
+building file URLs in download and saved_resources. These views await
+storage through storage.asave() and aurl() instead, and query through the
+async ORM, so a worker can serve other requests while they wait.
+
+The views answer the same URLs with the same responses as the
+ResourceViewSet and UserViewSet actions. asgi_urls.py routes them ahead of
+the DRF router when ASYNC_ACTIONS is on. DRF views are sync only, so these
+views still run DRF authentication, request parsing and serialization
+through sync_to_async. Files are resolved before rendering and passed to
+the serializer as file_urls, so rendering never waits on storage.
+
+Django's async ORM still runs each query in the request's sync thread, so
+the gain is in the storage waits, which is where the time goes.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .counters import increment_download_count
+from .events import get_download_sink
+from .file_urls import aresolve_many
+from .friends import get_friend_ids
+from .models import Resource, User
+from .serializers import ResourceSerializer
+from .storage import asave, serves_locally
+from .streaming import sign_link
+from .views import ResourceViewSet, annotate_viewer_state, visible_resources
+
+# GET resources/ shares its URL with the async create and stays on the viewset
+resource_list = ResourceViewSet.as_view({'get': 'list'})
+
+
+class AsyncAPIView(View):
+    """
+    The parts of APIView these views need: DRF authentication and parsers, the
+    IsAuthenticated check, and DRF's JSON and {"detail": ...} error responses
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # SessionAuthentication enforces CSRF itself, as with APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+        try:
+            method = request.method.lower()
+            if method not in self.http_method_names or not hasattr(self, method):
+                raise exceptions.MethodNotAllowed(request.method)
+            user = await sync_to_async(lambda: request.user)()
+            if not (user and user.is_authenticated):
+                raise exceptions.NotAuthenticated()
+            return await getattr(self, method)(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+    def error_response(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # Same rule as APIView.handle_exception: 401 only when a challenge can be sent
+            authenticators = self.request.authenticators
+            challenge = authenticators[0].authenticate_header(self.request) if authenticators else None
+            if challenge:
+                headers['WWW-Authenticate'] = challenge
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.render(data, exc.status_code, headers)
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(JSONRenderer().render(data), status=status_code,
+                            content_type='application/json', headers=headers)
+
+
+def _record_download(user_id, resource_id):
+    # Inline or queued (events.py), counted directly or buffered (counters.py), as in the sync action
+    get_download_sink().record(user_id, resource_id)
+    increment_download_count(resource_id)
+
+
+class ResourceDownloadView(AsyncAPIView):
+    """POST resources/<pk>/download/ (ResourceViewSet.download)"""
+    http_method_names = ['post', 'options']
+
+    async def post(self, request, pk):
+        user = request.user
+        friend_ids = await sync_to_async(get_friend_ids)(user.id)
+        try:
+            resource = await visible_resources(user, friend_ids).aget(pk=pk)
+        except Resource.DoesNotExist:
+            raise exceptions.NotFound('No Resource matches the given query.')
+
+        await sync_to_async(_record_download)(user.id, resource.pk)
+
+        if serves_locally(resource.file.storage):
+            url = reverse('resource-file', kwargs={'pk': resource.pk})
+            download_url = request.build_absolute_uri(f'{url}?token={sign_link(resource)}')
+        else:
+            download_url = (await aresolve_many([resource.file]))[resource.file.name]
+        return self.render({'download_url': download_url})
+
+
+class ResourceCollectionView(AsyncAPIView):
+    """POST resources/ (ResourceViewSet.create) with the upload awaited; GET is the viewset's list"""
+    http_method_names = ['get', 'post', 'options']
+
+    async def get(self, request):
+        return await sync_to_async(resource_list)(request._request)
+
+    async def post(self, request):
+        data = await sync_to_async(lambda: request.data)()
+        serializer = ResourceSerializer(data=data, context={'request': request})
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        fields = dict(serializer.validated_data)
+        upload = fields.pop('file')
+        file_field = Resource._meta.get_field('file')
+        # What FieldFile.save() does during the INSERT, awaited up front
+        name = await asave(file_field.storage, file_field.generate_filename(None, upload.name), upload,
+                           max_length=file_field.max_length)
+        resource = await Resource.objects.acreate(user=request.user, file=name, **fields)
+
+        file_urls = await aresolve_many([resource.file])
+        data = await sync_to_async(lambda: ResourceSerializer(
+            resource, context={'request': request, 'file_urls': file_urls}).data)()
+        return self.render(data, status.HTTP_201_CREATED)
+
+
+class SavedResourcesView(AsyncAPIView):
+    """GET users/<pk>/saved_resources/ (UserViewSet.saved_resources)"""
+    http_method_names = ['get', 'options']
+
+    async def get(self, request, pk):
+        if not await User.objects.filter(pk=pk).aexists():
+            raise exceptions.NotFound('No User matches the given query.')
+        if request.user.id != pk:
+            raise exceptions.PermissionDenied("You cannot view another user's saved resources")
+
+        resources = [resource async for resource in annotate_viewer_state(
+            Resource.objects.filter(saved_by__user_id=pk).select_related('user'), request.user
+        ).order_by('-saved_by__saved_at', '-saved_by__id')]
+        file_urls = await aresolve_many(resource.file for resource in resources)
+        data = await sync_to_async(lambda: ResourceSerializer(
+            resources, many=True, context={'file_urls': file_urls}).data)()
+        return self.render(data)
@@ -0,0 +1,145 @@
+# resources/authentication.py
+"""
+Token authentication with a token -> user cache.
+
+DRF's TokenAuthentication joins authtoken_token to the user table on every
+request. When TOKEN_AUTH_CACHE['CACHE_ALIAS'] names a cache every worker
+shares, CachedTokenAuthentication keeps the result there, with a
+per-process LRU in front of it for LOCAL_TIMEOUT seconds, so most requests
+authenticate without a query.
+
+Users are cached pickled and rebuilt for every request, so a view that
+changes request.user never touches another request's copy. signals.py
+drops a user's entries when one of their tokens is deleted or the user
+is saved or deleted. That covers logouts, deactivation and profile edits.
+Dropping an entry bumps that token's generation number in the shared
+cache. Shared entries are keyed by it and a process checks it before
+trusting its own copy, so every worker sharing the cache stops accepting
+the token at once, at the price of one cache read per request.
+
+Without a shared alias nothing is cached. A per-process copy could only
+be dropped by the worker that handled the change, and the others would
+keep accepting a revoked token.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,    # tokens kept in each process
+    'LOCAL_TIMEOUT': 60,     # seconds a process trusts its own copy
+    'CACHE_ALIAS': None,     # shared Django cache; None turns caching off
+    'TIMEOUT': 300,          # seconds entries live in the shared cache
+}
+
+
+def _config(key):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(key, DEFAULTS[key])
+
+
+class TokenUserCache:
+    key_prefix = 'auth-token'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _shared(self):
+        alias = _config('CACHE_ALIAS')
+        return caches[alias] if alias else None
+
+    def _key(self, token_key):
+        # Never use the raw token as a cache key; cache backends may log or expose keys
+        return f'{self.key_prefix}:{hashlib.sha256(token_key.encode()).hexdigest()}'
+
+    def _generation(self, shared, key):
+        generation = shared.get(f'{key}:gen')
+        if generation is None:
+            # Start from the clock so an evicted counter never repeats an old value
+            shared.add(f'{key}:gen', time.time_ns(), None)
+            generation = shared.get(f'{key}:gen')
+        return generation
+
+    def get(self, token_key):
+        """The cached (user, token) pair for a token key, or None"""
+        shared = self._shared()
+        if shared is None:
+            return None
+        key = self._key(token_key)
+        now = time.monotonic()
+        generation = self._generation(shared, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now and entry[2] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(entry[0])
+            self.misses += 1
+        payload = shared.get(f'{key}:{generation}')
+        if payload is None:
+            return None
+        self._store(key, payload, generation, now)
+        return pickle.loads(payload)
+
+    def set(self, token_key, user, token):
+        shared = self._shared()
+        if shared is None:
+            return
+        key = self._key(token_key)
+        payload = pickle.dumps((user, token))
+        generation = self._generation(shared, key)
+        self._store(key, payload, generation, time.monotonic())
+        shared.set(f'{key}:{generation}', payload, _config('TIMEOUT'))
+
+    def _store(self, key, payload, generation, now):
+        with self._lock:
+            self._entries[key] = (payload, now + _config('LOCAL_TIMEOUT'), generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > _config('MAX_ENTRIES'):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *token_keys):
+        keys = [self._key(token_key) for token_key in token_keys]
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        shared = self._shared()
+        if shared:
+            for key in keys:
+                try:
+                    shared.incr(f'{key}:gen')
+                except ValueError:
+                    shared.add(f'{key}:gen', time.time_ns(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+token_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication backed by token_cache"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
+
+
+def invalidate_user_tokens(user_id):
+    from rest_framework.authtoken.models import Token
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    if keys:
+        token_cache.invalidate(*keys)
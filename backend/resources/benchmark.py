@@ -0,0 +1,406 @@
+# resources/benchmark.py
+"""
+Endpoint latency benchmarks.
+
+run() drives the GET routes in budgets.ENDPOINT_BUDGETS with concurrent
+in-process clients and records latency percentiles, throughput and queries
+per request. The response cache is off unless asked for, so the numbers
+measure the views rather than cache hits. Each route is measured runs
+times and reported as the median of those runs, with the spread between
+them as its noise.
+
+compare() checks a run against a baseline written by an earlier run and
+lists every route that got slower (or ran more queries) than the
+tolerance allows, once the slowdown also exceeds the noise of both runs.
+The benchmark_endpoints command wires both up against a synthetic dataset
+from synthetic.py. DEFAULT_BASELINE is the checked-in baseline; its meta
+records the options and the hardware() it was taken with, and latencies
+only compare on similar hardware.
+
+compare_async_actions() runs download, create and saved_resources through
+Django's async request handler, once routed to the sync viewsets and once
+to async_views.py, against SlowStorage. That is a local stand-in for a
+remote storage service.
+"""
+import asyncio
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from asgiref.sync import sync_to_async
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .budgets import ENDPOINT_BUDGETS
+
+DEFAULT_TOLERANCE = 0.25
+# Slower than the baseline by less than this is noise, whatever the tolerance says
+MIN_REGRESSION_MS = 2.0
+DEFAULT_BASELINE = Path(__file__).with_name('benchmark_baseline.json')
+
+
+@dataclass
+class RouteResult:
+    route: str
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    throughput: float         # requests per second across all clients
+    queries: float            # mean queries per request, None when not counted
+    noise_ms: float = 0.0     # widest spread of a percentile between repeated runs
+
+    def line(self):
+        return (f'{self.route:24s} p50 {self.p50_ms:7.1f} ms  p95 {self.p95_ms:7.1f} ms  '
+                f'p99 {self.p99_ms:7.1f} ms  {self.throughput:7.1f} req/s'
+                + (f'  {self.queries:5.1f} queries' if self.queries is not None else '')
+                + (f'  noise {self.noise_ms:.1f} ms' if self.noise_ms else '')
+                + (f'  {self.errors} errors' if self.errors else ''))
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class BenchmarkTargets:
+    """Picks the objects that fill {pk} in detail routes from whatever data is loaded"""
+
+    def __init__(self):
+        from .friends import get_friend_ids
+        from .models import User, Resource, Friendship, Download
+        public = User.objects.filter(is_private=False)
+        # A well-connected public user makes visibility filtering do real work
+        self.viewer = max(public[:200], key=lambda u: len(get_friend_ids(u.id)))
+        friend_ids = get_friend_ids(self.viewer.id)
+        self.friend = User.objects.filter(id__in=friend_ids).first() or self.viewer
+        self.other_user = public.exclude(id=self.viewer.id).first() or self.viewer
+        self.resource = Resource.objects.filter(user__is_private=False).order_by('-download_count').first()
+        self.friendship = Friendship.objects.filter(Q(requester=self.viewer) | Q(addressee=self.viewer)).first()
+        self.download = Download.objects.filter(user=self.viewer).first()
+
+    def pk_for(self, target):
+        return getattr(self, target).pk
+
+
+def _client(user, token=None):
+    client = APIClient()
+    if token is None:
+        client.force_authenticate(user)
+    else:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    return client
+
+
+def _measure_route(budget, targets, requests, concurrency, token=None):
+    kwargs = {'pk': targets.pk_for(budget.target)} if budget.target else {}
+    url = reverse(budget.route, kwargs=kwargs)
+    params = dict(budget.data, paginate='false')
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def drive(count):
+        client = _client(targets.viewer, token)
+        latencies, queries, errors = [], [0], 0
+
+        def counter(execute, sql, params_, many, context):
+            queries[0] += 1
+            return execute(sql, params_, many, context)
+
+        with connection.execute_wrapper(counter):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = client.get(url, params, secure=True)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code >= 400
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+        return latencies, queries[0], errors
+
+    # Warm caches (friend sets, compiled URL patterns) the way a running server would have them
+    drive(1)
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [drive(requests)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(drive, per_client))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for samples, _, _ in results for ms in samples]
+    return _route_result(budget.route, latencies, sum(errors for _, _, errors in results), elapsed,
+                         sum(count for _, count, _ in results) / len(latencies))
+
+
+def _route_result(route, latencies, errors, elapsed, queries):
+    return RouteResult(
+        route=route,
+        requests=len(latencies),
+        errors=errors,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+        throughput=len(latencies) / elapsed if elapsed else 0.0,
+        queries=queries,
+    )
+
+
+PERCENTILES = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def _median_result(runs):
+    """One RouteResult for repeated runs of a route: medians, with their spread as noise"""
+    if len(runs) == 1:
+        return runs[0]
+    merged = {key: statistics.median(getattr(result, key) for result in runs)
+              for key in PERCENTILES + ('throughput', 'queries')}
+    return RouteResult(
+        route=runs[0].route,
+        requests=sum(result.requests for result in runs),
+        errors=sum(result.errors for result in runs),
+        noise_ms=max(max(getattr(result, key) for result in runs) - min(getattr(result, key) for result in runs)
+                     for key in PERCENTILES),
+        **merged,
+    )
+
+
+def run(requests=200, concurrency=4, routes=None, targets=None, progress=None, runs=1, response_cache=False):
+    """
+    Benchmark every GET route (or those named in routes) runs times each; returns
+    {route: RouteResult}. response_cache=True measures with the response cache on.
+    """
+    targets = targets or BenchmarkTargets()
+    results = {}
+    with override_settings(RESPONSE_CACHE={'ENABLED': response_cache}):
+        for budget in ENDPOINT_BUDGETS:
+            if budget.method != 'get' or not budget.benchmark or (routes and budget.route not in routes):
+                continue
+            results[budget.route] = _median_result(
+                [_measure_route(budget, targets, requests, concurrency) for _ in range(runs)])
+            if progress:
+                progress(results[budget.route])
+    return results
+
+
+def hardware():
+    """The machine a run was taken on, recorded in its meta"""
+    return {'platform': platform.platform(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'python': platform.python_version()}
+
+
+def to_json(results, **meta):
+    return {'meta': meta, 'routes': {route: asdict(result) for route, result in results.items()}}
+
+
+def mismatched_meta(meta, baseline):
+    """Return one message per recorded option or hardware detail that differs from the baseline's"""
+    before = baseline.get('meta', {})
+    mismatches = [f'{key}: {meta[key]} vs baseline {before[key]}'
+                  for key in meta if key != 'hardware' and key in before and meta[key] != before[key]]
+    if 'hardware' in meta and before.get('hardware') not in (None, meta['hardware']):
+        mismatches.append(f"hardware: {meta['hardware']} vs baseline {before['hardware']}")
+    return mismatches
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return one message per route that regressed past the tolerance"""
+    regressions = []
+    for route, result in results.items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            continue
+        # Either median may be off by its own run-to-run spread; baselines written
+        # before noise was recorded count as noiseless
+        margin = max(MIN_REGRESSION_MS, result.noise_ms + before.get('noise_ms', 0.0))
+        for key in PERCENTILES:
+            now, then = getattr(result, key), before[key]
+            if now > then * (1 + tolerance) and now - then > margin:
+                regressions.append(f'{route}: {key} {now:.1f} ms vs baseline {then:.1f} ms')
+        if result.queries > before['queries']:
+            regressions.append(f'{route}: {result.queries:.1f} queries vs baseline {before["queries"]:.1f}')
+        if result.errors:
+            regressions.append(f'{route}: {result.errors} failed requests')
+    return regressions
+
+
+def compare_authentication(requests=200, concurrency=4, route='resource-list', targets=None):
+    """
+    Run one route with real token headers under DRF's TokenAuthentication and
+    under CachedTokenAuthentication; returns {class name: RouteResult}.
+    """
+    from unittest import mock
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from .authentication import CachedTokenAuthentication, token_cache
+    from .views import ResourceViewSet, UserViewSet
+
+    targets = targets or BenchmarkTargets()
+    token, _ = Token.objects.get_or_create(user=targets.viewer)
+    budget = next(b for b in ENDPOINT_BUDGETS if b.route == route)
+    results = {}
+    for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+        token_cache.clear()
+        # View classes read DEFAULT_AUTHENTICATION_CLASSES once, at import
+        with mock.patch.object(ResourceViewSet, 'authentication_classes', [auth_class]), \
+                mock.patch.object(UserViewSet, 'authentication_classes', [auth_class]):
+            results[auth_class.__name__] = _measure_route(budget, targets, requests, concurrency, token.key)
+    return results
+
+
+class SlowStorage(Storage):
+    """
+    Stand-in for a remote storage service: files are kept in a local directory,
+    but every save and URL costs latency seconds. The sync methods block for it;
+    asave() and aurl() await it, as a client with an async API would.
+    """
+
+    def __init__(self, location, latency=0.05):
+        self.local = FileSystemStorage(location=location, base_url='https://files.example.test/')
+        self.latency = latency
+
+    def _save(self, name, content):
+        time.sleep(self.latency)
+        return self.local._save(name, content)
+
+    def _open(self, name, mode='rb'):
+        return self.local._open(name, mode)
+
+    def exists(self, name):
+        return self.local.exists(name)
+
+    def delete(self, name):
+        self.local.delete(name)
+
+    def size(self, name):
+        return self.local.size(name)
+
+    def url(self, name):
+        time.sleep(self.latency)
+        return self.local.url(name)
+
+    async def asave(self, name, content, max_length=None):
+        await asyncio.sleep(self.latency)
+        return await sync_to_async(self.local.save, thread_sensitive=False)(name, content, max_length)
+
+    async def aurl(self, name):
+        await asyncio.sleep(self.latency)
+        return self.local.url(name)
+
+
+def _upload_body():
+    """A multipart resource upload as (body, content type)"""
+    body = encode_multipart(BOUNDARY, {
+        'title': 'Benchmark upload', 'description': 'Written by compare_async_actions',
+        'resource_type': 'worksheet', 'subject': 'Math', 'grade_level': '6-8',
+        'file': SimpleUploadedFile('benchmark.txt', b'benchmark upload'),
+    })
+    return body, MULTIPART_CONTENT
+
+
+async def _asgi_request(app, method, path, token, body=b'', content_type=None):
+    """Send one HTTPS request straight to an ASGI application; returns the response status"""
+    headers = [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode())]
+    if content_type:
+        headers += [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'https', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 0), 'server': ('testserver', 443),
+    }
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    statuses = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        # The client never disconnects; Django stops listening once it has responded
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+async def _measure_asgi(route, request, requests, concurrency):
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    latencies, errors = [], [0]
+
+    async def drive(count, samples):
+        for _ in range(count):
+            start = time.perf_counter()
+            status = await request()
+            if samples is not None:
+                samples.append((time.perf_counter() - start) * 1000)
+            errors[0] += status >= 400
+
+    await drive(1, None)
+    errors[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(drive(count, latencies) for count in per_client))
+    return _route_result(route, latencies, errors[0], time.perf_counter() - started, None)
+
+
+def _run_event_loop(coroutine):
+    # On a fresh thread, as under uvicorn: asgiref must not find an outer async_to_sync
+    # (the test client's, say) and queue every sync view behind its thread
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+
+def compare_async_actions(requests=100, concurrency=16, latency=0.05, targets=None):
+    """
+    Run download, create and saved_resources with concurrent clients through
+    Django's ASGI handler, routed to the sync viewsets and to async_views.py, with
+    SlowStorage behind every file and the file URL cache off; returns
+    {'<route> (sync|async)': RouteResult}.
+    """
+    from unittest import mock
+    from django.core.asgi import get_asgi_application
+    from rest_framework.authtoken.models import Token
+    from .models import Resource
+
+    targets = targets or BenchmarkTargets()
+    token = Token.objects.get_or_create(user=targets.viewer)[0].key
+    download = reverse('resource-download', kwargs={'pk': targets.resource.pk})
+    create = reverse('resource-list')
+    saved = reverse('user-saved-resources', kwargs={'pk': targets.viewer.pk})
+
+    location = tempfile.mkdtemp()
+    results = {}
+    try:
+        # Every URL is built per request, the way short-lived signed URLs would be
+        with mock.patch.object(Resource._meta.get_field('file'), 'storage', SlowStorage(location, latency)), \
+                override_settings(FILE_URL_CACHE={'TIMEOUT': 0}):
+            for mode, urlconf in (('sync', 'educational_resource_exchange.urls'),
+                                  ('async', 'educational_resource_exchange.asgi_urls')):
+                with override_settings(ROOT_URLCONF=urlconf):
+                    app = get_asgi_application()
+                    routes = {
+                        'resource-download': lambda: _asgi_request(app, 'POST', download, token),
+                        'resource-create': lambda: _asgi_request(app, 'POST', create, token, *_upload_body()),
+                        'user-saved-resources': lambda: _asgi_request(app, 'GET', saved, token),
+                    }
+                    for route, request in routes.items():
+                        name = f'{route} ({mode})'
+                        results[name] = _run_event_loop(_measure_asgi(name, request, requests, concurrency))
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+    return results
@@ -0,0 +1,277 @@
+# resources/budgets.py
+"""
+Per-endpoint SQL budgets.
+
+ENDPOINT_BUDGETS maps every named API route, custom @actions included,
+to the most queries and database milliseconds one representative request
+may spend against the seeded dataset. A test fails when a route has no
+entry, so new endpoints cannot slip past the budget. measure() runs a request while recording every query and
+attributing it to the serializer field that was being rendered at the time,
+so an overrun report names the method field (or related field) responsible.
+
+The tests in tests.py check every entry; set QUERY_BUDGET_SCALE to run them
+against a bigger dataset.
+"""
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from rest_framework import fields as drf_fields, relations
+
+DEFAULT_SCALE = 20
+# The viewer (budget_user_1) can log in with this password
+VIEWER_PASSWORD = 'budget-password'
+
+
+@dataclass
+class Budget:
+    route: str
+    queries: int
+    db_ms: float = 50.0
+    method: str = 'get'
+    # Which seeded object fills the {pk} of a detail route (see BudgetDataset.pk_for)
+    target: str = None
+    data: dict = field(default_factory=dict)
+    # BudgetDataset attribute listing the resource ids a bulk route is sent
+    ids: str = None
+    # BudgetDataset attribute of the user making the request; None is anonymous
+    user: str = 'viewer'
+    # Whether benchmark.run() times it; off for routes that need data a benchmark cannot assume
+    benchmark: bool = True
+
+
+# Lists are measured unpaginated, the way the frontend still calls them. Visibility
+# checks may add one query when the viewer's friend set is not cached yet.
+ENDPOINT_BUDGETS = [
+    Budget('user-list', queries=1),
+    Budget('user-detail', queries=1, target='other_user'),
+    Budget('user-resources', queries=3, target='friend'),
+    Budget('user-ratings', queries=2, target='viewer'),
+    Budget('user-downloads', queries=2, target='viewer'),
+    Budget('user-friends', queries=3, target='viewer'),
+    Budget('user-saved-resources', queries=2, target='viewer'),
+    Budget('user-suggestions', queries=6, target='viewer'),
+    Budget('resource-list', queries=2),
+    Budget('resource-detail', queries=2, target='resource'),
+    Budget('resource-ratings', queries=3, target='resource'),
+    Budget('resource-trending', queries=2),
+    Budget('resource-similar', queries=2, target='resource'),
+    Budget('resource-download', queries=5, method='post', target='resource'),
+    Budget('resource-rate', queries=12, method='post', target='resource', data={'rating': 4}),
+    Budget('resource-save', queries=5, method='post', target='resource'),
+    Budget('resource-unsave', queries=5, method='post', target='saved_resource'),
+    Budget('resource-bulk-save', queries=5, method='post', ids='unsaved_ids'),
+    Budget('resource-bulk-unsave', queries=5, method='post', ids='saved_ids'),
+    Budget('resource-bulk-download', queries=7, method='post', ids='unsaved_ids'),
+    Budget('friendship-list', queries=1),
+    Budget('friendship-accept', queries=5, method='post', target='pending_friendship'),
+    Budget('friendship-reject', queries=3, method='post', target='pending_friendship'),
+    Budget('friendship-detail', queries=1, target='friendship'),
+    Budget('downloads-list', queries=1),
+    Budget('downloads-detail', queries=1, target='download'),
+    Budget('feed-list', queries=3),
+    # Redirects to the storage URL, or streams the bytes when files are stored locally
+    Budget('resource-file', queries=2, target='resource', benchmark=False),
+    Budget('resource-cache-stats', queries=0, user='admin', benchmark=False),
+    Budget('uploads-list', queries=1, method='post', data={
+        'filename': 'budget.pdf', 'size': 10, 'title': 'Budget upload', 'description': 'Budget fixture',
+        'resource_type': 'worksheet', 'subject': 'Math', 'grade_level': '6-8',
+    }),
+    Budget('uploads-detail', queries=1, target='upload_session', benchmark=False),
+    Budget('auth-login', queries=5, method='post', user=None,
+           data={'username': 'budget_user_1', 'password': VIEWER_PASSWORD}),
+    # Last: it deletes the viewer's downloads
+    Budget('downloads-clear', queries=1, method='delete'),
+]
+
+
+def dataset_scale():
+    return int(os.environ.get('QUERY_BUDGET_SCALE', DEFAULT_SCALE))
+
+
+class BudgetDataset:
+    """
+    A deterministic dataset sized by scale (number of users): every user
+    uploads three resources, rates and downloads a handful and has a few
+    friends, so list endpoints return many rows and N+1 patterns show up.
+    """
+
+    def __init__(self, scale=None, seed=1014):
+        from django.contrib.auth.hashers import make_password
+        from .models import User, Resource, Rating, Download, Friendship, SavedResource, UploadSession
+        from .search import rebuild_index
+        from . import similarity, trending
+        self.scale = scale or dataset_scale()
+        rng = random.Random(seed)
+
+        users = User.objects.bulk_create([
+            User(username=f'budget_user_{i}', institution=f'School {i % 7}', is_private=(i % 4 == 0))
+            for i in range(self.scale)
+        ])
+        self.viewer, self.other_user = users[1], users[2]
+        User.objects.filter(pk=self.viewer.pk).update(password=make_password(VIEWER_PASSWORD))
+        self.admin = User.objects.create(username='budget_admin', is_staff=True)
+
+        subjects = ['Math', 'Science', 'Art', 'Music']
+        resources = Resource.objects.bulk_create([
+            Resource(user=owner, title=f'Resource {owner.id}-{n}', description='Budget fixture',
+                     file=f'resources/budget_{owner.id}_{n}.txt', resource_type='worksheet',
+                     subject=subjects[(owner.id + n) % len(subjects)], grade_level='6-8')
+            for owner in users for n in range(3)
+        ])
+        rebuild_index()
+
+        pairs = set()
+        for user in users:
+            for other in rng.sample(users, min(4, len(users))):
+                if other.id != user.id and (other.id, user.id) not in pairs:
+                    pairs.add((user.id, other.id))
+        Friendship.objects.bulk_create([
+            Friendship(requester_id=a, addressee_id=b, status='accepted') for a, b in pairs
+        ])
+        friend_ids = {b for a, b in pairs if a == self.viewer.id} | {a for a, b in pairs if b == self.viewer.id}
+        self.friend = next(u for u in users if u.id in friend_ids) if friend_ids else self.viewer
+
+        others = [r for r in resources if r.user_id != self.viewer.id]
+        public_ids = {u.id for u in users if not u.is_private}
+        ratings, downloads, saved = [], [], []
+        for user in users:
+            for resource in rng.sample(others, min(5, len(others))):
+                if resource.user_id != user.id:
+                    ratings.append(Rating(user=user, resource=resource, rating=rng.randint(1, 5)))
+                    downloads.append(Download(user=user, resource=resource))
+        for resource in [r for r in others if r.user_id in public_ids][:10]:
+            saved.append(SavedResource(user=self.viewer, resource=resource))
+        Rating.objects.bulk_create(ratings, ignore_conflicts=True)
+        Download.objects.bulk_create(downloads)
+        SavedResource.objects.bulk_create(saved, ignore_conflicts=True)
+        trending.refresh()
+        # A small dataset has few repeated pairs; keep every pair so resources have neighbours
+        similarity.build({'MIN_CO_DOWNLOADS': 1})
+
+        saved_ids = {s.resource_id for s in saved}
+        self.resource = next(r for r in others if r.user_id in public_ids and r.id not in saved_ids)
+        self.saved_resource = saved[0].resource
+        self.saved_ids = [s.resource_id for s in saved[1:]]
+        self.unsaved_ids = [r.id for r in others if r.user_id in public_ids and r.id not in saved_ids][:10]
+        self.pending_requester = users[3]
+        Friendship.objects.filter(requester=self.pending_requester, addressee=self.viewer).delete()
+        Friendship.objects.filter(requester=self.viewer, addressee=self.pending_requester).delete()
+        self._pending_requester_id = self.pending_requester.id
+        self.friendship = Friendship.objects.filter(Q(requester=self.viewer) | Q(addressee=self.viewer)).first()
+        self.download = Download.objects.filter(user=self.viewer).first()
+        self.upload_session = UploadSession.objects.create(
+            user=self.viewer, filename='budget.pdf', size=10, chunk_size=4,
+            resource_data={'title': 'Budget upload', 'description': 'Budget fixture', 'resource_type': 'worksheet',
+                           'subject': 'Math', 'grade_level': '6-8'},
+        )
+
+    def pk_for(self, target):
+        from .models import Friendship
+        if target == 'pending_friendship':
+            friendship, _ = Friendship.objects.update_or_create(
+                requester_id=self._pending_requester_id, addressee=self.viewer,
+                defaults={'status': 'pending'},
+            )
+            return friendship.pk
+        return getattr(self, target).pk
+
+
+@dataclass
+class Measurement:
+    route: str
+    queries: int
+    db_ms: float
+    status_code: int
+    # label -> (query count, milliseconds); labels are Serializer.field or '<view>'
+    by_source: dict
+
+    def overrun(self, budget):
+        return self.queries > budget.queries or self.db_ms > budget.db_ms
+
+    def report(self, budget):
+        lines = [
+            f'{self.route}: {self.queries} queries (budget {budget.queries}), '
+            f'{self.db_ms:.1f} ms (budget {budget.db_ms:.0f} ms)'
+        ]
+        for label, (count, ms) in sorted(self.by_source.items(), key=lambda item: -item[1][0]):
+            lines.append(f'    {count:4d} queries {ms:7.1f} ms  {label}')
+        return '\n'.join(lines)
+
+
+_active = threading.local()
+
+
+def _attributed(original):
+    """Wrap a field method so queries it runs are attributed to that field"""
+    def wrapper(self, *args, **kwargs):
+        parent = type(self.parent).__name__ if self.parent is not None else '?'
+        _active.stack.append(f'{parent}.{self.field_name}')
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            _active.stack.pop()
+    return wrapper
+
+
+# Field hooks that run while a serializer renders one field of one object
+ATTRIBUTED_METHODS = [
+    (drf_fields.Field, 'get_attribute'),
+    (relations.RelatedField, 'get_attribute'),
+    (drf_fields.SerializerMethodField, 'to_representation'),
+]
+
+
+@contextmanager
+def record_queries():
+    """Collect (label, milliseconds) for every query run in this thread"""
+    records = []
+    _active.stack = []
+    originals = [(cls, name, cls.__dict__[name]) for cls, name in ATTRIBUTED_METHODS]
+
+    def recorder(execute, sql, params, many, context):
+        label = _active.stack[-1] if _active.stack else '<view>'
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            records.append((label, (time.perf_counter() - start) * 1000))
+
+    for cls, name, original in originals:
+        setattr(cls, name, _attributed(original))
+    try:
+        with connection.execute_wrapper(recorder):
+            yield records
+    finally:
+        for cls, name, original in originals:
+            setattr(cls, name, original)
+        _active.stack = None
+
+
+def measure(client, budget, dataset):
+    kwargs = {'pk': dataset.pk_for(budget.target)} if budget.target else {}
+    url = reverse(budget.route, kwargs=kwargs)
+    params = dict(budget.data)
+    if budget.ids:
+        params['ids'] = ','.join(str(pk) for pk in getattr(dataset, budget.ids))
+    if budget.method == 'get':
+        params.setdefault('paginate', 'false')
+    with record_queries() as records:
+        response = getattr(client, budget.method)(url, params)
+    counts, times = Counter(), defaultdict(float)
+    for label, ms in records:
+        counts[label] += 1
+        times[label] += ms
+    return Measurement(
+        route=budget.route,
+        queries=len(records),
+        db_ms=sum(ms for _, ms in records),
+        status_code=response.status_code,
+        by_source={label: (counts[label], times[label]) for label in counts},
+    )
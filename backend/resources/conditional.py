@@ -0,0 +1,95 @@
+# resources/conditional.py
+"""
+Conditional GET support.
+
+The ETag of a response hashes the state it was built from, together with
+the viewer and the full query string. For a detail view that state is the
+object's own columns. For a list it is a few columns of each row on the
+page plus whether there are pages either side. The page query has to run
+anyway, so a list validator costs no extra query and never scans beyond
+the page. What a 304 saves is serialization: rendering the rows,
+resolving file URLs and encoding the JSON.
+
+Row state includes the counters (download_count, rating_count,
+rating_sum) because they change through update() without touching
+updated_at. It also includes the related rows a serializer renders, such
+as the owner's username.
+
+If-Modified-Since is only consulted when no If-None-Match was sent
+(RFC 9110 §13.1.3). Last-Modified follows updated_at, so counters can
+change without moving it; clients that need exact counters revalidate
+with the ETag.
+
+Lists send no Last-Modified and ignore If-Modified-Since. The newest
+updated_at of a page does not move when a row is deleted or leaves the
+page, so a date alone would answer 304 with stale contents; the ETag
+covers every row and is the only list validator.
+"""
+import hashlib
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+# Bump when a serializer's output changes shape, so old ETags stop matching
+REPRESENTATION_VERSION = 2
+
+
+def resource_state(resource):
+    # is_saved/my_rating are annotated per viewer by annotate_viewer_state
+    return (resource.pk, resource.updated_at, resource.download_count, resource.rating_count,
+            resource.rating_sum, resource.user.updated_at,
+            getattr(resource, 'is_saved', None), getattr(resource, 'my_rating', None))
+
+
+def rating_state(rating):
+    return (rating.pk, rating.updated_at, rating.user.updated_at, rating.resource.updated_at)
+
+
+def user_state(user):
+    # The statistics come from annotate_user_stats, so they are already loaded
+    return (user.pk, user.updated_at, user.total_uploads, user.received_rating_count,
+            user.received_rating_sum, user.friend_count)
+
+
+def make_etag(request, state):
+    raw = repr((REPRESENTATION_VERSION, request.user.pk, request.get_full_path(), state))
+    return '"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return (if_modified_since is not None and last_modified is not None
+            and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def conditional_response(request, state, last_modified, build):
+    """Return 304 if the client's copy is current, otherwise build() with validators attached"""
+    etag = make_etag(request, state)
+    if is_not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Responses depend on the viewer: browsers may keep them, shared caches may not
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization, Cookie'
+    return response
+
+
+def conditional_object(request, obj, state_func, build):
+    return conditional_response(request, state_func(obj), obj.updated_at, build)
+
+
+def conditional_list(request, rows, state_func, build, paginator=None):
+    """rows are the already-fetched rows of the response (the page, when paginated)"""
+    state = tuple(state_func(row) for row in rows)
+    if paginator is not None:
+        state += (paginator.has_next, paginator.has_previous)
+    return conditional_response(request, state, None, build)
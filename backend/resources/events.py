@@ -0,0 +1,206 @@
+# resources/events.py
+"""
+Download event sinks.
+
+The download action hands each event to the configured sink instead of
+inserting a Download row itself:
+
+- 'sync' (default) inserts the row in the request, as before.
+- 'queued' puts the event on a bounded in-process queue that a background
+  thread drains with bulk_create. Events are queued once the surrounding
+  transaction commits, so a rolled-back request records nothing. When the
+  queue stays full for PUT_TIMEOUT seconds the request writes its own row,
+  so a slow database slows downloads down rather than dropping events.
+
+lifecycle.shutdown() drains the queue when the server stops.
+"""
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SINK': 'sync',
+    'MAX_QUEUE': 10000,      # events waiting before requests feel backpressure
+    'BATCH_SIZE': 500,       # rows per bulk_create
+    'FLUSH_INTERVAL': 1.0,   # seconds to wait for a batch to fill
+    'PUT_TIMEOUT': 0.5,      # seconds a request waits for queue space
+}
+
+_STOP = object()
+
+
+def _config(key):
+    return getattr(settings, 'DOWNLOAD_EVENTS', {}).get(key, DEFAULTS[key])
+
+
+def _build(user_id, resource_id):
+    from .models import Download
+    return Download(user_id=user_id, resource_id=resource_id, downloaded_at=timezone.now())
+
+
+class SyncDownloadSink:
+    def record(self, user_id, resource_id):
+        _build(user_id, resource_id).save()
+
+    def record_many(self, user_id, resource_ids):
+        from .models import Download
+        Download.objects.bulk_create([_build(user_id, resource_id) for resource_id in resource_ids])
+
+    def flush(self):
+        return 0
+
+    def shutdown(self):
+        pass
+
+
+class QueuedDownloadSink:
+    def __init__(self, max_queue=None, batch_size=None, flush_interval=None, put_timeout=None):
+        self.batch_size = batch_size or _config('BATCH_SIZE')
+        self.flush_interval = flush_interval if flush_interval is not None else _config('FLUSH_INTERVAL')
+        self.put_timeout = put_timeout if put_timeout is not None else _config('PUT_TIMEOUT')
+        self._queue = queue.Queue(maxsize=max_queue or _config('MAX_QUEUE'))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.written = self.overflowed = self.failed = 0
+
+    def record(self, user_id, resource_id):
+        self.record_many(user_id, [resource_id])
+
+    def record_many(self, user_id, resource_ids):
+        events = [_build(user_id, resource_id) for resource_id in resource_ids]
+        # The writer thread commits on its own connection; never let it see a rolled-back download
+        transaction.on_commit(lambda: self._put(events))
+
+    def _put(self, events):
+        overflow = []
+        for event in events:
+            if not self._stopped and not overflow:
+                self._ensure_thread()
+                try:
+                    self._queue.put(event, timeout=self.put_timeout)
+                    continue
+                except queue.Full:
+                    logger.warning('Download event queue is full; writing in the request')
+            overflow.append(event)
+        if overflow:
+            with self._lock:
+                self.overflowed += len(overflow)
+            self._write(overflow)
+
+    def flush(self):
+        """Write every queued event from the calling thread; returns the number written"""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def shutdown(self, timeout=10):
+        """Stop the writer thread, then write whatever it left in the queue"""
+        self._stopped = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        return self.flush()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='download-event-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                close_old_connections()
+                self._write(batch)
+            if stop:
+                return
+
+    def _collect(self):
+        """Wait up to flush_interval for a batch to fill; returns (batch, stop requested)"""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if event is _STOP:
+                return batch, True
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(event)
+        return batch, False
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                batch.append(event)
+        return batch
+
+    def _write(self, batch):
+        from .models import Download
+        try:
+            Download.objects.bulk_create(batch)
+            written = len(batch)
+        except Exception:
+            # One bad row (e.g. a resource deleted meanwhile) must not sink the batch
+            logger.exception('Bulk insert of %d download events failed; retrying one by one', len(batch))
+            written = 0
+            for event in batch:
+                try:
+                    event.save()
+                    written += 1
+                except Exception:
+                    logger.exception('Dropping download event for resource %s', event.resource_id)
+                    with self._lock:
+                        self.failed += 1
+        with self._lock:
+            self.written += written
+        return written
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_download_sink():
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = QueuedDownloadSink() if _config('SINK') == 'queued' else SyncDownloadSink()
+    return _sink
+
+
+def reset_download_sink():
+    """Shut down the current sink so the next call rebuilds it from settings"""
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.shutdown()
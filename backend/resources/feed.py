@@ -0,0 +1,117 @@
+# resources/feed.py
+"""
+Activity feed: friends' uploads and ratings, newest first.
+
+Every upload and new rating becomes one Activity, delivered one of two ways:
+- fan-out on write: one FeedEntry is inserted into each friend's timeline,
+  so reading a feed is one indexed range scan;
+- fan-in on read: a prolific actor (PROLIFIC_UPLOADS or more uploads in
+  the last PROLIFIC_WINDOW_DAYS days) or one with more than MAX_FANOUT
+  friends would cost a large insert per action. Their activities are
+  marked fanned_out=False, and readers pull them straight from Activity.
+
+The flag is stored on the activity, so each activity is delivered exactly
+once even when an actor later moves across the threshold. read() merges
+the two sources on (created_at, id), which is also the cursor.
+
+Visibility is applied when reading:
+- only activities of current friends are returned;
+- their resources must pass the same test as ResourceViewSet.get_queryset.
+An unfriend or a profile turning private therefore hides entries at once.
+signals.py publishes after the write commits, so fan-out never runs under
+a row lock. It also deletes the former friends' copied entries from both
+timelines when a friendship stops being accepted, and backfills the latest
+BACKFILL activities when a request is accepted.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+DEFAULTS = {
+    'PROLIFIC_UPLOADS': 20,       # uploads within the window that switch an actor to fan-in
+    'PROLIFIC_WINDOW_DAYS': 7,
+    'MAX_FANOUT': 2000,           # friends beyond which an actor is always fanned in
+    'BACKFILL': 20,               # recent activities copied to a new friend's timeline
+}
+
+
+def _config(key):
+    return getattr(settings, 'ACTIVITY_FEED', {}).get(key, DEFAULTS[key])
+
+
+def is_prolific(actor_id):
+    from .models import Resource
+    threshold = _config('PROLIFIC_UPLOADS')
+    since = timezone.now() - timedelta(days=_config('PROLIFIC_WINDOW_DAYS'))
+    # The slice stops counting at the threshold
+    return Resource.objects.filter(user_id=actor_id, created_at__gte=since)[:threshold].count() >= threshold
+
+
+def publish(actor_id, verb, resource_id, rating_id=None):
+    """Record an activity and, for ordinary actors, copy it into each friend's timeline"""
+    from .friends import get_friend_ids
+    from .models import Activity, FeedEntry
+    friend_ids = get_friend_ids(actor_id)
+    fan_out = len(friend_ids) <= _config('MAX_FANOUT') and not is_prolific(actor_id)
+    activity = Activity.objects.create(actor_id=actor_id, verb=verb, resource_id=resource_id,
+                                       rating_id=rating_id, fanned_out=fan_out)
+    if fan_out and friend_ids:
+        FeedEntry.objects.bulk_create([
+            FeedEntry(owner_id=friend_id, activity=activity, actor_id=actor_id, created_at=activity.created_at)
+            for friend_id in friend_ids
+        ], batch_size=1000)
+    return activity
+
+
+def unlink(a, b):
+    """Drop what two former friends copied into each other's timelines"""
+    from .models import FeedEntry
+    FeedEntry.objects.filter(Q(owner_id=a, actor_id=b) | Q(owner_id=b, actor_id=a)).delete()
+
+
+def backfill(a, b):
+    """Give two new friends each other's latest fanned-out activities"""
+    from .models import Activity, FeedEntry
+    entries = []
+    for owner_id, actor_id in ((a, b), (b, a)):
+        recent = (Activity.objects.filter(actor_id=actor_id, fanned_out=True)
+                  .order_by('-created_at', '-id').values_list('id', 'created_at')[:_config('BACKFILL')])
+        entries += [FeedEntry(owner_id=owner_id, activity_id=activity_id, actor_id=actor_id, created_at=created_at)
+                    for activity_id, created_at in recent]
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _visible(user, friend_ids, prefix=''):
+    """ResourceViewSet.get_queryset's visibility test for an activity's resource"""
+    return (Q(**{f'{prefix}resource__user__is_private': False}) | Q(**{f'{prefix}resource__user': user}) |
+            Q(**{f'{prefix}resource__user_id__in': friend_ids}))
+
+
+def read(user, friend_ids, after=None, limit=20):
+    """
+    Up to limit + 1 visible activities older than the (created_at, id) position after,
+    newest first; the extra row tells the caller there is another page.
+    """
+    from .models import Activity, FeedEntry
+    if not friend_ids:
+        return []
+    friend_ids = list(friend_ids)
+    pushed = (FeedEntry.objects.filter(owner=user, actor_id__in=friend_ids)
+              .filter(_visible(user, friend_ids, 'activity__'))
+              .order_by('-created_at', '-activity_id'))
+    pulled = (Activity.objects.filter(actor_id__in=friend_ids, fanned_out=False)
+              .filter(_visible(user, friend_ids))
+              .order_by('-created_at', '-id'))
+    if after is not None:
+        created_at, activity_id = after
+        pushed = pushed.filter(Q(created_at__lt=created_at) |
+                               Q(created_at=created_at, activity_id__lt=activity_id))
+        pulled = pulled.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=activity_id))
+
+    related = ('actor', 'resource__user', 'rating')
+    activities = [entry.activity for entry in
+                  pushed.select_related(*[f'activity__{name}' for name in related])[:limit + 1]]
+    activities += list(pulled.select_related(*related)[:limit + 1])
+    activities.sort(key=lambda activity: (activity.created_at, activity.id), reverse=True)
+    return activities[:limit + 1]
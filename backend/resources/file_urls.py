@@ -0,0 +1,130 @@
+# resources/file_urls.py
+"""
+Cached file URL resolution.
+
+Building a Cloudinary URL means signing and formatting it in Python for
+every serialized resource, and other storage backends may hit the network.
+Each process keeps an LRU of (storage, file name) -> URL that expires after
+FILE_URL_CACHE['TIMEOUT'] seconds, so short-lived signed URLs are never
+served stale for long. signals.py drops the entry when a resource's file is
+replaced or the resource is deleted.
+
+resolve_many() fills the cache for a whole page of files at once; the list
+serializer calls it before rendering rows, so each row is a cache lookup.
+aresolve_many() is the same for async views: missing URLs are built
+concurrently through storage.aurl(), off the event loop.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+DEFAULTS = {
+    'MAX_ENTRIES': 50000,    # URLs kept in each process
+    'TIMEOUT': 300,          # seconds before a URL is built again
+}
+
+
+def _config(key):
+    return getattr(settings, 'FILE_URL_CACHE', {}).get(key, DEFAULTS[key])
+
+
+class FileURLCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def resolve_many(self, storage, names):
+        """Return {name: url} for every name, building only the ones not cached"""
+        now = time.monotonic()
+        urls, missing = self._lookup(storage, names, now)
+        # Build outside the lock; a storage call may be slow
+        built = {name: storage.url(name) for name in missing}
+        self._store(storage, built, now)
+        urls.update(built)
+        return urls
+
+    async def aresolve_many(self, storage, names):
+        """resolve_many() for async callers"""
+        from .storage import aurl
+        now = time.monotonic()
+        urls, missing = self._lookup(storage, names, now)
+        built = dict(zip(missing, await asyncio.gather(*(aurl(storage, name) for name in missing))))
+        self._store(storage, built, now)
+        urls.update(built)
+        return urls
+
+    def _lookup(self, storage, names, now):
+        """({name: cached url}, [names to build])"""
+        urls, missing = {}, []
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry = self._entries.get((storage, name))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((storage, name))
+                    urls[name] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(name)
+                    self.misses += 1
+        return urls, missing
+
+    def _store(self, storage, built, now):
+        if not built:
+            return
+        expires = now + _config('TIMEOUT')
+        with self._lock:
+            for name, url in built.items():
+                self._entries[(storage, name)] = (url, expires)
+                self._entries.move_to_end((storage, name))
+            while len(self._entries) > _config('MAX_ENTRIES'):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, storage, *names):
+        with self._lock:
+            for name in names:
+                self._entries.pop((storage, name), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+file_url_cache = FileURLCache()
+
+
+def file_url(field_file):
+    """Cached equivalent of field_file.url"""
+    if not field_file:
+        raise ValueError(f"The '{field_file.field.name}' attribute has no file associated with it.")
+    return file_url_cache.resolve_many(field_file.storage, [field_file.name])[field_file.name]
+
+
+def resolve_many(field_files):
+    """Warm the cache for many FieldFiles, grouped by storage, in one pass"""
+    by_storage = {}
+    for field_file in field_files:
+        if field_file:
+            by_storage.setdefault(field_file.storage, []).append(field_file.name)
+    for storage, names in by_storage.items():
+        file_url_cache.resolve_many(storage, names)
+
+
+async def aresolve_many(field_files):
+    """{file name: url} for many FieldFiles, for async views to pass to serializers as file_urls"""
+    by_storage = {}
+    for field_file in field_files:
+        if field_file:
+            by_storage.setdefault(field_file.storage, []).append(field_file.name)
+    urls = {}
+    for resolved in await asyncio.gather(*(file_url_cache.aresolve_many(storage, names)
+                                           for storage, names in by_storage.items())):
+        urls.update(resolved)
+    return urls
+
+
+def invalidate_file_url(storage, *names):
+    file_url_cache.invalidate(storage, *[name for name in names if name])
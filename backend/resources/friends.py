@@ -0,0 +1,135 @@
+# resources/friends.py
+"""
+Cached accepted-friend id sets used for every visibility check.
+
+Caching needs FRIEND_CACHE['CACHE_ALIAS'] to name a cache every worker
+shares (settings.py points it at SHARED_CACHE_URL). Each process then
+keeps an LRU of user id -> frozenset of friend ids in front of it, and a
+worker that has never seen a user can still skip the database.
+
+signals.py invalidates both users of a Friendship whenever one is saved or
+deleted, by bumping a per-user generation number in the shared cache.
+Shared sets are keyed by it, and a process checks it before trusting its
+own copy, so an unfriend reaches every worker at once. The check costs one
+cache read per lookup, still far cheaper than the query.
+
+Without a shared alias nothing is cached and every lookup reads the
+database. A per-process copy could only be invalidated in the worker that
+handled the change, and the others would go on showing private resources
+to a removed friend.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,    # users kept in each process
+    'LOCAL_TIMEOUT': 30,     # seconds a process trusts its own copy
+    'CACHE_ALIAS': None,     # shared Django cache; None turns caching off
+    'TIMEOUT': 3600,         # seconds entries live in the shared cache
+}
+
+
+def _config(key):
+    return getattr(settings, 'FRIEND_CACHE', {}).get(key, DEFAULTS[key])
+
+
+class FriendSetCache:
+    key_prefix = 'friend-ids'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _shared(self):
+        alias = _config('CACHE_ALIAS')
+        return caches[alias] if alias else None
+
+    def _key(self, user_id, generation):
+        return f'{self.key_prefix}:{user_id}:{generation}'
+
+    def _generation(self, shared, user_id):
+        key = f'{self.key_prefix}:gen:{user_id}'
+        generation = shared.get(key)
+        if generation is None:
+            # Start from the clock so an evicted counter never repeats an old value
+            shared.add(key, time.time_ns(), None)
+            generation = shared.get(key)
+        return generation
+
+    def get(self, user_id):
+        shared = self._shared()
+        if shared is None:
+            with self._lock:
+                self.misses += 1
+            return load_friend_ids(user_id)
+        now = time.monotonic()
+        generation = self._generation(shared, user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now and entry[2] == generation:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        friend_ids = shared.get(self._key(user_id, generation))
+        if friend_ids is None:
+            friend_ids = load_friend_ids(user_id)
+            shared.set(self._key(user_id, generation), friend_ids, _config('TIMEOUT'))
+        self._store(user_id, friend_ids, generation, now)
+        return friend_ids
+
+    def _store(self, user_id, friend_ids, generation, now):
+        with self._lock:
+            self._entries[user_id] = (friend_ids, now + _config('LOCAL_TIMEOUT'), generation)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > _config('MAX_ENTRIES'):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        shared = self._shared()
+        if shared:
+            for user_id in set(user_ids):
+                key = f'{self.key_prefix}:gen:{user_id}'
+                try:
+                    shared.incr(key)
+                except ValueError:
+                    shared.add(key, time.time_ns(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+def load_friend_ids(user_id):
+    """Read a user's accepted friends in both directions from the database"""
+    from .models import Friendship
+    pairs = Friendship.objects.filter(
+        Q(requester_id=user_id) | Q(addressee_id=user_id),
+        status='accepted'
+    ).values_list('requester_id', 'addressee_id')
+    return frozenset(a if a != user_id else b for a, b in pairs)
+
+
+friend_cache = FriendSetCache()
+
+
+def get_friend_ids(user_id):
+    return friend_cache.get(user_id)
+
+
+def are_friends(user_id, other_id):
+    return other_id in friend_cache.get(user_id)
+
+
+def invalidate_friends(*user_ids):
+    friend_cache.invalidate(*user_ids)
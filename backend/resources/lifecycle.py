@@ -0,0 +1,53 @@
+# resources/lifecycle.py
+"""
+Process shutdown hooks for the in-memory write-behind buffers.
+
+asgi.py wraps the Django application so the ASGI lifespan shutdown event
+runs shutdown(); wsgi.py registers it with atexit, and gunicorn.conf.py
+calls it from worker_exit.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_done = threading.Event()
+
+
+def shutdown():
+    """Write every buffered download event and count; safe to call more than once"""
+    if _done.is_set():
+        return
+    _done.set()
+    from .counters import download_counts
+    from .events import reset_download_sink
+    # Events first: the counts describe the same downloads
+    for name, flush in (('download events', reset_download_sink), ('download counts', download_counts.flush)):
+        try:
+            flush()
+        except Exception:
+            logger.exception('Failed to flush %s on shutdown', name)
+
+
+class LifespanShutdownMiddleware:
+    """
+    ASGI wrapper that answers lifespan events (Django only speaks HTTP) and
+    flushes the buffers on lifespan.shutdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        from asgiref.sync import sync_to_async
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await sync_to_async(shutdown, thread_sensitive=False)()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
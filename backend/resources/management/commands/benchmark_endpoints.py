@@ -0,0 +1,108 @@
+# resources/management/commands/benchmark_endpoints.py
+import json
+import tempfile
+from contextlib import ExitStack
+from unittest import mock
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from resources import benchmark
+from resources.models import Resource
+
+
+class Command(BaseCommand):
+    help = ('Benchmark API endpoints in-process against a throwaway synthetic dataset and '
+            'fail when any route regresses past the baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=500,
+                            help='Synthetic users to seed (see seed_data --scale)')
+        parser.add_argument('--seed', type=int, default=1014)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Times each route is measured; results are the median run and a '
+                                 'regression must exceed the spread between runs')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Leave the response cache on, so cached routes measure cache hits')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients per route')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only benchmark this route name (repeatable), e.g. resource-list')
+        parser.add_argument('--baseline', nargs='?', const=str(benchmark.DEFAULT_BASELINE),
+                            help='Baseline JSON to compare against; without a path, the checked-in '
+                                 f'{benchmark.DEFAULT_BASELINE.name}, taken with the default options')
+        parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE,
+                            help='Allowed slowdown per percentile as a fraction of the baseline')
+        parser.add_argument('--output', help='Write this run as JSON (usable as a later --baseline)')
+        parser.add_argument('--compare-auth', action='store_true',
+                            help='Also time resource-list with real tokens, with and without the token cache')
+        parser.add_argument('--compare-async', action='store_true',
+                            help='Also run download, create and saved_resources through the sync and the '
+                                 'async views against a slow storage stand-in. Concurrent writes can fail '
+                                 'on SQLite; set DATABASE_URL to a PostgreSQL database for clean numbers')
+        parser.add_argument('--storage-latency-ms', type=float, default=50,
+                            help='Latency of each storage call in --compare-async')
+        parser.add_argument('--existing', action='store_true',
+                            help='Benchmark the configured database as it is instead of seeding a test database')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = None
+        stack = ExitStack()
+        try:
+            if not options['existing']:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                # The seeded files exist nowhere; build their URLs locally instead of asking
+                # the configured storage, which may be an unconfigured Cloudinary account
+                location = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(mock.patch.object(
+                    Resource._meta.get_field('file'), 'storage',
+                    FileSystemStorage(location=location, base_url='/media/'),
+                ))
+                self.seed(options)
+            results = benchmark.run(
+                requests=options['requests'], concurrency=options['concurrency'],
+                routes=options['routes'], progress=lambda result: self.stdout.write(result.line()),
+                runs=options['runs'], response_cache=options['response_cache'],
+            )
+            if options['compare_auth']:
+                self.stdout.write('Token authentication on resource-list:')
+                comparison = benchmark.compare_authentication(options['requests'], options['concurrency'])
+                for name, result in comparison.items():
+                    self.stdout.write(f'  {name:28s} {result.line()}')
+            if options['compare_async']:
+                self.stdout.write(f"Sync and async actions, {options['storage_latency_ms']:.0f} ms per storage call:")
+                comparison = benchmark.compare_async_actions(
+                    options['requests'], options['concurrency'], options['storage_latency_ms'] / 1000)
+                for result in comparison.values():
+                    self.stdout.write(f'  {result.line()}')
+        finally:
+            stack.close()
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        meta = {key: options[key] for key in
+                ('scale', 'seed', 'requests', 'concurrency', 'runs', 'response_cache', 'existing')}
+        meta.update(vendor=connection.vendor, hardware=benchmark.hardware())
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(benchmark.to_json(results, **meta), handle, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+            for mismatch in benchmark.mismatched_meta(meta, baseline):
+                self.stderr.write(self.style.WARNING(f'Baseline was taken under different conditions; {mismatch}'))
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No route regressed more than {options["tolerance"]:.0%}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Benchmarked {len(results)} routes'))
+
+    def seed(self, options):
+        from django.core.management import call_command
+        self.stdout.write(f'Seeding {options["scale"]} synthetic users...')
+        call_command('seed_data', scale=options['scale'], seed=options['seed'], stdout=self.stdout)
@@ -0,0 +1,24 @@
+# resources/management/commands/build_similar_resources.py
+from django.core.management.base import BaseCommand
+from resources import similarity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the co-download neighbour table behind /resources/{id}/similar/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help='Neighbours kept per resource')
+        parser.add_argument('--item-chunk', type=int,
+                            help='Resources whose co-download counts are held in memory at once')
+        parser.add_argument('--max-basket', type=int,
+                            help='Skip users who downloaded more distinct resources than this')
+        parser.add_argument('--min-co-downloads', type=int,
+                            help='Least number of shared downloaders for a pair to count')
+
+    def handle(self, *args, **options):
+        overrides = {key.upper(): options[key] for key in ('top_k', 'item_chunk', 'max_basket', 'min_co_downloads')}
+        written = similarity.build(
+            overrides,
+            progress=lambda done, total: self.stdout.write(f'  {done}/{total} resources'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} resource neighbours'))
@@ -0,0 +1,35 @@
+# resources/management/commands/import_times.py
+from django.core.management.base import BaseCommand, CommandError
+from resources import startup
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import time of a cold start (django.setup() plus the URLconf)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25,
+                            help='Number of modules to list, slowest cumulative time first')
+        parser.add_argument('--prefix', default='',
+                            help="Only list modules whose name starts with this, e.g. 'resources'")
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail when total import time exceeds this many milliseconds')
+
+    def handle(self, *args, **options):
+        records = startup.profile_startup()
+        shown = [r for r in records if r.module.startswith(options['prefix'])]
+        shown.sort(key=lambda r: r.cumulative_us, reverse=True)
+
+        self.stdout.write(f"{'cumulative':>12} {'self':>10}  module")
+        for record in shown[:options['top']]:
+            self.stdout.write(f'{record.cumulative_us / 1000:9.1f} ms {record.self_us / 1000:7.1f} ms  '
+                              f'{record.module}')
+
+        loaded = {record.module for record in records}
+        early = [module for module in startup.MODULES_NOT_AT_STARTUP if module in loaded]
+        if early:
+            self.stdout.write(self.style.WARNING(f"Imported at startup but meant to be lazy: {', '.join(early)}"))
+
+        total = startup.total_ms(records)
+        if options['budget_ms'] is not None and total > options['budget_ms']:
+            raise CommandError(f"Startup imports took {total:.1f} ms, over the {options['budget_ms']:.0f} ms budget")
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(records)} modules in {total:.1f} ms'))
@@ -0,0 +1,13 @@
+# resources/management/commands/purge_upload_sessions.py
+from django.core.management.base import BaseCommand
+from resources import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete expired upload sessions and their part files'
+
+    def handle(self, *args, **options):
+        sessions, files = uploads.purge_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {sessions} expired upload sessions and {files} orphaned part files'
+        ))
@@ -0,0 +1,16 @@
+# resources/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from resources import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for resources (SQLite FTS5 only)'
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'{connection.vendor} searches an expression index; nothing to rebuild')
+            return
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Rebuilt resource search index'))
@@ -0,0 +1,58 @@
+# resources/management/commands/reconcile_ratings.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from resources.models import Resource, Rating
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating_count/rating_sum columns on resources from Rating rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of resources to reconcile per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted resources without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        checked = fixed = 0
+        last_id = 0
+
+        while True:
+            # Lock the batch like the rate action does, so no rating lands between
+            # counting and writing; walking by primary key keeps each batch an index range scan
+            with transaction.atomic():
+                batch = list(
+                    Resource.objects.select_for_update()
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'rating_count', 'rating_sum')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                actual = {
+                    row['resource']: (row['count'], row['total'])
+                    for row in Rating.objects.filter(resource_id__in=[r[0] for r in batch])
+                    .values('resource')
+                    .annotate(count=Count('id'), total=Sum('rating'))
+                }
+
+                drifted = []
+                for resource_id, count, total in batch:
+                    expected = actual.get(resource_id, (0, 0))
+                    if (count, total) != expected:
+                        drifted.append(Resource(id=resource_id, rating_count=expected[0], rating_sum=expected[1]))
+
+                checked += len(batch)
+                fixed += len(drifted)
+                if drifted and not dry_run:
+                    Resource.objects.bulk_update(drifted, ['rating_count', 'rating_sum'])
+
+        verb = 'would fix' if dry_run else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} resources, {verb} {fixed} rating aggregates'
+        ))
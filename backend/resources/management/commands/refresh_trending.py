@@ -0,0 +1,17 @@
+# resources/management/commands/refresh_trending.py
+from django.core.management.base import BaseCommand
+from resources import trending
+
+
+class Command(BaseCommand):
+    help = 'Fold downloads and ratings recorded since the last run into the trending scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop every score and replay the whole download and rating history')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            trending.reset()
+        folded = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} events into the trending scores'))
@@ -9,11 +9,40 @@ from resources import models
 from resources.models import User, Resource, Rating, Download, Friendship
 import datetime
 from django.db.models import Q
+from django.db import connection
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from resources import synthetic
 
 class Command(BaseCommand):
-    help = 'Seed database with sample data'
+    help = 'Seed database with sample data, or with a large synthetic dataset when --scale is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=0,
+                            help='Generate a synthetic dataset with this many users instead of the sample data')
+        parser.add_argument('--resources-per-user', type=float, default=10)
+        parser.add_argument('--downloads-per-user', type=float, default=100)
+        parser.add_argument('--ratings-per-user', type=float, default=100)
+        parser.add_argument('--mean-friends', type=float, default=20,
+                            help='Average friendships per user; individual degrees are heavy-tailed')
+        parser.add_argument('--private-ratio', type=float, default=0.2,
+                            help='Share of synthetic profiles that are private')
+        parser.add_argument('--seed', type=int, default=1014,
+                            help='Random seed; the same seed and options always produce the same rows')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows per bulk INSERT')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows generated per unit of work (and per transaction)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating chunks in parallel (ignored on SQLite)')
+        parser.add_argument('--file-dir', default='',
+                            help='Write each synthetic file into this local directory; by default only names are stored')
 
     def handle(self, *args, **kwargs):
+        if kwargs.get('scale'):
+            self.seed_synthetic(kwargs)
+            return
+
         self.stdout.write('Seeding database...')
         
         # Create a media folder if it doesn't exist
@@ -35,6 +64,48 @@ class Command(BaseCommand):
         self.create_friendships()
         
         self.stdout.write(self.style.SUCCESS('Successfully seeded database!'))
+
+    def seed_synthetic(self, options):
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; generating with 1 worker'))
+            workers = 1
+
+        # New rows take ids above everything already there, so the command can run on a seeded database
+        last_user = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        last_resource = Resource.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        params = synthetic.SyntheticParams(
+            users=options['scale'],
+            resources_per_user=options['resources_per_user'],
+            downloads_per_user=options['downloads_per_user'],
+            ratings_per_user=options['ratings_per_user'],
+            mean_friends=options['mean_friends'],
+            private_ratio=options['private_ratio'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            user_id_base=last_user + 1,
+            resource_id_base=last_resource + 1,
+            epoch=timezone.now().timestamp(),
+            password_hash=make_password('password123'),
+            file_dir=options['file_dir'],
+        )
+        self.stdout.write(
+            f'Generating {params.users} users, {params.resources} resources, {params.friendships} friendships, '
+            f'{params.ratings} ratings and {params.downloads} downloads (seed {params.seed})...'
+        )
+
+        def progress(phase, rows, seconds):
+            self.stdout.write(f'  {phase}: {rows} rows in {seconds:.1f}s')
+
+        synthetic.generate(params, workers=workers, batch_size=options['batch_size'], progress=progress)
+        synthetic.reset_sequences([User, Resource])
+
+        # bulk_create skips signals and save(), so bring the derived data up to date in bulk
+        call_command('reconcile_ratings', batch_size=options['chunk_size'], stdout=self.stdout)
+        call_command('reconcile_download_counts', batch_size=options['chunk_size'], stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('refresh_trending', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Successfully generated synthetic dataset!'))
     
     def create_users(self):
         self.stdout.write('Creating users...')
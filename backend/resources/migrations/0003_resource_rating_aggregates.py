@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:09
+
+import cloudinary_storage.storage
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Resource = apps.get_model('resources', 'Resource')
+    Rating = apps.get_model('resources', 'Rating')
+    per_resource = Rating.objects.filter(resource=OuterRef('pk')).values('resource')
+    Resource.objects.update(
+        rating_count=Coalesce(Subquery(per_resource.annotate(c=Count('id')).values('c')), Value(0)),
+        rating_sum=Coalesce(Subquery(per_resource.annotate(s=Sum('rating')).values('s')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0002_savedresource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(storage=cloudinary_storage.storage.MediaCloudinaryStorage(), upload_to='resources/'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+FTS_TABLE = 'resources_resource_fts'
+GIN_INDEX = 'resources_resource_search_gin'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "title, description, subject, grade_level, resource_type, "
+            "tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, subject, grade_level, resource_type) "
+            "SELECT id, title, description, subject, grade_level, resource_type FROM resources_resource"
+        )
+    elif connection.vendor == 'postgresql':
+        # Must stay identical to resources.search.search_vector() for the planner to use it
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        Resource = apps.get_model('resources', 'Resource')
+        vector = (
+            SearchVector('title', weight='A', config='english') +
+            SearchVector('description', weight='B', config='english') +
+            SearchVector('subject', 'grade_level', 'resource_type', weight='C', config='english')
+        )
+        schema_editor.add_index(Resource, GinIndex(vector, name=GIN_INDEX))
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0003_resource_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('resources', '0005_download_downloaded_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='download',
+            index=models.Index(fields=['user', '-downloaded_at', '-id'], name='download_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['requester', 'status'], name='friendship_requester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['addressee', 'status'], name='friendship_addressee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(condition=models.Q(('status', 'accepted')), fields=['requester', 'addressee'], name='friendship_accepted_req_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(condition=models.Q(('status', 'accepted')), fields=['addressee', 'requester'], name='friendship_accepted_addr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='rating_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='resource_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['subject', '-created_at', '-id'], name='resource_subject_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['grade_level', '-created_at', '-id'], name='resource_grade_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['resource_type', '-created_at', '-id'], name='resource_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ),
+    ]
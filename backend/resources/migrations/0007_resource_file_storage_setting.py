@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:26
+
+import resources.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(storage=resources.storage.resource_storage, upload_to='resources/'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0010_trending_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='resources.resource')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='resources.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resource', 'rank'], name='neighbour_rank_idx')],
+                'unique_together': {('resource', 'neighbour')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('resources', '0011_resource_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['institution', '-created_at', '-id'], name='user_institution_idx'),
+        ),
+    ]
@@ -1,8 +1,10 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
-from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.db.models import F, Sum
+from django.utils import timezone
+from .storage import resource_storage
 from django.conf import settings  # Make sure to import settings
 
 class User(AbstractUser):
@@ -13,6 +15,14 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination order of the user list
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+            # Colleague lookups for friend suggestions
+            models.Index(fields=['institution', '-created_at', '-id'], name='user_institution_idx'),
+        ]
+    
     def __str__(self):
         return self.username
     
@@ -20,14 +30,14 @@ class User(AbstractUser):
         return self.resources.count()
     
     def get_average_rating(self):
-        return self.resources.aggregate(Avg('ratings__rating'))['ratings__rating__avg'] or 0
+        totals = self.resources.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+        if not totals['count']:
+            return 0
+        return totals['total'] / totals['count']
     
     def is_friend_with(self, user):
-        return Friendship.objects.filter(
-            (models.Q(requester=self) & models.Q(addressee=user)) | 
-            (models.Q(requester=user) & models.Q(addressee=self)),
-            status='accepted'
-        ).exists()
+        from .friends import are_friends
+        return are_friends(self.pk, user.pk)
 
 class Resource(models.Model):
     """Educational resources uploaded by users"""
@@ -44,24 +54,52 @@ class Resource(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     
-    # Updated file field using the function approach
-    file = models.FileField(upload_to='resources/', storage=MediaCloudinaryStorage())
+    # Cloudinary or local disk, depending on settings.RESOURCE_STORAGE
+    file = models.FileField(upload_to='resources/', storage=resource_storage)
     
     resource_type = models.CharField(max_length=20, choices=RESOURCE_TYPES)
     subject = models.CharField(max_length=100)
     grade_level = models.CharField(max_length=50)
     download_count = models.PositiveIntegerField(default=0)
+    # Denormalized rating aggregates, maintained by apply_rating_change
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Every listing pages by (-created_at, -id), optionally after an equality filter
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='resource_user_created_idx'),
+            models.Index(fields=['subject', '-created_at', '-id'], name='resource_subject_created_idx'),
+            models.Index(fields=['grade_level', '-created_at', '-id'], name='resource_grade_created_idx'),
+            models.Index(fields=['resource_type', '-created_at', '-id'], name='resource_type_created_idx'),
+        ]
+    
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored file name so a replaced file's cached URL can be dropped
+        instance._loaded_file_name = instance.__dict__.get('file')
+        return instance
+    
     def get_average_rating(self):
-        ratings = self.ratings.all()
-        if not ratings:
+        if not self.rating_count:
             return 0
-        return sum(r.rating for r in ratings) / ratings.count()
+        return self.rating_sum / self.rating_count
+    
+    def apply_rating_change(self, old_value, new_value):
+        """Update the rating aggregates for a created (old_value=None) or changed rating"""
+        # F() expressions keep concurrent updates from overwriting each other, and
+        # queryset.update() leaves updated_at untouched
+        Resource.objects.filter(pk=self.pk).update(
+            rating_count=F('rating_count') + (1 if old_value is None else 0),
+            rating_sum=F('rating_sum') + (new_value - (old_value or 0)),
+        )
 
 class Rating(models.Model):
     """Ratings and reviews for resources"""
@@ -72,10 +110,15 @@ class Rating(models.Model):
     )
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Re-rating edits the row in place; this lets list validators notice
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         # Ensure a user can rate a resource only once
         unique_together = ('user', 'resource')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='rating_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}'s {self.rating}-star rating for {self.resource.title}"
@@ -84,10 +127,14 @@ class Download(models.Model):
     """Tracking resource downloads by users"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='downloads')
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='downloads')
-    downloaded_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, so queued events keep the time of the request
+    downloaded_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         unique_together = ('user', 'resource', 'downloaded_at')
+        indexes = [
+            models.Index(fields=['user', '-downloaded_at', '-id'], name='download_user_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} downloaded {self.resource.title}"
@@ -108,10 +155,26 @@ class Friendship(models.Model):
     
     class Meta:
         unique_together = ('requester', 'addressee')
+        indexes = [
+            models.Index(fields=['requester', 'status'], name='friendship_requester_idx'),
+            models.Index(fields=['addressee', 'status'], name='friendship_addressee_idx'),
+            # Friend-set loads only ever read accepted rows; these cover them without the table
+            models.Index(fields=['requester', 'addressee'], condition=models.Q(status='accepted'),
+                         name='friendship_accepted_req_idx'),
+            models.Index(fields=['addressee', 'requester'], condition=models.Q(status='accepted'),
+                         name='friendship_accepted_addr_idx'),
+        ]
     
     def __str__(self):
         return f"{self.requester.username} → {self.addressee.username}: {self.status}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so the feed only reacts to a change in it
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
 class SavedResource(models.Model):
     """Track resources saved/bookmarked by users"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_resources')
@@ -122,4 +185,116 @@ class SavedResource(models.Model):
         unique_together = ('user', 'resource')  # Prevent duplicate saves
     
     def __str__(self):
-        return f"{self.user.username} saved {self.resource.title}"
\ No newline at end of file
+        return f"{self.user.username} saved {self.resource.title}"
+
+class UploadSession(models.Model):
+    """A resumable chunked upload that becomes a Resource once every byte has arrived"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Bytes received so far; chunks must arrive in order, so this is where the next one starts
+    offset = models.PositiveBigIntegerField(default=0)
+    # Optional SHA-256 (hex) of the whole file, checked before the Resource is created
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Title, description, etc. for the Resource, validated when the session was opened
+    resource_data = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    resource = models.OneToOneField(Resource, null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name='upload_session')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.filename} ({self.offset}/{self.size})"
+
+class TrendingScore(models.Model):
+    """Time-decayed popularity of a resource, maintained incrementally by trending.refresh()"""
+    resource = models.OneToOneField(Resource, primary_key=True, on_delete=models.CASCADE,
+                                    related_name='trending')
+    # Sum of event weights scaled to TrendingState.epoch; see trending.py
+    score = models.FloatField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.resource_id}: {self.score:.3f}"
+
+class TrendingState(models.Model):
+    """Singleton row holding the trending table's decay epoch and event watermarks"""
+    epoch = models.DateTimeField()
+    last_download_id = models.BigIntegerField(default=0)
+    last_rating_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Trending scores as of {self.refreshed_at}"
+
+class ResourceNeighbour(models.Model):
+    """A resource often downloaded by the same users, precomputed by similarity.build()"""
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='neighbour_of')
+    # Cosine similarity of the two resources' downloader sets
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ('resource', 'neighbour')
+        indexes = [
+            models.Index(fields=['resource', 'rank'], name='neighbour_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.resource_id} ~ {self.neighbour_id}: {self.score:.3f}"
+
+class Activity(models.Model):
+    """Something a user did that their friends' feeds show; see feed.py"""
+    VERB_CHOICES = [
+        ('upload', 'Upload'),
+        ('rating', 'Rating'),
+    ]
+    
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='activities')
+    rating = models.ForeignKey(Rating, null=True, blank=True, on_delete=models.CASCADE, related_name='activities')
+    # True when copied into each friend's timeline; otherwise readers pull it from here
+    fanned_out = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            # Fan-in reads: recent activity of a reader's prolific friends
+            models.Index(fields=['actor', '-created_at', '-id'], condition=models.Q(fanned_out=False),
+                         name='activity_fan_in_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.actor.username} {self.verb}: {self.resource.title}"
+
+class FeedEntry(models.Model):
+    """An activity copied into one friend's timeline (fan-out on write)"""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='entries')
+    # Copies of the activity's columns, so a timeline page and an unfriend cleanup need no join
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('owner', 'activity')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-activity'], name='feed_owner_created_idx'),
+            models.Index(fields=['owner', 'actor'], name='feed_owner_actor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.owner.username} <- activity {self.activity_id}"
@@ -0,0 +1,198 @@
+# resources/pagination.py
+import base64
+import datetime
+import json
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from .conditional import conditional_list
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as (-created_at, -id).
+
+    Each page is fetched with a tuple comparison against the last row of the
+    previous page, so deep pages cost the same as the first one. Clients that
+    still expect a plain list can pass ?paginate=false during the migration.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    opt_out_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.opt_out_query_param, '').lower() in ('false', '0', 'no'):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering if not reverse else [self._flip(f) for f in self.ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Moving forward there is a previous page whenever we started from a cursor,
+        # and moving backward there is always a next page to return to
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_ordering(self, queryset, view):
+        """Views may order a request differently, e.g. by search relevance"""
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering(queryset) or self.ordering)
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        return self.encode_cursor(self.last_row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_row is None:
+            return None
+        return self.encode_cursor(self.first_row, reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        position = [self._dump(getattr(row, f.lstrip('-'))) for f in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError()
+            position = [self._load(model, f.lstrip('-'), value) for f, value in zip(self.ordering, values)]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, ordering, position):
+        """Build the row-value comparison (a, b) > (x, y) as ORed prefix matches"""
+        condition = Q()
+        equal_prefix = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _load(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as search_rank round-trip through JSON unchanged
+            return value
+        return field.to_python(value)
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return value
+
+
+class DownloadKeysetPagination(KeysetPagination):
+    ordering = ('-downloaded_at', '-id')
+
+
+class MergedKeysetPagination(KeysetPagination):
+    """
+    Forward-only keyset pages over rows that fetch(position, page_size) merges
+    from several queries, such as the activity feed (see feed.py). fetch
+    returns up to page_size + 1 rows after position in ordering.
+    """
+
+    def paginate_rows(self, request, fetch, model):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, model)
+        if reverse:
+            raise NotFound(self.invalid_cursor_message)
+        rows = fetch(position, self.page_size)
+        self.has_next, self.has_previous = len(rows) > self.page_size, False
+        rows = rows[:self.page_size]
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+
+class KeysetListMixin:
+    """Viewset helper that paginates custom list actions like the default list"""
+
+    def keyset_response(self, queryset, serializer_class, pagination_class=KeysetPagination, state_func=None):
+        """With state_func, answer conditional GETs from the fetched rows (see conditional.py)"""
+        paginator = pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        rows = page if page is not None else list(queryset)
+
+        def build():
+            serializer = serializer_class(rows, many=True)
+            if page is None:
+                return Response(serializer.data)
+            return paginator.get_paginated_response(serializer.data)
+
+        if state_func is None:
+            return build()
+        return conditional_list(self.request, rows, state_func, build,
+                                paginator if page is not None else None)
@@ -0,0 +1,184 @@
+# resources/response_cache.py
+"""
+Response cache for resource list and detail requests.
+
+What a viewer may see is the public partition plus a few private ones:
+their own resources if their profile is private, and the resources of each
+private friend. Viewers with the same private partitions see the same
+data. A public user with no private friends is in exactly the same position
+as every other such user. So a cached response is keyed by the request
+path and the partitions behind it, not by the viewer.
+
+Each partition has a generation number in the cache. A cached response
+key includes the generations of its partitions, so invalidating a
+partition is a single increment:
+- saving or deleting a resource, or rating it, bumps its owner's partition
+  ('public', or 'owner:<id>' for private owners);
+- saving a profile bumps both of that user's partitions, which covers
+  is_private flips and renames;
+- friendship changes need no bump: the viewer's friend set, and with it
+  the key, changes.
+
+Per-viewer fields (is_saved, my_rating) are not part of the key. A hit
+passes the cached data through the view's personalize callback. That
+callback rewrites those fields with one query and returns their state,
+which is folded into the ETag.
+
+Download counts are written with update() and are not tracked; they can
+lag by up to TIMEOUT seconds in cached responses.
+
+Generation bumps only reach the workers that read the same cache, so the
+cache is off by default. settings.py turns it on when SHARED_CACHE_URL
+configures a shared cache (e.g. Redis) and points CACHE_ALIAS at it; on a
+per-process cache a worker would keep serving responses another worker
+had invalidated.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe
+
+from .conditional import is_not_modified, make_etag
+
+DEFAULTS = {
+    'ENABLED': False,        # only safe on a cache every worker shares
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 30,           # seconds a cached response lives
+}
+
+PREFIX = 'resource-responses'
+PUBLIC = 'public'
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def _config(key):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(key, DEFAULTS[key])
+
+
+def _cache():
+    return caches[_config('CACHE_ALIAS')]
+
+
+def owner_partition(user_id, private_ids):
+    return f'owner:{user_id}' if user_id in private_ids else PUBLIC
+
+
+class ResourceResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def private_user_ids(self):
+        """Ids of private profiles, cached until a profile is saved"""
+        from .models import User
+        key = f'{PREFIX}:private-ids'
+        private_ids = _cache().get(key)
+        if private_ids is None:
+            private_ids = frozenset(User.objects.filter(is_private=True).values_list('id', flat=True))
+            _cache().set(key, private_ids, _config('TIMEOUT'))
+        return private_ids
+
+    def partitions_for(self, user, friend_ids):
+        private_ids = self.private_user_ids()
+        private = {friend for friend in friend_ids if friend in private_ids}
+        if user.id in private_ids:
+            private.add(user.id)
+        return [PUBLIC] + [f'owner:{owner}' for owner in sorted(private)]
+
+    def _generations(self, partitions):
+        keys = [f'{PREFIX}:gen:{p}' for p in partitions]
+        found = _cache().get_many(keys)
+        for key in keys:
+            if key not in found:
+                # Start from the clock so an evicted counter never repeats an old value
+                _cache().add(key, time.time_ns(), None)
+                found[key] = _cache().get(key)
+        return [found[key] for key in keys]
+
+    def _key(self, request, partitions):
+        raw = repr((request.get_full_path(), partitions, self._generations(partitions)))
+        return f'{PREFIX}:response:' + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def fetch(self, request, partitions, build, personalize=None):
+        """
+        Serve a cached copy of build()'s response for these partitions, or build and store it.
+        personalize(data) -> (data, state) adapts a cached copy to the requesting viewer.
+        """
+        from rest_framework.response import Response
+        if not _config('ENABLED'):
+            return build()
+        key = self._key(request, partitions)
+        cached = _cache().get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            data, headers, last_modified = cached
+            if personalize is not None:
+                data, state = personalize(data)
+                headers = dict(headers, ETag=make_etag(request, (headers.get('ETag'), state)))
+            if is_not_modified(request, headers.get('ETag'), last_modified):
+                response = Response(status=304)
+            else:
+                response = Response(data)
+            for name, value in headers.items():
+                response[name] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        with self._lock:
+            self.misses += 1
+        response = build()
+        if response.status_code == 200:
+            headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+            last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+            if last_modified is not None:
+                last_modified = datetime.fromtimestamp(last_modified, tz=dt_timezone.utc)
+            _cache().set(key, (response.data, headers, last_modified), _config('TIMEOUT'))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def bump(self, *partitions):
+        for partition in set(partitions):
+            key = f'{PREFIX}:gen:{partition}'
+            try:
+                _cache().incr(key)
+            except ValueError:
+                _cache().add(key, time.time_ns(), None)
+
+    def invalidate_owner(self, user_id):
+        self.bump(owner_partition(user_id, self.private_user_ids()))
+
+    def invalidate_user(self, user_id):
+        """A profile changed: its privacy may have flipped, so both partitions are stale"""
+        _cache().delete(f'{PREFIX}:private-ids')
+        self.bump(PUBLIC, f'owner:{user_id}')
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / total if total else 0.0}
+
+    def clear(self):
+        """Empty the whole cache alias; meant for tests"""
+        _cache().clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+response_cache = ResourceResponseCache()
+
+
+def invalidate_owner(user_id):
+    response_cache.invalidate_owner(user_id)
+    # Again after commit, in case another request cached the old rows meanwhile
+    transaction.on_commit(lambda: response_cache.invalidate_owner(user_id))
+
+
+def invalidate_user(user_id):
+    response_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: response_cache.invalidate_user(user_id))
@@ -0,0 +1,125 @@
+# resources/search.py
+"""
+Full-text search over resources.
+
+SQLite keeps a separate FTS5 table (resources_resource_fts, rowid = resource id)
+that signals.py refreshes whenever a Resource is saved or deleted. PostgreSQL
+needs no extra table: queries use the same to_tsvector expression as the GIN
+index created in migration 0004, so the index is always current.
+"""
+import re
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = 'resources_resource_fts'
+SEARCH_FIELDS = ('title', 'description', 'subject', 'grade_level', 'resource_type')
+SEARCH_CONFIG = 'english'
+RANK_ORDERING = ('-search_rank', '-id')
+
+# bm25 column weights, in SEARCH_FIELDS order: a title hit counts most
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 2.0, 1.0)
+
+
+def search_vector():
+    """The weighted tsvector expression that the PostgreSQL GIN index is built on"""
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('subject', 'grade_level', 'resource_type', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def fts_match_expression(query):
+    """Turn free text into an FTS5 query of quoted prefix terms, so user input is never parsed as syntax"""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+def search_resources(queryset, query):
+    """Filter a Resource queryset to matches for query, annotated with search_rank (higher is better)"""
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        vector = search_vector()
+        return queryset.annotate(
+            search_document=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search_document=search_query)
+
+    if connection.vendor == 'sqlite':
+        match = fts_match_expression(query)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        matching_ids = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        # bm25() is negative with the best match lowest, so flip it to rank ascending
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+            (match,), output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matching_ids).annotate(search_rank=rank)
+
+    # Other databases have no index we maintain; match substrings like SearchFilter did
+    condition = Q()
+    for term in query.split():
+        term_condition = Q()
+        for field in SEARCH_FIELDS:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return queryset.filter(condition).annotate(search_rank=RawSQL('0', (), output_field=FloatField()))
+
+
+def index_resource(resource):
+    """Write a resource's searchable text into the SQLite FTS table"""
+    if connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(SEARCH_FIELDS)
+    placeholders = ', '.join(['%s'] * len(SEARCH_FIELDS))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [resource.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})',
+            [resource.pk] + [getattr(resource, field) for field in SEARCH_FIELDS],
+        )
+
+
+def remove_resource(resource_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [resource_id])
+
+
+def rebuild_index():
+    """Repopulate the SQLite FTS table from scratch, e.g. after bulk_create bypassed signals"""
+    if connection.vendor != 'sqlite':
+        return
+    from .models import Resource
+    columns = ', '.join(SEARCH_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {columns}) '
+            f'SELECT id, {columns} FROM {Resource._meta.db_table}'
+        )
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Rank resources matching ?q= (or the older ?search=) by relevance.
+
+    The filter runs on the queryset from get_queryset, so it only ever sees
+    resources the requesting user is allowed to view.
+    """
+    search_params = ('q', 'search')
+
+    def filter_queryset(self, request, queryset, view):
+        for param in self.search_params:
+            query = request.query_params.get(param, '').strip()
+            if query:
+                return search_resources(queryset, query).order_by(*RANK_ORDERING)
+        return queryset
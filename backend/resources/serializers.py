@@ -1,6 +1,11 @@
 from rest_framework import serializers
-from .models import SavedResource, User, Resource, Rating, Download, Friendship
+from .models import SavedResource, User, Resource, Rating, Download, Friendship, UploadSession, Activity
+from .file_urls import file_url, resolve_many
+from .storage import serves_locally
+from . import uploads
+from django.db import models
 from django.db.models import Q
+from django.urls import reverse
 
 class UserSerializer(serializers.ModelSerializer):
     total_uploads = serializers.SerializerMethodField()
@@ -16,16 +21,26 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'write_only': True, 'required': True}
         }
     
+    # UserViewSet annotates these statistics (see annotate_user_stats); fall back
+    # to per-user queries for instances that did not come from its queryset
     def get_friend_count(self, obj):
+        if hasattr(obj, 'friend_count'):
+            return obj.friend_count
         return Friendship.objects.filter(
             (Q(requester=obj) | Q(addressee=obj)),
             status='accepted'
         ).count()
     
     def get_total_uploads(self, obj):
+        if hasattr(obj, 'total_uploads'):
+            return obj.total_uploads
         return obj.get_total_uploads()
     
     def get_average_rating(self, obj):
+        if hasattr(obj, 'received_rating_count'):
+            if not obj.received_rating_count:
+                return 0
+            return obj.received_rating_sum / obj.received_rating_count
         return obj.get_average_rating()
     
     # In your serializers.py
@@ -47,20 +62,83 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+class CachedFileField(serializers.FileField):
+    """
+    FileField whose URL comes from the file URL cache (see file_urls.py), or from
+    context['file_urls'] when an async view has already resolved it.
+
+    Local files are never linked under MEDIA_URL, which is unserved in production
+    and unchecked under DEBUG; they point at the file action, which applies the
+    resource's visibility. Browsers get a signed link from the download action.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', True):
+            return value.name
+        if serves_locally(value.storage):
+            url = reverse('resource-file', kwargs={'pk': value.instance.pk})
+        else:
+            resolved = self.context.get('file_urls') or {}
+            url = resolved[value.name] if value.name in resolved else file_url(value)
+        request = self.context.get('request', None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class ResourceListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.manager.BaseManager) else data
+        # Build every missing URL in one pass before the rows are rendered
+        if 'file_urls' not in self.context:
+            resolve_many(resource.file for resource in items)
+        return super().to_representation(items)
+
+
 class ResourceSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: CachedFileField,
+    }
     user = serializers.StringRelatedField(read_only=True)
     average_rating = serializers.SerializerMethodField()
     user_id = serializers.IntegerField(source='user.id', read_only=True)
+    is_saved = serializers.SerializerMethodField()
+    my_rating = serializers.SerializerMethodField()
     
     class Meta:
         model = Resource
         fields = ['id', 'user', 'title', 'description', 'file', 
                   'resource_type', 'subject', 'grade_level', 
-                  'download_count', 'average_rating', 'created_at', 'user_id']
-        read_only_fields = ['download_count']
+                  'download_count', 'average_rating', 'rating_count',
+                  'created_at', 'user_id', 'is_saved', 'my_rating']
+        read_only_fields = ['download_count', 'rating_count']
+        list_serializer_class = ResourceListSerializer
     
     def get_average_rating(self, obj):
         return obj.get_average_rating()
+    
+    # Querysets built with annotate_viewer_state carry these; fall back to
+    # per-resource queries for the viewer in the request context otherwise
+    def _viewer_id(self):
+        request = self.context.get('request')
+        return request.user.pk if request is not None else None
+    
+    def get_is_saved(self, obj):
+        if hasattr(obj, 'is_saved'):
+            return obj.is_saved
+        viewer_id = self._viewer_id()
+        return viewer_id is not None and SavedResource.objects.filter(user_id=viewer_id, resource=obj).exists()
+    
+    def get_my_rating(self, obj):
+        if hasattr(obj, 'my_rating'):
+            return obj.my_rating
+        viewer_id = self._viewer_id()
+        if viewer_id is None:
+            return None
+        return Rating.objects.filter(user_id=viewer_id, resource=obj).values_list('rating', flat=True).first()
 
 
 class RatingSerializer(serializers.ModelSerializer):
@@ -125,6 +203,23 @@ class FriendshipSerializer(serializers.ModelSerializer):
     def get_addressee_username(self, obj):
         return obj.addressee.username
 
+class ActivitySerializer(serializers.ModelSerializer):
+    actor = serializers.StringRelatedField(read_only=True)
+    actor_id = serializers.IntegerField(read_only=True)
+    resource_title = serializers.CharField(source='resource.title', read_only=True)
+    subject = serializers.CharField(source='resource.subject', read_only=True)
+    grade_level = serializers.CharField(source='resource.grade_level', read_only=True)
+    author = serializers.CharField(source='resource.user.username', read_only=True)
+    rating = serializers.IntegerField(source='rating.rating', read_only=True, default=None)
+    comment = serializers.CharField(source='rating.comment', read_only=True, default=None)
+    
+    class Meta:
+        model = Activity
+        fields = ['id', 'verb', 'actor', 'actor_id', 'resource', 'resource_title', 'subject',
+                  'grade_level', 'author', 'rating', 'comment', 'created_at']
+        read_only_fields = fields
+
+
 class SavedResourceSerializer(serializers.ModelSerializer):
     resource_title = serializers.SerializerMethodField()
     
@@ -136,3 +231,33 @@ class SavedResourceSerializer(serializers.ModelSerializer):
     def get_resource_title(self, obj):
         return obj.resource.title
     
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    # Fields of the Resource created when the upload completes
+    title = serializers.CharField(max_length=200, write_only=True)
+    description = serializers.CharField(write_only=True)
+    resource_type = serializers.ChoiceField(choices=Resource.RESOURCE_TYPES, write_only=True)
+    subject = serializers.CharField(max_length=100, write_only=True)
+    grade_level = serializers.CharField(max_length=50, write_only=True)
+
+    RESOURCE_FIELDS = ['title', 'description', 'resource_type', 'subject', 'grade_level']
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'chunk_size', 'offset', 'sha256', 'status',
+                  'resource', 'created_at', 'title', 'description', 'resource_type',
+                  'subject', 'grade_level']
+        read_only_fields = ['chunk_size', 'offset', 'status', 'resource']
+
+    def validate_size(self, value):
+        if not 0 < value <= uploads.max_size():
+            raise serializers.ValidationError(f"Size must be between 1 and {uploads.max_size()} bytes")
+        return value
+
+    def create(self, validated_data):
+        validated_data['resource_data'] = {
+            field: validated_data.pop(field) for field in self.RESOURCE_FIELDS
+        }
+        validated_data['chunk_size'] = uploads.chunk_size()
+        return super().create(validated_data)
@@ -0,0 +1,134 @@
+# resources/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import Resource, Friendship, Rating, User
+from .file_urls import invalidate_file_url
+from .friends import invalidate_friends
+from .social_graph import friend_graph
+from . import feed, search
+from .response_cache import invalidate_owner, invalidate_user
+from .authentication import invalidate_user_tokens, token_cache
+
+
+@receiver(post_save, sender=Resource)
+def index_saved_resource(sender, instance, **kwargs):
+    search.index_resource(instance)
+
+
+@receiver(post_delete, sender=Resource)
+def unindex_deleted_resource(sender, instance, **kwargs):
+    search.remove_resource(instance.pk)
+
+
+def _file_name(value):
+    return getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_resource_file_url(sender, instance, **kwargs):
+    # Read the raw attribute: touching instance.file would reload a deferred field
+    storage = Resource._meta.get_field('file').storage
+    current = _file_name(instance.__dict__.get('file'))
+    invalidate_file_url(storage, getattr(instance, '_loaded_file_name', None), current)
+    instance._loaded_file_name = current
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friend_sets(sender, instance, **kwargs):
+    user_ids = (instance.requester_id, instance.addressee_id)
+    invalidate_friends(*user_ids)
+    # Invalidate again after commit, in case another request cached the old set meanwhile
+    transaction.on_commit(lambda: invalidate_friends(*user_ids))
+
+
+@receiver(post_save, sender=Friendship)
+def patch_friend_graph(sender, instance, **kwargs):
+    a, b = instance.requester_id, instance.addressee_id
+    # Rejecting (or re-opening) a request may undo an accepted edge
+    if instance.status == 'accepted':
+        transaction.on_commit(lambda: friend_graph.add_edge(a, b))
+    else:
+        transaction.on_commit(lambda: friend_graph.remove_edge(a, b))
+
+
+@receiver(post_delete, sender=Friendship)
+def unlink_friend_graph(sender, instance, **kwargs):
+    a, b = instance.requester_id, instance.addressee_id
+    transaction.on_commit(lambda: friend_graph.remove_edge(a, b))
+
+
+@receiver(post_save, sender=Friendship)
+def sync_feed_friendship(sender, instance, **kwargs):
+    # Only a move into or out of accepted changes what the two timelines hold
+    previous = getattr(instance, '_loaded_status', None)
+    if instance.status == 'accepted' and previous != 'accepted':
+        feed.backfill(instance.requester_id, instance.addressee_id)
+    elif instance.status != 'accepted' and previous == 'accepted':
+        feed.unlink(instance.requester_id, instance.addressee_id)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Friendship)
+def unlink_feed_friendship(sender, instance, **kwargs):
+    feed.unlink(instance.requester_id, instance.addressee_id)
+
+
+# Fan-out can insert thousands of rows; publish after commit so it never runs under
+# the resource row lock that rate() holds, and a rolled-back write publishes nothing
+@receiver(post_save, sender=Resource)
+def publish_upload(sender, instance, created, **kwargs):
+    if created:
+        actor_id, resource_id = instance.user_id, instance.pk
+        transaction.on_commit(lambda: feed.publish(actor_id, 'upload', resource_id))
+
+
+@receiver(post_save, sender=Rating)
+def publish_rating(sender, instance, created, **kwargs):
+    # Re-rating edits the row in place and is not news
+    if created:
+        actor_id, resource_id, rating_id = instance.user_id, instance.resource_id, instance.pk
+        transaction.on_commit(lambda: feed.publish(actor_id, 'rating', resource_id, rating_id))
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_resource_responses(sender, instance, **kwargs):
+    invalidate_owner(instance.user_id)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_rated_resource_responses(sender, instance, **kwargs):
+    if Rating._meta.get_field('resource').is_cached(instance):
+        owner_id = instance.resource.user_id
+    else:
+        owner_id = Resource.objects.filter(pk=instance.resource_id).values_list('user_id', flat=True).first()
+    if owner_id is not None:
+        invalidate_owner(owner_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    # Logging in only stamps last_login, which no resource response shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Deactivation, password or profile changes must not be served from a cached user
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
@@ -0,0 +1,128 @@
+# resources/similarity.py
+"""
+"Teachers who downloaded this also downloaded…".
+
+Downloads form a sparse user x resource matrix with a 1 wherever a user
+downloaded a resource. The similarity of resources i and j is the cosine
+of their columns:
+
+    co(i, j) / sqrt(users(i) * users(j))
+
+where co counts the users who downloaded both. build() keeps the TOP_K
+most similar resources of each resource in ResourceNeighbour, so serving
+them is one indexed lookup.
+
+Memory stays bounded however large Download grows:
+- per-resource user counts come from one GROUP BY, so O(resources);
+- resources are processed in id ranges of ITEM_CHUNK. For each range,
+  the baskets (distinct resources per user) of users who touched it are
+  streamed in user order, and only co-counts with a member of the range
+  are kept;
+- baskets larger than MAX_BASKET are skipped. A user who downloaded half
+  the catalogue says little about any pair and would cost
+  O(basket ** 2).
+
+Each range's neighbours are replaced in their own transaction, so
+readers see either the old or the new list for a resource.
+"""
+import heapq
+import itertools
+import math
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+DEFAULTS = {
+    'TOP_K': 20,               # neighbours kept per resource
+    'ITEM_CHUNK': 2000,        # resources whose co-counts are held at once
+    'MAX_BASKET': 500,         # larger baskets are skipped
+    'MIN_CO_DOWNLOADS': 2,     # pairs seen together less often are noise
+    'STREAM_CHUNK': 10000,     # rows fetched per round trip while streaming baskets
+}
+
+
+def _config(key, overrides=None):
+    if overrides and overrides.get(key) is not None:
+        return overrides[key]
+    return getattr(settings, 'SIMILAR_RESOURCES', {}).get(key, DEFAULTS[key])
+
+
+def download_counts():
+    """{resource_id: number of distinct users who downloaded it}"""
+    from .models import Download
+    return dict(
+        Download.objects.order_by().values('resource_id')
+        .annotate(users=Count('user_id', distinct=True)).values_list('resource_id', 'users')
+    )
+
+
+def _baskets(lo, hi, stream_chunk):
+    """Yield the distinct resource ids of each user who downloaded something with lo < id <= hi"""
+    from .models import Download
+    users = Download.objects.filter(resource_id__gt=lo, resource_id__lte=hi).values('user_id')
+    pairs = (
+        Download.objects.filter(user_id__in=users)
+        .order_by('user_id', 'resource_id').values_list('user_id', 'resource_id').distinct()
+        .iterator(chunk_size=stream_chunk)
+    )
+    for _, rows in itertools.groupby(pairs, key=lambda row: row[0]):
+        yield [resource_id for _, resource_id in rows]
+
+
+def neighbours_for_range(lo, hi, counts, options=None):
+    """{resource_id: [(score, neighbour_id), ...]} for resources with lo < id <= hi"""
+    max_basket = _config('MAX_BASKET', options)
+    co_counts = defaultdict(Counter)
+    for basket in _baskets(lo, hi, _config('STREAM_CHUNK', options)):
+        if len(basket) > max_basket:
+            continue
+        for resource_id in basket:
+            if lo < resource_id <= hi:
+                co_counts[resource_id].update(basket)
+
+    top_k, min_co = _config('TOP_K', options), _config('MIN_CO_DOWNLOADS', options)
+    result = {}
+    for resource_id, row in co_counts.items():
+        del row[resource_id]
+        scored = (
+            (co / math.sqrt(counts[resource_id] * counts[other]), other)
+            for other, co in row.items() if co >= min_co
+        )
+        # Ties go to the lower id so rebuilds are deterministic
+        best = heapq.nlargest(top_k, scored, key=lambda item: (item[0], -item[1]))
+        if best:
+            result[resource_id] = best
+    return result
+
+
+def _write_range(lo, hi, neighbours):
+    from .models import ResourceNeighbour
+    with transaction.atomic():
+        ResourceNeighbour.objects.filter(resource_id__gt=lo, resource_id__lte=hi).delete()
+        ResourceNeighbour.objects.bulk_create([
+            ResourceNeighbour(resource_id=resource_id, neighbour_id=other, score=score, rank=rank)
+            for resource_id, best in neighbours.items()
+            for rank, (score, other) in enumerate(best)
+        ], batch_size=1000)
+
+
+def build(options=None, progress=None):
+    """Recompute every resource's neighbours; returns the number of neighbour rows written"""
+    from .models import ResourceNeighbour
+    counts = download_counts()
+    ids = sorted(counts)
+    chunk = _config('ITEM_CHUNK', options)
+    written = 0
+    lo = 0
+    for start in range(0, len(ids), chunk):
+        # Ranges are contiguous, so stale rows of resources nobody downloads any more are dropped too
+        hi = ids[min(start + chunk, len(ids)) - 1]
+        neighbours = neighbours_for_range(lo, hi, counts, options)
+        _write_range(lo, hi, neighbours)
+        written += sum(len(best) for best in neighbours.values())
+        if progress:
+            progress(min(start + chunk, len(ids)), len(ids))
+        lo = hi
+    ResourceNeighbour.objects.filter(resource_id__gt=lo).delete()
+    return written
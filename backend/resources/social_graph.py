@@ -0,0 +1,157 @@
+# resources/social_graph.py
+"""
+In-memory friendship graph for friend-of-friend suggestions.
+
+Accepted friendships are loaded once into integer-indexed adjacency
+arrays: user ids map to dense node numbers, and each node keeps an
+array('l') of its neighbours' node numbers. That is a few bytes per edge
+instead of a model instance or tuple, and walking two hops needs no
+database at all.
+
+signals.py patches the graph of this process after a friendship commits:
+accepting adds the edge, and rejecting or deleting removes it. Other
+processes rebuild theirs once it is REBUILD_INTERVAL seconds old, so
+their suggestions can lag a friendship change by at most that long.
+
+suggest() walks the user's friends, low-degree friends first, and stops
+once MAX_WORK neighbour entries have been read. A user whose friends
+have thousands of friends each costs a bounded amount per request; the
+result is then marked truncated.
+"""
+import threading
+import time
+from array import array
+from collections import Counter
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULTS = {
+    'MAX_WORK': 20000,          # neighbour entries read per suggestion request
+    'REBUILD_INTERVAL': 300,    # seconds before a process reloads the graph from the database
+    'INSTITUTION_WEIGHT': 2,    # a shared institution counts as this many mutual friends
+    'MAX_CANDIDATES': 500,      # friends of friends whose institution is looked up
+}
+
+
+def _config(key):
+    return getattr(settings, 'FRIEND_SUGGESTIONS', {}).get(key, DEFAULTS[key])
+
+
+class FriendGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._index = {}           # user id -> node
+        self._ids = array('q')     # node -> user id
+        self._adjacency = []       # node -> array of neighbour nodes
+
+    def _node(self, user_id):
+        node = self._index.get(user_id)
+        if node is None:
+            node = self._index[user_id] = len(self._ids)
+            self._ids.append(user_id)
+            self._adjacency.append(array('l'))
+        return node
+
+    def _ensure_built(self):
+        if self._built_at is not None and time.monotonic() - self._built_at < _config('REBUILD_INTERVAL'):
+            return
+        from .models import Friendship
+        pairs = (Friendship.objects.filter(status='accepted')
+                 .values_list('requester_id', 'addressee_id').iterator(chunk_size=10000))
+        self._reset()
+        # FriendshipViewSet refuses a request when either direction exists, so pairs are unique
+        for a, b in pairs:
+            self._link(a, b)
+        self._built_at = time.monotonic()
+
+    def _link(self, a, b):
+        node_a, node_b = self._node(a), self._node(b)
+        self._adjacency[node_a].append(node_b)
+        self._adjacency[node_b].append(node_a)
+
+    def add_edge(self, a, b):
+        with self._lock:
+            # An unbuilt graph reads the edge from the database when it is first used
+            if self._built_at is None:
+                return
+            node_a, node_b = self._node(a), self._node(b)
+            if node_b not in self._adjacency[node_a]:
+                self._adjacency[node_a].append(node_b)
+                self._adjacency[node_b].append(node_a)
+
+    def remove_edge(self, a, b):
+        with self._lock:
+            node_a, node_b = self._index.get(a), self._index.get(b)
+            if self._built_at is None or node_a is None or node_b is None:
+                return
+            for node, other in ((node_a, node_b), (node_b, node_a)):
+                neighbours = self._adjacency[node]
+                if other in neighbours:
+                    neighbours.remove(other)
+
+    def suggest(self, user_id, max_work=None):
+        """({candidate id: mutual friend count}, truncated) for a user's friends of friends"""
+        max_work = max_work or _config('MAX_WORK')
+        with self._lock:
+            self._ensure_built()
+            node = self._index.get(user_id)
+            if node is None:
+                return {}, False
+            friends = self._adjacency[node]
+            mutual = Counter()
+            work = 0
+            truncated = False
+            # Small neighbourhoods first: they are cheap and say the most about each candidate
+            for friend in sorted(friends, key=lambda f: len(self._adjacency[f])):
+                neighbours = self._adjacency[friend]
+                if work + len(neighbours) > max_work:
+                    truncated = True
+                    break
+                work += len(neighbours)
+                mutual.update(neighbours)
+            excluded = set(friends)
+            excluded.add(node)
+            return {self._ids[n]: count for n, count in mutual.items() if n not in excluded}, truncated
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._built_at = None
+
+
+friend_graph = FriendGraph()
+
+
+def suggest_friends(user, limit):
+    """
+    ([(candidate id, mutual friends, shared institution), ...] best first, truncated).
+    Friends of friends are scored by mutual friends, plus INSTITUTION_WEIGHT for a shared
+    institution; colleagues with no mutual friends fill in behind them.
+    """
+    from .friends import get_friend_ids
+    from .models import Friendship, User
+    mutual, truncated = friend_graph.suggest(user.id)
+
+    # Open or rejected requests in either direction are not suggested again
+    excluded = {user.id} | set(get_friend_ids(user.id))
+    for pair in Friendship.objects.filter(Q(requester=user) | Q(addressee=user)).values_list(
+            'requester_id', 'addressee_id'):
+        excluded.update(pair)
+    candidates = sorted((c for c in mutual if c not in excluded), key=lambda c: (-mutual[c], c))
+    candidates = candidates[:_config('MAX_CANDIDATES')]
+    shared = {c: False for c in candidates}
+    if user.institution:
+        shared.update((c, True) for c in User.objects.filter(
+            id__in=candidates, institution=user.institution).values_list('id', flat=True))
+        colleagues = (User.objects.filter(institution=user.institution).exclude(id__in=candidates)
+                      .order_by('-created_at', '-id').values_list('id', flat=True)[:limit + len(excluded)])
+        shared.update((c, True) for c in colleagues if c not in excluded)
+
+    weight = _config('INSTITUTION_WEIGHT')
+    score = {c: mutual.get(c, 0) + (weight if is_shared else 0) for c, is_shared in shared.items()}
+    top = sorted(score, key=lambda c: (-score[c], c))[:limit]
+    return [(c, mutual.get(c, 0), shared[c]) for c in top], truncated
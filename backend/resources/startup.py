@@ -0,0 +1,68 @@
+# resources/startup.py
+"""
+Import-time profile of a cold start.
+
+A fresh interpreter run with `python -X importtime` does what a new worker
+does before its first response. It sets up Django and loads the URLconf,
+which imports every view, serializer and model module. The per-module
+timings Python writes to stderr are parsed into ImportRecords.
+
+The numbers include Python's own start-up imports (encodings, site) and
+vary with the machine and the state of the bytecode cache, so budgets
+should leave generous headroom. MODULES_NOT_AT_STARTUP lists modules that
+must stay deferred until first use; unlike a time budget, that check
+never flakes.
+"""
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from django.conf import settings
+
+# Startup import budget, in milliseconds of cumulative top-level import time
+IMPORT_BUDGET_MS = 1500
+
+# Loaded on first use of a Cloudinary storage, not by a cold start
+MODULES_NOT_AT_STARTUP = ('cloudinary', 'cloudinary_storage.storage')
+
+STARTUP_CODE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output):
+    records = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def profile_startup(settings_module=None):
+    """Start a fresh interpreter the way a worker starts and return its ImportRecords"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1',
+               DJANGO_SETTINGS_MODULE=settings_module or os.environ['DJANGO_SETTINGS_MODULE'])
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def total_ms(records):
+    """Wall-clock import time: the sum of the top-level imports"""
+    return sum(record.cumulative_us for record in records if record.depth == 0) / 1000
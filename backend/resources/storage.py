@@ -0,0 +1,100 @@
+# resources/storage.py
+"""
+Storage for uploaded resource files, chosen by settings.RESOURCE_STORAGE.
+
+Resource.file takes resource_storage as a callable, so switching between
+Cloudinary and the local filesystem is a settings change rather than a
+migration.
+
+Django calls that callable when the models are imported. Importing the
+Cloudinary backend pulls in the whole SDK (and requests), and
+cloudinary_storage configures it from CLOUDINARY_STORAGE as a side effect.
+resource_storage therefore returns a LazyStorage. The backend is imported,
+configured and built the first time a file is read, written or linked,
+not during process start.
+
+asave() and aurl() are the async views' way in (see async_views.py). A
+backend with its own asave/aurl coroutines is awaited directly; a sync
+one, such as the Cloudinary SDK, runs in a worker thread so the event
+loop keeps serving other requests while it waits on the network.
+"""
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+
+# Storage methods that must reach the backend; the base class versions would not
+DELEGATED_METHODS = (
+    'open', 'save', 'get_valid_name', 'get_alternative_name', 'get_available_name',
+    'generate_filename', 'path', 'delete', 'exists', 'listdir', 'size', 'url',
+    'get_accessed_time', 'get_created_time', 'get_modified_time', '_open', '_save',
+)
+
+
+class LazyStorage(Storage):
+    """A Storage that imports and builds its backend on first use"""
+
+    def __init__(self, backend, options=None):
+        self._backend_path = backend
+        self._options = options or {}
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = import_string(self._backend_path)(**self._options)
+        return self._backend
+
+    def __getattr__(self, name):
+        # Only called for attributes Storage does not define, e.g. location or base_url
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def __repr__(self):
+        return f'<LazyStorage {self._backend_path}>'
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        return getattr(self.backend, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in DELEGATED_METHODS:
+    setattr(LazyStorage, _name, _delegate(_name))
+
+
+def resource_storage():
+    config = getattr(settings, 'RESOURCE_STORAGE', {})
+    return LazyStorage(config.get('BACKEND', DEFAULT_BACKEND), config.get('OPTIONS', {}))
+
+
+def serves_locally(storage):
+    """True when files are on this server's disk and can be streamed by the API"""
+    if isinstance(storage, LazyStorage):
+        storage = storage.backend
+    return isinstance(storage, FileSystemStorage)
+
+
+async def asave(storage, name, content, max_length=None):
+    """storage.save() without blocking the event loop; returns the name actually stored"""
+    native = getattr(storage, 'asave', None)
+    if native is not None:
+        return await native(name, content, max_length=max_length)
+    return await sync_to_async(storage.save, thread_sensitive=False)(name, content, max_length=max_length)
+
+
+async def aurl(storage, name):
+    """storage.url() without blocking the event loop"""
+    native = getattr(storage, 'aurl', None)
+    if native is not None:
+        return await native(name)
+    return await sync_to_async(storage.url, thread_sensitive=False)(name)
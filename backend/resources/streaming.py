@@ -0,0 +1,142 @@
+# resources/streaming.py
+"""
+Streaming file responses for locally stored resources.
+
+serve_file() answers a GET for a stored file without reading it into
+memory: the file is sent in CHUNK_SIZE blocks, a single "Range: bytes=..."
+gets a 206 with just that slice, and If-None-Match returns 304. With
+FILE_DOWNLOADS['X_ACCEL_REDIRECT'] (nginx) or ['X_SENDFILE'] (Apache,
+lighttpd) set, the response only carries a header and the web server sends
+the bytes itself.
+
+The download action hands out signed, short-lived links to the file
+endpoint because browsers open them without the API token.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags
+
+DEFAULTS = {
+    'CHUNK_SIZE': 64 * 1024,     # bytes read per iteration
+    'LINK_MAX_AGE': 300,         # seconds a signed download link stays valid
+    'X_ACCEL_REDIRECT': None,    # internal nginx location prefix, e.g. '/protected/'
+    'X_SENDFILE': False,         # send X-Sendfile with the file's absolute path
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+SIGNING_SALT = 'resources.file-link'
+
+
+def _config(key):
+    return getattr(settings, 'FILE_DOWNLOADS', {}).get(key, DEFAULTS[key])
+
+
+def sign_link(resource):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(f'{resource.pk}:{resource.file.name}')
+
+
+def check_link(token, resource):
+    """True when token was signed for this resource's current file and has not expired"""
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=_config('LINK_MAX_AGE'))
+    except signing.BadSignature:
+        return False
+    return value == f'{resource.pk}:{resource.file.name}'
+
+
+def file_etag(name, size, modified):
+    digest = hashlib.md5(f'{name}:{size}:{modified.timestamp()}'.encode(), usedforsecurity=False)
+    return f'"{digest.hexdigest()}"'
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single satisfiable byte range, None to
+    send the whole file, or False when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        # Multiple or malformed ranges: a full 200 response is always allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _chunks(handle, start, length, chunk_size):
+    try:
+        handle.seek(start)
+        while length > 0:
+            data = handle.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        handle.close()
+
+
+def serve_file(request, field_file):
+    storage, name = field_file.storage, field_file.name
+    size = storage.size(name)
+    modified = storage.get_modified_time(name)
+    etag = file_etag(name, size, modified)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    accel_prefix, sendfile = _config('X_ACCEL_REDIRECT'), _config('X_SENDFILE')
+    if accel_prefix or sendfile:
+        # The web server handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + name.lstrip('/')
+        else:
+            response['X-Sendfile'] = storage.path(name)
+    else:
+        start, end = byte_range or (0, size - 1)
+        length = max(0, end - start + 1)
+        response = StreamingHttpResponse(
+            _chunks(storage.open(name, 'rb'), start, length, _config('CHUNK_SIZE')),
+            status=206 if byte_range else 200,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified.timestamp())
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(name)}"'
+    return response
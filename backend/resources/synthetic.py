@@ -0,0 +1,302 @@
+# resources/synthetic.py
+"""
+Deterministic synthetic dataset generation for capacity testing.
+
+Every table is generated in fixed-size chunks, and each chunk draws from its
+own random.Random seeded with (seed, table, chunk number). A given seed and
+set of parameters therefore produce the same rows whether the chunks run
+in one process or are spread over several workers.
+
+Shapes are chosen to look like real usage rather than uniform noise:
+- uploads and downloads follow Zipf-like popularity, so a few prolific
+  teachers and a few popular worksheets dominate;
+- friendships follow a Chung-Lu graph with Pareto-distributed expected
+  degrees (most users have a handful of friends, a few have hundreds);
+- a configurable share of profiles is private.
+
+Resources get file names only; no bytes go through Cloudinary. With
+file_dir set, each file is written to that local directory instead.
+"""
+import bisect
+import itertools
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone as dt_timezone
+
+SUBJECTS = ['Math', 'Science', 'Language Arts', 'Social Studies', 'Art', 'Music', 'Physical Education']
+GRADE_LEVELS = ['K-2', '3-5', '6-8', '9-12', 'Higher Education']
+RESOURCE_TYPES = ['lesson_plan', 'worksheet', 'video', 'presentation', 'assessment', 'other']
+FRIENDSHIP_STATUSES = (['accepted'] * 16) + (['pending'] * 3) + ['rejected']
+TITLE_WORDS = ['Fractions', 'Photosynthesis', 'Grammar', 'Constitution', 'Rhythm', 'Geometry',
+               'Ecosystems', 'Algebra', 'Poetry', 'Fitness', 'Watercolor', 'Chemistry',
+               'Civilizations', 'Probability', 'Shakespeare', 'Volcanoes']
+TITLE_KINDS = ['Basics', 'Worksheet', 'Review', 'Unit Plan', 'Quiz', 'Activities', 'Study Guide']
+
+HISTORY_DAYS = 730
+
+
+@dataclass
+class SyntheticParams:
+    users: int
+    resources_per_user: float = 10
+    downloads_per_user: float = 100
+    ratings_per_user: float = 100
+    mean_friends: float = 20
+    private_ratio: float = 0.2
+    seed: int = 1014
+    chunk_size: int = 10000
+    user_id_base: int = 1
+    resource_id_base: int = 1
+    epoch: float = 0.0          # POSIX time every generated timestamp is relative to
+    password_hash: str = '!'    # shared hash, computed once instead of per user
+    file_dir: str = ''
+
+    @property
+    def resources(self):
+        return int(self.users * self.resources_per_user)
+
+    @property
+    def downloads(self):
+        return int(self.users * self.downloads_per_user)
+
+    @property
+    def ratings(self):
+        return int(self.users * self.ratings_per_user)
+
+    @property
+    def friendships(self):
+        return int(self.users * self.mean_friends / 2)
+
+
+PHASES = ['users', 'resources', 'friendships', 'ratings', 'downloads']
+
+
+def phase_size(params, phase):
+    return {
+        'users': params.users,
+        'resources': params.resources,
+        'friendships': params.friendships,
+        'ratings': params.ratings,
+        'downloads': params.downloads,
+    }[phase]
+
+
+def chunks(params, phase):
+    size = phase_size(params, phase)
+    return [(start, min(start + params.chunk_size, size)) for start in range(0, size, params.chunk_size)]
+
+
+def _rng(params, phase, start):
+    return random.Random(f'{params.seed}:{phase}:{start}')
+
+
+def _spread(index, salt):
+    """A fixed pseudo-random fraction in [0, 1) for an index, without any RNG state"""
+    return ((index + 1) * 0.6180339887498949 + salt * 0.4142135623730951) % 1.0
+
+
+def _timestamp(params, fraction_of_history):
+    seconds_ago = (1.0 - fraction_of_history) * HISTORY_DAYS * 86400
+    return datetime.fromtimestamp(params.epoch - seconds_ago, tz=dt_timezone.utc)
+
+
+def resource_created_fraction(index):
+    return _spread(index, 1)
+
+
+class _WeightedIndex:
+    """Sample indexes 0..n-1 with Zipf weights 1/(rank+1)^s over a fixed shuffled ranking"""
+
+    def __init__(self, n, exponent, seed):
+        ranking = list(range(n))
+        random.Random(seed).shuffle(ranking)
+        weights = [0.0] * n
+        for rank, index in enumerate(ranking):
+            weights[index] = 1.0 / (rank + 1) ** exponent
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1] if n else 0.0
+
+    def sample(self, rng):
+        return bisect.bisect_left(self.cumulative, rng.random() * self.total)
+
+
+_samplers = {}
+
+
+def _sampler(params, name, n, exponent):
+    """Weight tables are rebuilt identically in every worker and cached per process"""
+    key = (params.seed, name, n, exponent)
+    if key not in _samplers:
+        _samplers[key] = _WeightedIndex(n, exponent, f'{params.seed}:{name}')
+    return _samplers[key]
+
+
+def _resource_owner(params, index):
+    # Resource owners are fixed per resource so other phases can look them up without a query
+    rng = random.Random(f'{params.seed}:owner:{index}')
+    return _sampler(params, 'uploaders', params.users, 1.0).sample(rng)
+
+
+def _friend_weight(params, user_index):
+    # Heavy-tailed expected degree, capped so no one befriends more than a tenth of the site
+    rng = random.Random(f'{params.seed}:degree:{user_index}')
+    return min(rng.paretovariate(2.1), params.users / 10 + 1)
+
+
+def build_chunk(params, phase, start, stop):
+    """Return the unsaved model instances for rows start..stop of a phase"""
+    from .models import User, Resource, Rating, Download, Friendship
+    rng = _rng(params, phase, start)
+
+    if phase == 'users':
+        institutions = max(1, params.users // 40)
+        rows = []
+        for i in range(start, stop):
+            uid = params.user_id_base + i
+            joined = _timestamp(params, _spread(i, 2) * 0.5)
+            rows.append(User(
+                id=uid, username=f'user{uid}', email=f'user{uid}@example.com',
+                password=params.password_hash,
+                institution=f'Institution {rng.randrange(institutions)}',
+                bio='Synthetic profile', is_private=rng.random() < params.private_ratio,
+                date_joined=joined, created_at=joined, updated_at=joined,
+            ))
+        return rows
+
+    if phase == 'resources':
+        rows = []
+        for j in range(start, stop):
+            rid = params.resource_id_base + j
+            created = _timestamp(params, resource_created_fraction(j))
+            resource_type = rng.choice(RESOURCE_TYPES)
+            title = f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_KINDS)} {rid}'
+            name = f'resources/synthetic/{rid}.txt'
+            if params.file_dir:
+                path = os.path.join(params.file_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as handle:
+                    handle.write(f'{title}\n')
+            rows.append(Resource(
+                id=rid, user_id=params.user_id_base + _resource_owner(params, j),
+                title=title, description=f'A {resource_type.replace("_", " ")} about {title.split()[0].lower()}',
+                file=name, resource_type=resource_type,
+                subject=rng.choice(SUBJECTS), grade_level=rng.choice(GRADE_LEVELS),
+                created_at=created, updated_at=created,
+            ))
+        return rows
+
+    if phase == 'friendships':
+        # Chung-Lu: pick both endpoints proportionally to their expected degree
+        weights = _friendship_sampler(params)
+        rows = []
+        for _ in range(start, stop):
+            a = bisect.bisect_left(weights[0], rng.random() * weights[1])
+            b = bisect.bisect_left(weights[0], rng.random() * weights[1])
+            if a == b:
+                continue
+            a, b = min(a, b), max(a, b)
+            created = _timestamp(params, 0.5 + rng.random() * 0.5)
+            rows.append(Friendship(
+                requester_id=params.user_id_base + a, addressee_id=params.user_id_base + b,
+                status=rng.choice(FRIENDSHIP_STATUSES), created_at=created, updated_at=created,
+            ))
+        return rows
+
+    popularity = _sampler(params, 'popularity', params.resources, 0.9)
+    rows = []
+    for _ in range(start, stop):
+        user_index = rng.randrange(params.users)
+        j = popularity.sample(rng)
+        if _resource_owner(params, j) == user_index:
+            continue
+        created = resource_created_fraction(j)
+        when = _timestamp(params, created + rng.random() * (1.0 - created))
+        user_id, resource_id = params.user_id_base + user_index, params.resource_id_base + j
+        if phase == 'ratings':
+            # Popular resources skew positive
+            rows.append(Rating(user_id=user_id, resource_id=resource_id,
+                               rating=min(5, max(1, round(rng.gauss(3.8, 1.0)))),
+                               comment='', created_at=when))
+        else:
+            rows.append(Download(user_id=user_id, resource_id=resource_id, downloaded_at=when))
+    return rows
+
+
+_friendship_weights = {}
+
+
+def _friendship_sampler(params):
+    key = (params.seed, params.users)
+    if key not in _friendship_weights:
+        cumulative = list(itertools.accumulate(_friend_weight(params, i) for i in range(params.users)))
+        _friendship_weights[key] = (cumulative, cumulative[-1])
+    return _friendship_weights[key]
+
+
+@contextmanager
+def explicit_timestamps():
+    """Let bulk_create keep generated created_at/updated_at instead of stamping now()"""
+    from .models import User, Resource, Rating, Friendship
+    fields = [
+        model._meta.get_field(name)
+        for model, names in ((User, ('created_at', 'updated_at')), (Resource, ('created_at', 'updated_at')),
+                             (Rating, ('created_at',)), (Friendship, ('created_at', 'updated_at')))
+        for name in names
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def write_chunk(params_dict, phase, start, stop, batch_size):
+    """Generate and insert one chunk; top-level so worker processes can run it"""
+    from django.db import transaction
+    params = SyntheticParams(**params_dict)
+    rows = build_chunk(params, phase, start, stop)
+    model = type(rows[0]) if rows else None
+    if model is not None:
+        with explicit_timestamps(), transaction.atomic():
+            # Ratings and downloads can collide on their unique keys; the duplicate is simply dropped
+            model.objects.bulk_create(rows, batch_size=batch_size,
+                                      ignore_conflicts=phase in ('friendships', 'ratings', 'downloads'))
+    return phase, len(rows)
+
+
+def generate(params, workers=1, batch_size=2000, progress=None):
+    """Insert the whole dataset phase by phase; returns {phase: rows generated}"""
+    from django.db import connections
+    totals = {}
+    params_dict = asdict(params)
+    for phase in PHASES:
+        started = time.monotonic()
+        tasks = [(params_dict, phase, start, stop, batch_size) for start, stop in chunks(params, phase)]
+        if workers > 1 and len(tasks) > 1:
+            import multiprocessing
+            connections.close_all()  # forked workers must open their own connections
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                results = pool.starmap(write_chunk, tasks)
+        else:
+            results = [write_chunk(*task) for task in tasks]
+        totals[phase] = sum(count for _, count in results)
+        if progress:
+            progress(phase, totals[phase], time.monotonic() - started)
+    return totals
+
+
+def reset_sequences(models):
+    """Explicit primary keys leave PostgreSQL sequences behind; move them past the new rows"""
+    from django.core.management.color import no_style
+    from django.db import connection
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
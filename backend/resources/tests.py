@@ -1,3 +1,1679 @@
-from django.test import TestCase
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import cloudinary
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import URLResolver
+from rest_framework.test import APIClient
+
+from rest_framework.authtoken.models import Token
+
+from . import benchmark, similarity, startup, trending, uploads, urls as resource_urls
+from .authentication import CachedTokenAuthentication, TokenUserCache, token_cache
+from .budgets import BudgetDataset, ENDPOINT_BUDGETS, measure, record_queries
+from .counters import download_counts
+from .file_urls import file_url_cache
+from .events import QueuedDownloadSink, get_download_sink, reset_download_sink
+from .friends import FriendSetCache, friend_cache
+from .response_cache import response_cache
+from .social_graph import friend_graph
+from .models import (
+    User, Resource, Rating, Download, Friendship, SavedResource, UploadSession, TrendingScore, TrendingState,
+    ResourceNeighbour, Activity, FeedEntry,
+)
+from .serializers import ResourceSerializer
+from .storage import LazyStorage, serves_locally
+
+# Resource URLs are built locally by the Cloudinary SDK, which only needs a cloud name.
+# The storage configures the SDK lazily from settings, so load that first or it would reset the name.
+import cloudinary_storage.storage  # noqa: E402,F401
+cloudinary.config(cloud_name='edushare-test')
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    # One test process: its LocMem cache is shared by every "worker" in it
+    FRIEND_CACHE={'CACHE_ALIAS': 'default'},
+    TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'},
+    RESPONSE_CACHE={'ENABLED': True, 'CACHE_ALIAS': 'default'},
+)
+class APITestCase(TestCase):
+    """Base class with helpers for creating users and resources"""
+
+    def setUp(self):
+        # Ids are reused after each test's rollback, so process-local caches must not carry over
+        friend_cache.clear()
+        file_url_cache.clear()
+        response_cache.clear()
+        token_cache.clear()
+        friend_graph.clear()
+
+    def make_user(self, username, **kwargs):
+        return User.objects.create_user(username=username, password='password123', **kwargs)
+
+    def make_resource(self, user, title='Algebra Fundamentals', **kwargs):
+        defaults = {
+            'description': 'Basic algebraic concepts',
+            'file': f"resources/{title.lower().replace(' ', '_')}.txt",
+            'resource_type': 'lesson_plan',
+            'subject': 'Math',
+            'grade_level': '6-8',
+        }
+        defaults.update(kwargs)
+        return Resource.objects.create(user=user, title=title, **defaults)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('ms_smith')
+        self.rater = self.make_user('student_alex')
+        self.resource = self.make_resource(self.owner)
+
+    def test_rate_maintains_count_and_sum(self):
+        client = self.client_for(self.rater)
+        client.post(f'/api/resources/{self.resource.id}/rate/', {'rating': 4})
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.rating_count, self.resource.rating_sum), (1, 4))
+
+        # Re-rating replaces the previous value instead of adding another one
+        client.post(f'/api/resources/{self.resource.id}/rate/', {'rating': 2})
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.rating_count, self.resource.rating_sum), (1, 2))
+
+        other = self.make_user('student_casey')
+        self.client_for(other).post(f'/api/resources/{self.resource.id}/rate/', {'rating': 5})
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.get_average_rating(), 3.5)
+
+    def test_rate_does_not_touch_updated_at(self):
+        updated_at = self.resource.updated_at
+        self.client_for(self.rater).post(f'/api/resources/{self.resource.id}/rate/', {'rating': 3})
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.updated_at, updated_at)
+
+    def test_list_query_count_is_constant(self):
+        client = self.client_for(self.rater)
+        client.get('/api/resources/')  # warm the viewer's friend set
+        with CaptureQueriesContext(connection) as small:
+            client.get('/api/resources/', {'paginate': 'false'})
+        for i in range(10):
+            resource = self.make_resource(self.make_user(f'teacher_{i}'), title=f'Worksheet {i}')
+            Rating.objects.create(user=self.rater, resource=resource, rating=3)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get('/api/resources/', {'paginate': 'false'})
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(len(small), len(large))
+
+    def test_reconcile_ratings_repairs_drift(self):
+        Rating.objects.create(user=self.rater, resource=self.resource, rating=5)
+        Resource.objects.filter(pk=self.resource.pk).update(rating_count=7, rating_sum=1)
+        out = StringIO()
+        call_command('reconcile_ratings', batch_size=1, stdout=out)
+        self.resource.refresh_from_db()
+        self.assertEqual((self.resource.rating_count, self.resource.rating_sum), (1, 5))
+        self.assertIn('fixed 1', out.getvalue())
+
+
+class UserStatsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = self.make_user('ms_smith')
+
+    def befriend(self, a, b):
+        return Friendship.objects.create(requester=a, addressee=b, status='accepted')
+
+    def test_detail_reports_annotated_stats(self):
+        teacher = self.make_user('prof_williams')
+        first = self.make_resource(teacher, title='Ancient Civilizations Unit')
+        self.make_resource(teacher, title='U.S. Constitution Overview')
+        first.apply_rating_change(None, 5)
+        first.apply_rating_change(None, 2)
+        self.befriend(teacher, self.viewer)
+        self.befriend(self.make_user('student_jordan'), teacher)
+        Friendship.objects.create(requester=teacher, addressee=self.make_user('coach_miller'))
+
+        data = self.client_for(self.viewer).get(f'/api/users/{teacher.id}/').data
+        self.assertEqual(data['total_uploads'], 2)
+        self.assertEqual(data['average_rating'], 3.5)
+        self.assertEqual(data['friend_count'], 2)
+        # The annotations agree with the per-user fallbacks
+        self.assertEqual(data['average_rating'], teacher.get_average_rating())
+
+    def test_search_query_count_is_constant(self):
+        client = self.client_for(self.viewer)
+        self.make_user('teacher_0')
+        with CaptureQueriesContext(connection) as small:
+            client.get('/api/users/', {'search': 'teacher', 'paginate': 'false'})
+        for i in range(1, 15):
+            teacher = self.make_user(f'teacher_{i}')
+            self.make_resource(teacher).apply_rating_change(None, 4)
+            self.befriend(self.viewer, teacher)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get('/api/users/', {'search': 'teacher', 'paginate': 'false'})
+        self.assertEqual(len(response.data), 15)
+        self.assertEqual(len(small), len(large))
+
+    def test_friends_lists_both_directions(self):
+        sent = self.make_user('student_alex')
+        received = self.make_user('student_casey')
+        self.befriend(self.viewer, sent)
+        self.befriend(received, self.viewer)
+        Friendship.objects.create(requester=self.viewer, addressee=self.make_user('blogger_sam'))
+
+        data = self.client_for(self.viewer).get(f'/api/users/{self.viewer.id}/friends/').data
+        self.assertEqual(sorted(u['username'] for u in data), ['student_alex', 'student_casey'])
+        self.assertTrue(all(u['friend_count'] == 1 for u in data))
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('ms_smith')
+        self.client = self.client_for(self.user)
+        self.resources = [
+            self.make_resource(self.user, title=f'Worksheet {i}', subject='Math' if i % 2 else 'Art')
+            for i in range(7)
+        ]
+        # Identical timestamps force the id tiebreaker to do its job
+        Resource.objects.filter(id__in=[r.id for r in self.resources[2:5]]).update(
+            created_at=self.resources[2].created_at
+        )
+
+    def walk(self, url, params, key='next'):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data[key]:
+                return seen, response
+            response = self.client.get(response.data[key])
+
+    def test_pages_cover_everything_once_in_order(self):
+        seen, last = self.walk('/api/resources/', {'page_size': 3})
+        expected = list(Resource.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page returns the earlier pages in order
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([item['id'] for item in previous.data['results']], expected[3:6])
+
+    def test_cursor_combines_with_filters(self):
+        seen, _ = self.walk('/api/resources/', {'page_size': 2, 'subject': 'Math', 'search': 'Worksheet'})
+        self.assertEqual(sorted(seen), sorted(r.id for r in self.resources if r.subject == 'Math'))
+
+    def test_opt_out_returns_plain_list(self):
+        response = self.client.get('/api/resources/', {'paginate': 'false'})
+        self.assertEqual(len(response.data), 7)
+
+    def test_downloads_paginate_on_downloaded_at(self):
+        for resource in self.resources:
+            Download.objects.create(user=self.user, resource=resource)
+        seen, _ = self.walk(f'/api/users/{self.user.id}/downloads/', {'page_size': 4})
+        expected = list(Download.objects.order_by('-downloaded_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(self.client.get('/api/downloads/').data['results']), 7)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/resources/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('ms_smith')
+        self.client = self.client_for(self.user)
+        self.algebra = self.make_resource(self.user, title='Algebra Fundamentals',
+                                          description='Solving linear equations')
+        self.calculus = self.make_resource(self.user, title='Calculus Review',
+                                           description='Limits, derivatives and some algebra practice')
+        self.art = self.make_resource(self.user, title='Color Theory Basics', subject='Art',
+                                      description='Color wheels and relationships')
+
+    def ids(self, params):
+        params = {'paginate': 'false', **params}
+        return [item['id'] for item in self.client.get('/api/resources/', params).data]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.ids({'q': 'algebra'}), [self.algebra.id, self.calculus.id])
+
+    def test_prefix_and_stemmed_terms_match(self):
+        self.assertEqual(self.ids({'q': 'deriv'}), [self.calculus.id])
+        self.assertEqual(self.ids({'q': 'equation'}), [self.algebra.id])
+
+    def test_index_follows_save_and_delete(self):
+        self.art.title = 'Watercolor Techniques'
+        self.art.save()
+        self.assertEqual(self.ids({'q': 'watercolor'}), [self.art.id])
+        self.assertEqual(self.ids({'q': 'theory'}), [])
+        self.art.delete()
+        self.assertEqual(self.ids({'q': 'watercolor'}), [])
+
+    def test_respects_visibility_and_filters(self):
+        private = self.make_user('mr_johnson', is_private=True)
+        self.make_resource(private, title='Algebra Secrets')
+        self.assertEqual(self.ids({'q': 'algebra', 'subject': 'Math'}), [self.algebra.id, self.calculus.id])
+        self.assertEqual(self.ids({'search': 'algebra', 'subject': 'Art'}), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        response = self.client.get('/api/resources/', {'q': 'algebra" OR title:*', 'paginate': 'false'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_paginates_by_rank(self):
+        first = self.client.get('/api/resources/', {'q': 'algebra', 'page_size': 1})
+        second = self.client.get(first.data['next'])
+        self.assertEqual([first.data['results'][0]['id'], second.data['results'][0]['id']],
+                         [self.algebra.id, self.calculus.id])
+        self.assertIsNone(second.data['next'])
+
+
+class FriendCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('mr_johnson', is_private=True)
+        self.viewer = self.make_user('ms_smith')
+        self.resource = self.make_resource(self.owner, title='Photosynthesis Explained')
+        self.request = Friendship.objects.create(requester=self.viewer, addressee=self.owner)
+
+    def visible_ids(self):
+        data = self.client_for(self.viewer).get('/api/resources/', {'paginate': 'false'}).data
+        return [item['id'] for item in data]
+
+    def test_repeated_checks_hit_the_cache(self):
+        self.owner.is_friend_with(self.viewer)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.owner.is_friend_with(self.viewer)
+                self.viewer.is_friend_with(self.owner)
+        self.assertEqual(len(queries), 1)
+
+    def test_accept_and_delete_invalidate(self):
+        self.assertEqual(self.visible_ids(), [])
+        self.assertEqual(
+            self.client_for(self.viewer).get(f'/api/users/{self.owner.id}/resources/').status_code, 403
+        )
+
+        self.client_for(self.owner).post(f'/api/friendships/{self.request.id}/accept/')
+        self.assertEqual(self.visible_ids(), [self.resource.id])
+        self.assertEqual(
+            self.client_for(self.viewer).get(f'/api/users/{self.owner.id}/resources/').status_code, 200
+        )
+
+        self.client_for(self.viewer).delete(f'/api/friendships/{self.request.id}/')
+        self.assertEqual(self.visible_ids(), [])
+
+    @override_settings(FRIEND_CACHE={'CACHE_ALIAS': None})
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.viewer.is_friend_with(self.owner)
+        self.assertEqual(len(queries), 3)
+
+    def test_unfriend_reaches_other_processes(self):
+        self.request.status = 'accepted'
+        self.request.save()
+        # Another worker's cache, warmed before the unfriend
+        other_worker = FriendSetCache()
+        self.assertEqual(other_worker.get(self.viewer.id), {self.owner.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(other_worker.get(self.viewer.id), {self.owner.id})
+        self.assertEqual(len(queries), 0)
+
+        self.client_for(self.viewer).delete(f'/api/friendships/{self.request.id}/')
+        self.assertEqual(other_worker.get(self.viewer.id), frozenset())
+        self.assertEqual(other_worker.get(self.owner.id), frozenset())
+
+    def test_reject_keeps_resources_hidden(self):
+        self.client_for(self.owner).post(f'/api/friendships/{self.request.id}/reject/')
+        self.assertFalse(self.viewer.is_friend_with(self.owner))
+        self.assertEqual(self.visible_ids(), [])
+
+
+class DownloadCountTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('creator_pat')
+        self.downloader = self.make_user('student_alex')
+        self.resource = self.make_resource(self.owner, title='Geometry Worksheet')
+
+    def download(self):
+        return self.client_for(self.downloader).post(f'/api/resources/{self.resource.id}/download/')
+
+    def test_increment_is_atomic_and_leaves_updated_at(self):
+        updated_at = self.resource.updated_at
+        with CaptureQueriesContext(connection) as queries:
+            self.download()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 1)
+        self.assertEqual(self.resource.updated_at, updated_at)
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE'))
+        self.assertIn('"download_count" = ("resources_resource"."download_count" + 1)', update)
+        self.assertNotIn('"title"', update)
+
+    def test_buffered_mode_batches_increments(self):
+        other = self.make_resource(self.owner, title='Calculus Review')
+        with self.settings(DOWNLOAD_COUNTER={'BUFFERED': True, 'FLUSH_INTERVAL': 3600}):
+            for _ in range(3):
+                self.download()
+            self.client_for(self.downloader).post(f'/api/resources/{other.id}/download/')
+            self.resource.refresh_from_db()
+            self.assertEqual(self.resource.download_count, 0)
+            self.assertEqual(download_counts.pending(), {self.resource.id: 3, other.id: 1})
+
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(download_counts.flush(), 4)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries), 2)
+        self.resource.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.resource.download_count, other.download_count), (3, 1))
+        self.assertEqual(Download.objects.count(), 4)
+
+    def test_reconcile_download_counts(self):
+        self.download()
+        self.download()
+        Resource.objects.filter(pk=self.resource.pk).update(download_count=57)
+        out = StringIO()
+        call_command('reconcile_download_counts', batch_size=1, stdout=out)
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+        self.assertIn('fixed 1', out.getvalue())
+
+    def test_reconcile_flushes_buffered_counts_first(self):
+        err = StringIO()
+        with self.settings(DOWNLOAD_COUNTER={'BUFFERED': True, 'FLUSH_INTERVAL': 3600}):
+            self.download()
+            self.download()
+            call_command('reconcile_download_counts', stdout=StringIO(), stderr=err)
+            self.assertEqual(download_counts.pending(), {})
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+        self.assertIn('buffering is on', err.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QueuedDownloadSinkTests(TransactionTestCase):
+    """Runs with real commits so the writer thread sees the rows and its own inserts"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='student_alex')
+        self.resource = Resource.objects.create(
+            user=self.user, title='Rhythm Exercises', description='Beats', file='resources/rhythm.txt',
+            resource_type='worksheet', subject='Music', grade_level='3-5',
+        )
+
+    def test_no_events_lost_under_backpressure(self):
+        import threading
+        sink = QueuedDownloadSink(max_queue=5, batch_size=4, flush_interval=0.05, put_timeout=0.01)
+        threads = [
+            threading.Thread(target=lambda: [sink.record(self.user.id, self.resource.id) for _ in range(25)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sink.shutdown()
+        self.assertEqual(Download.objects.count(), 100)
+        self.assertEqual(sink.written, 100)
+        self.assertEqual(sink.failed, 0)
+
+    def test_shutdown_flushes_queued_events(self):
+        sink = QueuedDownloadSink(max_queue=100, batch_size=50, flush_interval=60)
+        for _ in range(7):
+            sink.record(self.user.id, self.resource.id)
+        sink.shutdown()
+        self.assertEqual(Download.objects.count(), 7)
+        # Events arriving after shutdown are written inline rather than dropped
+        sink.record(self.user.id, self.resource.id)
+        self.assertEqual(Download.objects.count(), 8)
+
+    def test_bad_event_does_not_sink_its_batch(self):
+        sink = QueuedDownloadSink(max_queue=100, batch_size=50, flush_interval=60)
+        sink.record(self.user.id, self.resource.id)
+        sink.record(self.user.id, self.resource.id + 999)
+        sink.record(self.user.id, self.resource.id)
+        with self.assertLogs('resources.events', 'ERROR'):
+            sink.shutdown()
+        self.assertEqual(Download.objects.count(), 2)
+        self.assertEqual(sink.failed, 1)
+
+    def test_rolled_back_downloads_are_not_queued(self):
+        sink = QueuedDownloadSink(max_queue=100, batch_size=50, flush_interval=60)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                sink.record_many(self.user.id, [self.resource.id, self.resource.id])
+                self.assertEqual(sink.qsize(), 0)
+                raise RuntimeError('rolled back')
+        self.assertEqual(sink.qsize(), 0)
+        with transaction.atomic():
+            sink.record(self.user.id, self.resource.id)
+        self.assertEqual(sink.qsize(), 1)
+        sink.shutdown()
+        self.assertEqual(Download.objects.count(), 1)
+
+    def test_download_action_uses_configured_sink(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with self.settings(DOWNLOAD_EVENTS={'SINK': 'queued', 'FLUSH_INTERVAL': 60}):
+            reset_download_sink()
+            self.assertIsInstance(get_download_sink(), QueuedDownloadSink)
+            client.post(f'/api/resources/{self.resource.id}/download/')
+            self.assertEqual(Download.objects.count(), 0)
+            reset_download_sink()
+        self.assertEqual(Download.objects.count(), 1)
+
+
+# A cached response runs no SQL, which would hide any plan
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class QueryPlanTests(APITestCase):
+    """
+    EXPLAIN every SELECT the API issues and fail on a full table scan. Index
+    scans, primary-key searches and FTS lookups are all fine; a bare
+    "SCAN <table>" means a query no longer matches any index.
+    """
+    full_scan = re.compile(r'^SCAN (\S+)$')
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('ms_smith')
+        self.friend = self.make_user('mr_johnson', is_private=True)
+        Friendship.objects.create(requester=self.user, addressee=self.friend, status='accepted')
+        Friendship.objects.create(requester=self.make_user('student_alex'), addressee=self.user)
+        self.resource = self.make_resource(self.friend, title='Photosynthesis Explained', subject='Science')
+        self.make_resource(self.user, title='Algebra Fundamentals')
+        Rating.objects.create(user=self.user, resource=self.resource, rating=4)
+        Download.objects.create(user=self.user, resource=self.resource)
+        SavedResource.objects.create(user=self.user, resource=self.resource)
+
+    def endpoints(self):
+        user_url = f'/api/users/{self.user.id}'
+        resource_url = f'/api/resources/{self.resource.id}'
+        return [
+            ('/api/resources/', {}),
+            ('/api/resources/', {'subject': 'Science'}),
+            ('/api/resources/', {'grade_level': '6-8'}),
+            ('/api/resources/', {'resource_type': 'worksheet'}),
+            ('/api/resources/', {'q': 'photosynthesis'}),
+            (f'{resource_url}/', {}),
+            (f'{resource_url}/ratings/', {}),
+            ('/api/users/', {}),
+            (f'{user_url}/', {}),
+            (f'/api/users/{self.friend.id}/resources/', {}),
+            (f'{user_url}/ratings/', {}),
+            (f'{user_url}/downloads/', {}),
+            (f'{user_url}/friends/', {}),
+            (f'{user_url}/saved_resources/', {}),
+            ('/api/downloads/', {}),
+            ('/api/friendships/', {}),
+        ]
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_detects_an_unindexed_filter(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan inspection is written for SQLite')
+        sql = str(Resource.objects.filter(description='Beats').values('id').query)
+        sql = sql.replace('= Beats', "= 'Beats'")
+        self.assertTrue(any(self.full_scan.match(step) for step in self.plan(sql)))
+
+    def test_no_endpoint_query_scans_a_table(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan inspection is written for SQLite')
+        client = self.client_for(self.user)
+        for url, params in self.endpoints():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            self.assertEqual(response.status_code, 200, url)
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                for step in self.plan(query['sql']):
+                    with self.subTest(url=url, params=params, step=step):
+                        self.assertIsNone(
+                            self.full_scan.match(step),
+                            f'{url} {params} scans a table:\n{query["sql"]}',
+                        )
+
+
+# Budgets are for the cold path, when no cached response exists yet
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class QueryBudgetTests(APITestCase):
+    """Every route in budgets.ENDPOINT_BUDGETS must stay within its query and time budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = BudgetDataset()
+
+    def test_endpoints_within_budget(self):
+        for budget in ENDPOINT_BUDGETS:
+            with self.subTest(route=budget.route):
+                client = self.client_for(getattr(self.dataset, budget.user)) if budget.user else APIClient()
+                measurement = measure(client, budget, self.dataset)
+                self.assertLess(measurement.status_code, 400, budget.route)
+                self.assertFalse(measurement.overrun(budget), '\n' + measurement.report(budget))
+
+    def test_every_route_has_a_budget(self):
+        def names(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from names(pattern.url_patterns)
+                elif pattern.name:
+                    yield pattern.name
+
+        # api-root is DRF's browsable index of the routes, not an endpoint
+        routes = set(names(resource_urls.urlpatterns)) - {'api-root'}
+        self.assertEqual(routes - {budget.route for budget in ENDPOINT_BUDGETS}, set())
+
+    def test_queries_are_attributed_to_serializer_fields(self):
+        resources = list(Resource.objects.all()[:5])
+        with record_queries() as records:
+            ResourceSerializer(resources, many=True).data
+        # Without select_related each row loads its owner for the StringRelatedField
+        self.assertEqual([label for label, _ in records], ['ResourceSerializer.user'] * 5)
+
+
+class SyntheticDatasetTests(TestCase):
+    options = dict(scale=60, resources_per_user=3, downloads_per_user=5, ratings_per_user=4,
+                   mean_friends=6, chunk_size=25, seed=7, stdout=StringIO())
+
+    def snapshot(self):
+        base_user = User.objects.order_by('id').values_list('id', flat=True).first()
+        base_resource = Resource.objects.order_by('id').values_list('id', flat=True).first()
+        return (
+            list(User.objects.order_by('id').values_list('institution', 'is_private')),
+            [(r[0] - base_user, r[1]) for r in Resource.objects.order_by('id').values_list('user_id', 'title')],
+            sorted((a - base_user, b - base_user, s) for a, b, s in
+                   Friendship.objects.values_list('requester_id', 'addressee_id', 'status')),
+            sorted((u - base_user, r - base_resource, v) for u, r, v in
+                   Rating.objects.values_list('user_id', 'resource_id', 'rating')),
+        )
+
+    def test_same_seed_generates_same_rows(self):
+        call_command('seed_data', **self.options)
+        first = self.snapshot()
+        for model in (Download, Rating, Friendship, Resource, User):
+            model.objects.all().delete()
+        call_command('seed_data', **self.options)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_derived_columns_are_consistent(self):
+        call_command('seed_data', **self.options)
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Resource.objects.count(), 180)
+        self.assertTrue(User.objects.filter(is_private=True).exists())
+        resource = Resource.objects.filter(rating_count__gt=0).first()
+        self.assertEqual(resource.rating_count, resource.ratings.count())
+        resource = Resource.objects.filter(download_count__gt=0).first()
+        self.assertEqual(resource.download_count, resource.downloads.count())
+        self.assertFalse(Rating.objects.filter(user=F('resource__user')).exists())
+
+
+class BenchmarkTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = BudgetDataset(scale=8)
+
+    def test_run_reports_every_get_route(self):
+        results = benchmark.run(requests=3, concurrency=1, targets=self.dataset)
+        self.assertEqual(set(results), {b.route for b in ENDPOINT_BUDGETS if b.method == 'get' and b.benchmark})
+        for result in results.values():
+            self.assertEqual((result.requests, result.errors), (3, 0), result.route)
+            self.assertLessEqual(result.p50_ms, result.p99_ms)
+            self.assertGreater(result.throughput, 0)
+
+    def test_compare_flags_slower_routes_and_extra_queries(self):
+        results = benchmark.run(requests=2, concurrency=1, routes=['resource-list'], targets=self.dataset)
+        baseline = benchmark.to_json(results)
+        self.assertEqual(benchmark.compare(results, baseline), [])
+
+        slower = dict(baseline['routes']['resource-list'], p95_ms=results['resource-list'].p95_ms / 10 - 5,
+                      queries=results['resource-list'].queries - 1)
+        regressions = benchmark.compare(results, {'routes': {'resource-list': slower}})
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('p95_ms', regressions[0])
+
+    def test_repeated_runs_bypass_the_response_cache(self):
+        results = benchmark.run(requests=2, concurrency=1, routes=['resource-list'], targets=self.dataset, runs=3)
+        result = results['resource-list']
+        self.assertEqual((result.requests, result.errors), (6, 0))
+        self.assertGreaterEqual(result.noise_ms, 0)
+        self.assertEqual(response_cache.hits, 0)
+
+    def test_compare_allows_for_run_to_run_noise(self):
+        baseline = benchmark.to_json({'resource-list': benchmark.RouteResult(
+            'resource-list', 10, 0, p50_ms=10, p95_ms=20, p99_ms=30, throughput=100, queries=1)})
+        noisy = benchmark.RouteResult('resource-list', 10, 0, p50_ms=10, p95_ms=30, p99_ms=30,
+                                      throughput=90, queries=1, noise_ms=12)
+        self.assertEqual(benchmark.compare({'resource-list': noisy}, baseline), [])
+        noisy.noise_ms = 5
+        self.assertEqual(len(benchmark.compare({'resource-list': noisy}, baseline)), 1)
+
+    def test_checked_in_baseline_covers_every_route(self):
+        with open(benchmark.DEFAULT_BASELINE) as handle:
+            baseline = json.load(handle)
+        routes = {b.route for b in ENDPOINT_BUDGETS if b.method == 'get' and b.benchmark}
+        self.assertEqual(set(baseline['routes']), routes)
+        self.assertEqual(baseline['meta']['scale'], 500)
+        self.assertIn('cpus', baseline['meta']['hardware'])
+
+    def test_mismatched_meta_names_what_differs(self):
+        baseline = {'meta': {'scale': 500, 'runs': 3, 'hardware': {'cpus': 8}}}
+        self.assertEqual(benchmark.mismatched_meta({'scale': 500, 'runs': 3, 'hardware': {'cpus': 8}}, baseline), [])
+        mismatches = benchmark.mismatched_meta({'scale': 50, 'runs': 3, 'hardware': {'cpus': 2}}, baseline)
+        self.assertEqual(len(mismatches), 2)
+        self.assertIn('scale: 50 vs baseline 500', mismatches[0])
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_token_cache_saves_a_query_per_request(self):
+        results = benchmark.compare_authentication(requests=3, concurrency=1, targets=self.dataset)
+        plain, cached = results['TokenAuthentication'], results['CachedTokenAuthentication']
+        self.assertEqual((plain.errors, cached.errors), (0, 0))
+        self.assertLess(cached.queries, plain.queries)
+
+
+class CountingStorage(Storage):
+    def __init__(self):
+        self.url_calls = []
+
+    def url(self, name):
+        self.url_calls.append(name)
+        return f'https://files.example.com/{name}'
+
+
+class FileURLCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = CountingStorage()
+        patcher = mock.patch.object(Resource._meta.get_field('file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.owner = self.make_user('owner')
+        self.resources = [self.make_resource(self.owner, title=f'Doc {n}') for n in range(4)]
+
+    def test_list_resolves_each_url_once(self):
+        client = self.client_for(self.owner)
+        response = client.get('/api/resources/', {'paginate': 'false'})
+        self.assertEqual(len(self.storage.url_calls), 4)
+        self.assertTrue(response.data[0]['file'].startswith('https://files.example.com/'))
+
+        client.get('/api/resources/', {'paginate': 'false'})
+        client.post(f'/api/resources/{self.resources[0].id}/download/')
+        self.assertEqual(len(self.storage.url_calls), 4)
+
+    def test_replacing_file_invalidates_its_url(self):
+        serialized = ResourceSerializer(Resource.objects.all(), many=True).data
+        self.assertEqual(len(self.storage.url_calls), 4)
+
+        resource = Resource.objects.get(pk=self.resources[0].pk)
+        resource.file = 'resources/replacement.txt'
+        resource.save()
+        serialized = ResourceSerializer(Resource.objects.all(), many=True).data
+        self.assertEqual(self.storage.url_calls[4:], ['resources/replacement.txt'])
+        self.assertIn('https://files.example.com/resources/replacement.txt', [r['file'] for r in serialized])
+
+    @override_settings(FILE_URL_CACHE={'TIMEOUT': 60})
+    def test_expired_urls_are_rebuilt(self):
+        with mock.patch('resources.file_urls.time.monotonic', return_value=1000.0):
+            ResourceSerializer(Resource.objects.all(), many=True).data
+        with mock.patch('resources.file_urls.time.monotonic', return_value=1030.0):
+            ResourceSerializer(Resource.objects.all(), many=True).data
+        self.assertEqual(len(self.storage.url_calls), 4)
+        with mock.patch('resources.file_urls.time.monotonic', return_value=1061.0):
+            ResourceSerializer(Resource.objects.all(), many=True).data
+        self.assertEqual(len(self.storage.url_calls), 8)
+
+    @override_settings(FILE_URL_CACHE={'MAX_ENTRIES': 2})
+    def test_cache_is_bounded(self):
+        ResourceSerializer(Resource.objects.all(), many=True).data
+        self.assertEqual(len(file_url_cache._entries), 2)
+
+
+class LocalFileStreamingTests(APITestCase):
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = FileSystemStorage(location=location, base_url='/media/')
+        patcher = mock.patch.object(Resource._meta.get_field('file'), 'storage', storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.owner = self.make_user('owner')
+        name = storage.save('resources/lesson.pdf', ContentFile(self.content))
+        self.resource = self.make_resource(self.owner, file=name)
+        self.url = f'/api/resources/{self.resource.id}/file/'
+        self.client = self.client_for(self.owner)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_streams_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'01234')
+        self.assertEqual(response['Content-Range'], 'bytes 10-14/100')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(self.body(response), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_download_returns_signed_link(self):
+        link = self.client.post(f'/api/resources/{self.resource.id}/download/').data['download_url']
+        anonymous = APIClient()
+        self.assertEqual(self.body(anonymous.get(link)), self.content)
+        self.assertEqual(anonymous.get(link + 'x').status_code, 403)
+        self.assertEqual(anonymous.get(self.url).status_code, 401)
+
+    def test_serialized_url_goes_through_the_file_action(self):
+        for path in ('/api/resources/', f'/api/resources/{self.resource.id}/'):
+            response = self.client.get(path)
+            data = response.data['results'][0] if 'results' in response.data else response.data
+            self.assertEqual(data['file'], f'http://testserver{self.url}')
+        self.assertEqual(self.body(self.client.get(data['file'])), self.content)
+        self.assertEqual(APIClient().get(data['file']).status_code, 401)
+
+    def test_private_owner_file_is_hidden(self):
+        self.owner.is_private = True
+        self.owner.save()
+        stranger = self.client_for(self.make_user('stranger'))
+        self.assertEqual(stranger.get(self.url).status_code, 404)
+
+    @override_settings(FILE_DOWNLOADS={'X_ACCEL_REDIRECT': '/protected/'})
+    def test_hands_off_to_web_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/resources/lesson.pdf')
+        self.assertEqual(response.content, b'')
+
+
+class UploadSessionTests(APITestCase):
+    content = b'abcdefghij'
+
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        patcher = mock.patch.object(Resource._meta.get_field('file'), 'storage',
+                                    FileSystemStorage(location=os.path.join(location, 'media')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(UPLOAD_SESSIONS={
+            'DIRECTORY': os.path.join(location, 'parts'), 'CHUNK_SIZE': 4,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = self.make_user('uploader')
+        self.client = self.client_for(self.user)
+
+    def open_session(self, **extra):
+        data = {'filename': 'lecture.mp4', 'size': len(self.content), 'title': 'Lecture',
+                'description': 'Recorded lecture', 'resource_type': 'video',
+                'subject': 'Science', 'grade_level': '9-12', **extra}
+        response = self.client.post('/api/uploads/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"/api/uploads/{response.data['id']}/"
+
+    def put_chunk(self, url, offset, chunk, checksum=None):
+        checksum = checksum or hashlib.sha256(chunk).hexdigest()
+        return self.client.generic('PUT', url, chunk, content_type='application/octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM=f'sha256 {checksum}')
+
+    def test_chunks_assemble_into_resource(self):
+        url = self.open_session(sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.put_chunk(url, 0, b'abcd')['Upload-Offset'], '4')
+        self.assertEqual(self.put_chunk(url, 4, b'efgh')['Upload-Offset'], '8')
+        response = self.put_chunk(url, 8, b'ij')
+        self.assertEqual(response.status_code, 201)
+
+        resource = Resource.objects.get(pk=response.data['id'])
+        self.assertEqual((resource.user, resource.title, resource.resource_type), (self.user, 'Lecture', 'video'))
+        with resource.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.assertEqual(UploadSession.objects.get().status, 'complete')
+
+    def test_resume_after_bad_chunk(self):
+        url = self.open_session()
+        self.put_chunk(url, 0, b'abcd')
+        response = self.put_chunk(url, 4, b'efgh', checksum='0' * 64)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (400, '4'))
+        # A chunk at the wrong offset is refused with the offset to resume from
+        response = self.put_chunk(url, 8, b'ij')
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '4'))
+
+        self.assertEqual(self.client.get(url).data['offset'], 4)
+        self.put_chunk(url, 4, b'efgh')
+        self.assertEqual(self.put_chunk(url, 8, b'ij').status_code, 201)
+        with Resource.objects.get().file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_whole_file_checksum_mismatch_resets_upload(self):
+        url = self.open_session(sha256='0' * 64)
+        self.put_chunk(url, 0, b'abcd')
+        self.put_chunk(url, 4, b'efgh')
+        response = self.put_chunk(url, 8, b'ij')
+        self.assertEqual((response.status_code, response['Upload-Offset']), (400, '0'))
+        self.assertFalse(Resource.objects.exists())
+
+    def test_sessions_are_private_to_their_owner(self):
+        url = self.open_session()
+        other = self.client_for(self.make_user('other'))
+        self.assertEqual(other.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_purge_removes_expired_sessions_and_parts(self):
+        abandoned, current = self.open_session(), self.open_session()
+        self.put_chunk(abandoned, 0, b'abcd')
+        self.put_chunk(current, 0, b'abcd')
+        abandoned_session, current_session = (UploadSession.objects.get(pk=url.split('/')[-2])
+                                              for url in (abandoned, current))
+        long_ago = timezone.now() - timedelta(days=2)
+        UploadSession.objects.filter(pk=abandoned_session.pk).update(updated_at=long_ago)
+        directory = os.path.dirname(uploads.part_path(current_session))
+        orphan = os.path.join(directory, f'{uuid.uuid4()}.part')
+        for path in (orphan, os.path.join(directory, 'notes.txt')):
+            with open(path, 'wb') as handle:
+                handle.write(b'left behind')
+        for path in (orphan, uploads.part_path(abandoned_session)):
+            os.utime(path, (long_ago.timestamp(), long_ago.timestamp()))
+
+        out = StringIO()
+        call_command('purge_upload_sessions', stdout=out)
+        self.assertIn('Deleted 1 expired upload sessions and 1 orphaned part files', out.getvalue())
+        self.assertEqual(list(UploadSession.objects.values_list('pk', flat=True)), [current_session.pk])
+        self.assertEqual(sorted(os.listdir(directory)), sorted([f'{current_session.pk}.part', 'notes.txt']))
+        self.assertEqual(self.client.get(current).data['offset'], 4)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('owner')
+        self.viewer = self.make_user('viewer')
+        self.resource = self.make_resource(self.owner)
+        self.client = self.client_for(self.viewer)
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_list_skips_serialization(self):
+        url = '/api/resources/'
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(ResourceSerializer, 'to_representation') as render:
+            response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+        # Another page of the same list is a different representation
+        self.assertEqual(self.revalidate(url, etag, page_size=1).status_code, 200)
+
+    def test_counter_changes_invalidate_list_and_detail(self):
+        list_etag = self.client.get('/api/resources/')['ETag']
+        detail_url = f'/api/resources/{self.resource.id}/'
+        detail_etag = self.client.get(detail_url)['ETag']
+        self.client.post(f'/api/resources/{self.resource.id}/download/')
+        self.assertEqual(self.revalidate('/api/resources/', list_etag).status_code, 200)
+        response = self.revalidate(detail_url, detail_etag)
+        self.assertEqual((response.status_code, response.data['download_count']), (200, 1))
+
+    def test_rerating_invalidates_ratings(self):
+        url = f'/api/resources/{self.resource.id}/ratings/'
+        self.client.post(f'/api/resources/{self.resource.id}/rate/', {'rating': 3})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.client.post(f'/api/resources/{self.resource.id}/rate/', {'rating': 5})
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_if_modified_since_on_detail(self):
+        url = f'/api/resources/{self.resource.id}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_list_ignores_if_modified_since(self):
+        doomed = self.make_resource(self.owner, 'Geometry')
+        url = '/api/resources/'
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        since = self.client.get(f'/api/resources/{self.resource.id}/')['Last-Modified']
+        doomed.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.resource.id])
+
+    def test_user_profile_validators_follow_stats(self):
+        url = f'/api/users/{self.owner.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        Friendship.objects.create(requester=self.owner, addressee=self.viewer, status='accepted')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_validators_are_per_viewer(self):
+        url = f'/api/users/{self.owner.id}/resources/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        other = self.client_for(self.owner)
+        self.assertEqual(other.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.public_owner = self.make_user('public_owner')
+        self.private_owner = self.make_user('private_owner', is_private=True)
+        self.public_resource = self.make_resource(self.public_owner, title='Public Doc')
+        self.private_resource = self.make_resource(self.private_owner, title='Private Doc')
+        self.viewer = self.make_user('viewer')
+        self.other_viewer = self.make_user('other_viewer')
+
+    def titles(self, user):
+        response = self.client_for(user).get('/api/resources/', {'paginate': 'false'})
+        return response['X-Cache'], sorted(r['title'] for r in response.data)
+
+    def test_public_viewers_share_entries(self):
+        self.assertEqual(self.titles(self.viewer), ('MISS', ['Public Doc']))
+        self.assertEqual(self.titles(self.other_viewer), ('HIT', ['Public Doc']))
+        # A hit only looks up the viewer's own is_saved/my_rating
+        with self.assertNumQueries(1):
+            self.client_for(self.viewer).get('/api/resources/', {'paginate': 'false'})
+        self.assertEqual(response_cache.stats()['hits'], 2)
+
+    def test_hits_carry_each_viewers_saved_and_rating_state(self):
+        SavedResource.objects.create(user=self.viewer, resource=self.public_resource)
+        Rating.objects.create(user=self.other_viewer, resource=self.public_resource, rating=3)
+        detail = f'/api/resources/{self.public_resource.id}/'
+        first = self.client_for(self.viewer).get(detail)
+        second = self.client_for(self.other_viewer).get(detail)
+        self.assertEqual((first['X-Cache'], first.data['is_saved'], first.data['my_rating']), ('MISS', True, None))
+        self.assertEqual((second['X-Cache'], second.data['is_saved'], second.data['my_rating']), ('HIT', False, 3))
+
+        etag = second['ETag']
+        client = self.client_for(self.other_viewer)
+        self.assertEqual(client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        SavedResource.objects.create(user=self.other_viewer, resource=self.public_resource)
+        response = client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['is_saved']), (200, True))
+
+    def test_resource_changes_invalidate(self):
+        self.titles(self.viewer)
+        self.public_resource.title = 'Renamed Doc'
+        self.public_resource.save()
+        self.assertEqual(self.titles(self.viewer), ('MISS', ['Renamed Doc']))
+
+        detail = f'/api/resources/{self.public_resource.id}/'
+        self.client_for(self.viewer).get(detail)
+        self.client_for(self.other_viewer).post(f'/api/resources/{self.public_resource.id}/rate/', {'rating': 4})
+        response = self.client_for(self.viewer).get(detail)
+        self.assertEqual((response['X-Cache'], response.data['rating_count']), ('MISS', 1))
+
+    def test_private_partitions_follow_friendships(self):
+        self.titles(self.viewer)
+        friendship = Friendship.objects.create(requester=self.viewer, addressee=self.private_owner,
+                                               status='accepted')
+        self.assertEqual(self.titles(self.viewer), ('MISS', ['Private Doc', 'Public Doc']))
+        # A change to the private owner's resources only touches that partition
+        self.assertEqual(self.titles(self.other_viewer)[0], 'HIT')
+        self.private_resource.title = 'Private Notes'
+        self.private_resource.save()
+        self.assertEqual(self.titles(self.other_viewer)[0], 'HIT')
+        self.assertEqual(self.titles(self.viewer), ('MISS', ['Private Notes', 'Public Doc']))
+
+        friendship.delete()
+        # Back to the public partition alone, whose entry is still current
+        self.assertEqual(self.titles(self.viewer), ('HIT', ['Public Doc']))
+
+    def test_privacy_flip_invalidates(self):
+        self.titles(self.viewer)
+        self.public_owner.is_private = True
+        self.public_owner.save()
+        self.assertEqual(self.titles(self.viewer), ('MISS', []))
+
+    def test_cache_stats_are_admin_only(self):
+        self.titles(self.viewer)
+        self.assertEqual(self.client_for(self.viewer).get('/api/resources/cache_stats/').status_code, 403)
+        admin = self.make_user('admin', is_staff=True)
+        stats = self.client_for(admin).get('/api/resources/cache_stats/').data
+        self.assertEqual(stats['responses']['misses'], 1)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CachedTokenAuthTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('teacher')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def query_count(self, path='/api/resources/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_repeat_requests_skip_the_token_lookup(self):
+        self.query_count()
+        # Warm the other caches, then time the same request with and without the token entry
+        token_cache.invalidate(self.token.key)
+        token_cache.clear()
+        uncached = self.query_count()
+        self.assertEqual(self.query_count(), uncached - 1)
+        self.assertEqual(token_cache.hits, 1)
+
+    def test_deleted_token_is_rejected(self):
+        self.query_count()
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/resources/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.query_count()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/resources/').status_code, 401)
+
+    def test_profile_changes_are_picked_up(self):
+        auth = CachedTokenAuthentication()
+        self.assertEqual(auth.authenticate_credentials(self.token.key)[0].username, 'teacher')
+        self.user.username = 'head_teacher'
+        self.user.save()
+        self.assertEqual(auth.authenticate_credentials(self.token.key)[0].username, 'head_teacher')
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': None})
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        self.query_count()
+        uncached = self.query_count()
+        self.assertEqual(self.query_count(), uncached)
+        self.assertEqual(token_cache.hits, 0)
+
+    def test_invalidation_reaches_other_processes(self):
+        # Another worker's cache; signals here invalidate through this process's token_cache
+        other_worker = TokenUserCache()
+        other_worker.set(self.token.key, self.user, self.token)
+        self.assertEqual(other_worker.get(self.token.key)[0].username, 'teacher')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other_worker.get(self.token.key))
+
+        key = self.token.key
+        other_worker.set(key, self.user, self.token)
+        self.token.delete()
+        self.assertIsNone(other_worker.get(key))
+
+    def test_requests_get_their_own_user_copy(self):
+        auth = CachedTokenAuthentication()
+        first, _ = auth.authenticate_credentials(self.token.key)
+        first.username = 'changed in memory'
+        second, _ = auth.authenticate_credentials(self.token.key)
+        self.assertEqual(second.username, 'teacher')
+
+
+class StartupTests(TestCase):
+    def test_cold_start_imports_stay_within_budget(self):
+        records = startup.profile_startup()
+        loaded = {record.module for record in records}
+        self.assertIn('resources.views', loaded)
+        for module in startup.MODULES_NOT_AT_STARTUP:
+            self.assertNotIn(module, loaded)
+        self.assertLess(startup.total_ms(records), startup.IMPORT_BUDGET_MS)
+
+    def test_storage_backend_is_built_on_first_use(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = LazyStorage('django.core.files.storage.FileSystemStorage',
+                              {'location': location, 'base_url': '/media/'})
+        self.assertIsNone(storage._backend)
+        name = storage.save('resources/notes.txt', ContentFile(b'notes'))
+        self.assertEqual((storage.url(name), storage.size(name)), ('/media/resources/notes.txt', 5))
+        self.assertEqual(storage.location, location)
+        self.assertTrue(serves_locally(storage))
+
+
+class BulkEndpointTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = self.make_user('viewer')
+        self.owner = self.make_user('owner')
+        self.private_owner = self.make_user('private_owner', is_private=True)
+        self.resources = [self.make_resource(self.owner, title=f'Doc {n}') for n in range(8)]
+        self.hidden = self.make_resource(self.private_owner, title='Hidden Doc')
+        self.client = self.client_for(self.viewer)
+
+    def post(self, action, ids):
+        response = self.client.post(f'/api/resources/{action}/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return {row['id']: row['status'] for row in response.data['results']}
+
+    def query_count(self, action, ids):
+        with CaptureQueriesContext(connection) as queries:
+            self.post(action, ids)
+        return len(queries)
+
+    def test_bulk_save_reports_each_id(self):
+        first, second = self.resources[:2]
+        SavedResource.objects.create(user=self.viewer, resource=first)
+        results = self.post('bulk_save', [first.id, second.id, self.hidden.id, 999999, second.id])
+        self.assertEqual(results, {first.id: 'already_saved', second.id: 'saved',
+                                   self.hidden.id: 'not_found', 999999: 'not_found'})
+        self.assertEqual(set(SavedResource.objects.filter(user=self.viewer).values_list('resource_id', flat=True)),
+                         {first.id, second.id})
+
+    def test_bulk_unsave_reports_each_id(self):
+        first, second = self.resources[:2]
+        SavedResource.objects.create(user=self.viewer, resource=first)
+        results = self.post('bulk_unsave', [first.id, second.id, self.hidden.id])
+        self.assertEqual(results, {first.id: 'unsaved', second.id: 'not_saved', self.hidden.id: 'not_found'})
+        self.assertFalse(SavedResource.objects.filter(user=self.viewer).exists())
+
+    def test_bulk_download_records_visible_resources(self):
+        ids = [r.id for r in self.resources[:3]] + [self.hidden.id]
+        response = self.client.post('/api/resources/bulk_download/', {'ids': ids}, format='json')
+        statuses = [(row['id'], row['status']) for row in response.data['results']]
+        self.assertEqual(statuses, [(pk, 'recorded') for pk in ids[:3]] + [(self.hidden.id, 'not_found')])
+        self.assertTrue(all(row['download_url'] for row in response.data['results'][:3]))
+        self.assertEqual(Download.objects.filter(user=self.viewer).count(), 3)
+        self.assertEqual(sorted(Resource.objects.filter(id__in=ids).values_list('download_count', flat=True)),
+                         [0, 1, 1, 1])
+
+    def test_query_count_does_not_grow_with_ids(self):
+        ids = [r.id for r in self.resources]
+        # Load the viewer's friend set first, so both sides find it cached
+        self.client.get('/api/resources/', {'ids': ids[0]})
+        for action in ('bulk_save', 'bulk_unsave', 'bulk_download'):
+            self.assertEqual(self.query_count(action, ids[:1]), self.query_count(action, ids[1:]), action)
+
+    def test_lookup_by_ids_keeps_order_and_visibility(self):
+        wanted = [self.resources[3].id, self.hidden.id, self.resources[0].id]
+        response = self.client.get('/api/resources/', {'ids': ','.join(map(str, wanted))})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.resources[3].id, self.resources[0].id])
+        self.assertEqual(response.data['not_found'], [self.hidden.id])
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ([], 'a,b', list(range(1, 200))):
+            response = self.client.post('/api/resources/bulk_save/', {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+        self.assertEqual(self.client.get('/api/resources/', {'ids': '1,x'}).status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ViewerStateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = self.make_user('viewer')
+        self.owner = self.make_user('owner')
+        self.resources = [self.make_resource(self.owner, title=f'Doc {n}') for n in range(4)]
+        SavedResource.objects.create(user=self.viewer, resource=self.resources[1])
+        SavedResource.objects.create(user=self.viewer, resource=self.resources[3])
+        Rating.objects.create(user=self.viewer, resource=self.resources[3], rating=5)
+
+    def test_list_renders_is_saved_and_my_rating(self):
+        response = self.client_for(self.viewer).get('/api/resources/', {'paginate': 'false'})
+        state = {r['id']: (r['is_saved'], r['my_rating']) for r in response.data}
+        self.assertEqual(state, {
+            self.resources[0].id: (False, None), self.resources[1].id: (True, None),
+            self.resources[2].id: (False, None), self.resources[3].id: (True, 5),
+        })
+        # The owner sees their own state, not the viewer's
+        response = self.client_for(self.owner).get(f'/api/resources/{self.resources[3].id}/')
+        self.assertEqual((response.data['is_saved'], response.data['my_rating']), (False, None))
+
+    def test_saved_resources_is_one_query_newest_first(self):
+        SavedResource.objects.filter(resource=self.resources[1]).update(saved_at=F('saved_at') + timedelta(hours=1))
+        client = self.client_for(self.viewer)
+        client.get(f'/api/users/{self.viewer.id}/')  # Authentication and object lookup queries, out of the way
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/users/{self.viewer.id}/saved_resources/')
+        self.assertEqual([r['id'] for r in response.data], [self.resources[1].id, self.resources[3].id])
+        self.assertTrue(all(r['is_saved'] for r in response.data))
+        resource_queries = [q['sql'] for q in queries if 'resources_savedresource' in q['sql']]
+        self.assertEqual(len(resource_queries), 1)
+        self.assertIn('JOIN', resource_queries[0])
+
+
+@override_settings(TRENDING={'HALF_LIFE_HOURS': 24, 'DOWNLOAD_WEIGHT': 1.0, 'RATING_WEIGHT': 2.0, 'BATCH_SIZE': 3})
+class TrendingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.viewer = self.make_user('viewer')
+        self.owner = self.make_user('owner')
+        self.private_owner = self.make_user('private_owner', is_private=True)
+        self.math = self.make_resource(self.owner, title='Math Doc')
+        self.art = self.make_resource(self.owner, title='Art Doc', subject='Art')
+        self.hidden = self.make_resource(self.private_owner, title='Hidden Doc')
+        self.now = timezone.now()
+        trending.reset(self.now)
+
+    def download(self, resource, hours_ago=0, count=1):
+        Download.objects.bulk_create([
+            Download(user=self.viewer, resource=resource,
+                     downloaded_at=self.now - timedelta(hours=hours_ago, microseconds=n))
+            for n in range(count)
+        ])
+
+    def ranking(self, **params):
+        response = self.client_for(self.viewer).get('/api/resources/trending/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(r['title'], r['trending_score']) for r in response.data['results']]
+
+    def test_scores_decay_with_age(self):
+        self.download(self.math, hours_ago=24, count=4)
+        self.download(self.art, count=3)
+        Rating.objects.create(user=self.viewer, resource=self.math, rating=5)
+        self.assertEqual(trending.refresh(self.now), 8)
+        scores = dict(TrendingScore.objects.values_list('resource_id', 'score'))
+        # Four downloads one half-life ago count as two; the rating adds two more
+        self.assertAlmostEqual(scores[self.math.id], 4.0, places=3)
+        self.assertAlmostEqual(scores[self.art.id], 3.0, places=3)
+
+    def test_refresh_only_reads_new_events(self):
+        self.download(self.art, count=5)
+        trending.refresh(self.now)
+        state = TrendingState.objects.get()
+        self.assertEqual(state.last_download_id, Download.objects.latest('id').id)
+        self.assertEqual(trending.refresh(self.now), 0)
+        self.download(self.art, hours_ago=0.001, count=2)
+        self.assertEqual(trending.refresh(self.now), 2)
+        self.assertAlmostEqual(TrendingScore.objects.get(resource=self.art).score, 7.0, places=3)
+
+    def test_rebase_keeps_current_scores(self):
+        self.download(self.math, count=8)
+        trending.refresh(self.now)
+        later = self.now + timedelta(hours=48)
+        before = trending.decay_factor(later) * TrendingScore.objects.get(resource=self.math).score
+        trending.rebase(later)
+        self.assertEqual(TrendingState.objects.get().epoch, later)
+        self.assertAlmostEqual(TrendingScore.objects.get(resource=self.math).score, before, places=6)
+        self.assertAlmostEqual(before, 2.0, places=3)
+
+    def test_endpoint_ranks_visible_resources_with_filters(self):
+        self.download(self.math, count=2)
+        self.download(self.art, count=4)
+        self.download(self.hidden, count=9)
+        trending.refresh(self.now)
+        self.assertEqual([title for title, _ in self.ranking()], ['Art Doc', 'Math Doc'])
+        self.assertEqual([title for title, _ in self.ranking(subject='Math')], ['Math Doc'])
+        self.assertEqual(len(self.ranking(limit=1)), 1)
+
+        Friendship.objects.create(requester=self.viewer, addressee=self.private_owner, status='accepted')
+        self.assertEqual(self.ranking()[0][0], 'Hidden Doc')
+
+
+class SimilarResourcesTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('owner')
+        self.private_owner = self.make_user('private_owner', is_private=True)
+        self.a, self.b, self.c = (self.make_resource(self.owner, title=f'Doc {n}') for n in 'abc')
+        self.hidden = self.make_resource(self.private_owner, title='Hidden Doc')
+        self.teachers = [self.make_user(f'teacher_{n}') for n in range(4)]
+        # a and b share three downloaders, a and c two, a and hidden two
+        baskets = [
+            [self.a, self.b, self.c, self.hidden],
+            [self.a, self.b, self.c, self.hidden],
+            [self.a, self.b],
+            [self.b],
+        ]
+        for teacher, basket in zip(self.teachers, baskets):
+            for resource in basket:
+                Download.objects.create(user=teacher, resource=resource)
+        # A repeat download must not count twice
+        Download.objects.create(user=self.teachers[2], resource=self.a)
+
+    def neighbours(self, resource):
+        return list(ResourceNeighbour.objects.filter(resource=resource).order_by('rank')
+                    .values_list('neighbour_id', 'score'))
+
+    def test_build_stores_cosine_top_k(self):
+        similarity.build({'TOP_K': 2})
+        neighbours = self.neighbours(self.a)
+        self.assertEqual([pk for pk, _ in neighbours], [self.b.id, self.c.id])
+        self.assertAlmostEqual(neighbours[0][1], 3 / math.sqrt(3 * 4))
+        self.assertAlmostEqual(neighbours[1][1], 2 / math.sqrt(3 * 2))
+
+    def test_chunked_build_matches_single_pass(self):
+        similarity.build({'ITEM_CHUNK': 1000})
+        single = sorted(ResourceNeighbour.objects.values_list('resource_id', 'neighbour_id', 'score'))
+        similarity.build({'ITEM_CHUNK': 1})
+        chunked = sorted(ResourceNeighbour.objects.values_list('resource_id', 'neighbour_id', 'score'))
+        self.assertEqual(chunked, single)
+
+        # A resource nobody downloads any more loses its old neighbour rows
+        Download.objects.filter(resource=self.c).delete()
+        similarity.build({'ITEM_CHUNK': 1})
+        self.assertFalse(ResourceNeighbour.objects.filter(Q(resource=self.c) | Q(neighbour=self.c)).exists())
+
+    def test_large_baskets_are_skipped(self):
+        similarity.build({'MAX_BASKET': 3})
+        self.assertEqual([pk for pk, _ in self.neighbours(self.a)], [])
+
+    def test_endpoint_filters_by_visibility(self):
+        similarity.build()
+        viewer = self.teachers[0]
+        url = f'/api/resources/{self.a.id}/similar/'
+        response = self.client_for(viewer).get(url)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.b.id, self.c.id])
+        self.assertIn('similarity', response.data['results'][0])
+
+        Friendship.objects.create(requester=viewer, addressee=self.private_owner, status='accepted')
+        response = self.client_for(viewer).get(url, {'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIn(self.hidden.id, [r['id'] for r in response.data['results']])
+        self.assertEqual(self.client_for(viewer).get(f'/api/resources/{self.hidden.id}/similar/').status_code, 200)
+        self.assertEqual(self.client_for(self.owner).get(f'/api/resources/{self.hidden.id}/similar/').status_code, 404)
+
+
+class FriendSuggestionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.me = self.make_user('me', institution='Lincoln High')
+        self.alice, self.bob, self.carol = (self.make_user(name) for name in ('alice', 'bob', 'carol'))
+        self.dave = self.make_user('dave')
+        self.erin = self.make_user('erin', institution='Lincoln High')
+        self.frank = self.make_user('frank', institution='Lincoln High')
+        for a, b in [(self.me, self.alice), (self.me, self.bob),
+                     (self.alice, self.carol), (self.bob, self.carol), (self.alice, self.dave),
+                     (self.alice, self.erin)]:
+            self.befriend(a, b)
+
+    def befriend(self, a, b):
+        return Friendship.objects.create(requester=a, addressee=b, status='accepted')
+
+    def suggestions(self, **params):
+        response = self.client_for(self.me).get(f'/api/users/{self.me.id}/suggestions/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(r['username'], r['mutual_friends'], r['shared_institution']) for r in response.data['results']]
+
+    def test_ranks_by_mutual_friends_and_institution(self):
+        # A shared institution is worth two mutual friends
+        self.assertEqual(self.suggestions(), [
+            ('erin', 1, True), ('carol', 2, False), ('frank', 0, True), ('dave', 1, False),
+        ])
+        self.assertEqual(len(self.suggestions(limit=2)), 2)
+
+    def test_open_requests_are_not_suggested(self):
+        Friendship.objects.create(requester=self.carol, addressee=self.me)
+        self.assertNotIn('carol', [name for name, _, _ in self.suggestions()])
+
+    def test_graph_is_patched_by_friendship_actions(self):
+        self.suggestions()
+        pending = Friendship.objects.create(requester=self.dave, addressee=self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.bob).post(f'/api/friendships/{pending.id}/accept/')
+        self.assertIn(('dave', 2, False), self.suggestions())
+
+        friendship = Friendship.objects.get(requester=self.alice, addressee=self.carol)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.alice).delete(f'/api/friendships/{friendship.id}/')
+        self.assertIn(('carol', 1, False), self.suggestions())
+
+    def test_work_limit_truncates_high_degree_neighbourhoods(self):
+        with self.settings(FRIEND_SUGGESTIONS={'MAX_WORK': 3}):
+            response = self.client_for(self.me).get(f'/api/users/{self.me.id}/suggestions/')
+        # Only bob (two friends) fits; alice's four friends would exceed the limit
+        self.assertTrue(response.data['truncated'])
+        self.assertEqual({r['username'] for r in response.data['results']}, {'carol', 'erin', 'frank'})
+
+    def test_only_the_user_sees_their_suggestions(self):
+        response = self.client_for(self.alice).get(f'/api/users/{self.me.id}/suggestions/')
+        self.assertEqual(response.status_code, 403)
+
+
+class FeedTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.me = self.make_user('me')
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.stranger = self.make_user('stranger')
+        for friend in (self.alice, self.bob):
+            Friendship.objects.create(requester=self.me, addressee=friend, status='accepted')
+
+    def make_resource(self, user, title='Algebra Fundamentals', **kwargs):
+        # Activities are published once the upload commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().make_resource(user, title, **kwargs)
+
+    def rate(self, user, resource, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user).post(f'/api/resources/{resource.id}/rate/', data)
+
+    def feed(self, user=None, **params):
+        response = self.client_for(user or self.me).get('/api/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def titles(self, response):
+        return [(row['actor'], row['verb'], row['resource_title']) for row in response.data['results']]
+
+    def test_uploads_and_ratings_are_fanned_out_to_friends(self):
+        algebra = self.make_resource(self.alice, 'Algebra')
+        self.make_resource(self.stranger, 'Geometry')
+        self.rate(self.bob, algebra, rating=4, comment='Clear')
+        # Re-rating is not news
+        self.rate(self.bob, algebra, rating=5, comment='Clearer')
+
+        self.assertEqual(FeedEntry.objects.filter(owner=self.me).count(), 2)
+        response = self.feed()
+        self.assertEqual(self.titles(response), [('bob', 'rating', 'Algebra'), ('alice', 'upload', 'Algebra')])
+        self.assertEqual((response.data['results'][0]['rating'], response.data['results'][0]['comment']), (5, 'Clearer'))
+        self.assertIsNone(response.data['results'][1]['rating'])
+        # alice sees bob's rating only if they are friends
+        self.assertEqual(self.feed(self.alice).data['results'], [])
+
+    def test_prolific_uploaders_are_fanned_in(self):
+        with self.settings(ACTIVITY_FEED={'PROLIFIC_UPLOADS': 2}):
+            for title in ('One', 'Two', 'Three', 'Four'):
+                self.make_resource(self.alice, title)
+            self.make_resource(self.bob, 'Quiet')
+        # The window counts the upload being published, so alice is prolific from her second one
+        self.assertEqual(list(Activity.objects.filter(actor=self.alice).order_by('id')
+                              .values_list('fanned_out', flat=True)), [True, False, False, False])
+        self.assertEqual(FeedEntry.objects.filter(owner=self.me, actor=self.alice).count(), 1)
+        self.assertEqual([title for _, _, title in self.titles(self.feed())],
+                         ['Quiet', 'Four', 'Three', 'Two', 'One'])
+
+    def test_cursor_pages_through_merged_sources(self):
+        now = timezone.now()
+        with self.settings(ACTIVITY_FEED={'PROLIFIC_UPLOADS': 1}):
+            for i in range(3):
+                self.make_resource(self.alice, f'Pulled {i}')
+        self.make_resource(self.bob, 'Pushed 0')
+        self.make_resource(self.bob, 'Pushed 1')
+        # Interleave the two sources in time, with a tie that the id breaks
+        stamps = {'Pulled 0': 5, 'Pushed 0': 4, 'Pulled 1': 3, 'Pushed 1': 3, 'Pulled 2': 1}
+        for title, minutes in stamps.items():
+            created_at = now - timedelta(minutes=minutes)
+            Activity.objects.filter(resource__title=title).update(created_at=created_at)
+            FeedEntry.objects.filter(activity__resource__title=title).update(created_at=created_at)
+
+        seen = []
+        response = self.feed(page_size=2)
+        while True:
+            seen += [title for _, _, title in self.titles(response)]
+            if not response.data['next']:
+                break
+            response = self.client_for(self.me).get(response.data['next'])
+            self.assertIsNone(response.data['previous'])
+        self.assertEqual(seen, ['Pulled 2', 'Pushed 1', 'Pulled 1', 'Pushed 0', 'Pulled 0'])
+
+    def test_unfriending_drops_entries(self):
+        self.make_resource(self.alice, 'Algebra')
+        friendship = Friendship.objects.get(requester=self.me, addressee=self.alice)
+        self.client_for(self.me).delete(f'/api/friendships/{friendship.id}/')
+        self.assertFalse(FeedEntry.objects.filter(owner=self.me, actor=self.alice).exists())
+        self.assertEqual(self.feed().data['results'], [])
+
+    def test_private_profiles_hide_ratings_of_their_resources(self):
+        hidden = self.make_resource(self.stranger, 'Private notes')
+        self.rate(self.alice, hidden, rating=3)
+        self.assertEqual(len(self.feed().data['results']), 1)
+
+        self.stranger.is_private = True
+        self.stranger.save()
+        self.assertEqual(self.feed().data['results'], [])
+
+    def test_accepting_a_request_backfills_recent_activity(self):
+        self.make_resource(self.stranger, 'Older')
+        self.make_resource(self.stranger, 'Newer')
+        pending = Friendship.objects.create(requester=self.stranger, addressee=self.me)
+        self.assertEqual(self.feed().data['results'], [])
+        self.client_for(self.me).post(f'/api/friendships/{pending.id}/accept/')
+        self.assertEqual([title for _, _, title in self.titles(self.feed())], ['Newer', 'Older'])
+
+    def test_rating_publishes_after_commit(self):
+        algebra = self.make_resource(self.alice, 'Algebra')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client_for(self.bob).post(f'/api/resources/{algebra.id}/rate/', {'rating': 4})
+        # Nothing is fanned out while rate() holds the resource row lock
+        self.assertFalse(Activity.objects.filter(verb='rating').exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(FeedEntry.objects.filter(owner=self.me, activity__verb='rating').count(), 1)
+
+    def test_only_status_changes_touch_timelines(self):
+        with mock.patch('resources.feed.unlink') as unlink, mock.patch('resources.feed.backfill') as backfill:
+            pending = Friendship.objects.create(requester=self.stranger, addressee=self.me)
+            pending.save()
+            self.assertFalse(unlink.called or backfill.called)
+            self.client_for(self.me).post(f'/api/friendships/{pending.id}/accept/')
+            self.assertEqual(backfill.call_count, 1)
+            friendship = Friendship.objects.get(pk=pending.pk)
+            friendship.save()
+            self.assertFalse(unlink.called)
+            friendship.status = 'rejected'
+            friendship.save()
+            unlink.assert_called_once_with(self.stranger.id, self.me.id)
+            self.assertEqual(backfill.call_count, 1)
+
+    def test_feed_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/feed/').status_code, 401)
+
+
+@override_settings(ROOT_URLCONF='educational_resource_exchange.asgi_urls')
+class AsyncActionTests(APITestCase):
+    """async_views.py answers like the sync actions; the test client runs async views in an event loop"""
+
+    def setUp(self):
+        super().setUp()
+        self.storage = CountingStorage()
+        patcher = mock.patch.object(Resource._meta.get_field('file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.owner = self.make_user('owner')
+        self.viewer = self.make_user('viewer')
+        self.resource = self.make_resource(self.owner)
+        self.hidden = self.make_resource(self.make_user('private', is_private=True), 'Hidden')
+
+    def test_download_records_and_returns_url(self):
+        response = self.client_for(self.viewer).post(f'/api/resources/{self.resource.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'download_url': f'https://files.example.com/{self.resource.file.name}'})
+        self.assertEqual(Download.objects.filter(user=self.viewer, resource=self.resource).count(), 1)
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 1)
+
+        response = self.client_for(self.viewer).post(f'/api/resources/{self.hidden.id}/download/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(APIClient().post(f'/api/resources/{self.resource.id}/download/').status_code, 401)
+        self.assertEqual(self.client_for(self.viewer).get(f'/api/resources/{self.resource.id}/download/')
+                         .status_code, 405)
+
+    def test_create_saves_through_async_storage(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = benchmark.SlowStorage(location, latency=0)
+        data = {'title': 'Fractions', 'description': 'Halves and quarters', 'resource_type': 'worksheet',
+                'subject': 'Math', 'grade_level': '3-5',
+                'file': SimpleUploadedFile('fractions.txt', b'1/2 + 1/4')}
+        with mock.patch.object(Resource._meta.get_field('file'), 'storage', storage), \
+                mock.patch.object(storage, 'save', side_effect=AssertionError('blocking save')):
+            response = self.client_for(self.owner).post('/api/resources/', data)
+        self.assertEqual(response.status_code, 201, response.content)
+        resource = Resource.objects.get(pk=response.json()['id'])
+        self.assertEqual((resource.user, resource.title), (self.owner, 'Fractions'))
+        self.assertTrue(storage.exists(resource.file.name))
+        self.assertEqual(response.json()['file'], f'https://files.example.test/{resource.file.name}')
+
+        response = self.client_for(self.owner).post('/api/resources/', {'title': 'No file'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.json())
+        # Listing still goes to the viewset
+        self.assertEqual(self.client_for(self.owner).get('/api/resources/').status_code, 200)
+
+    def test_saved_resources_match_the_sync_action(self):
+        for resource in (self.resource, self.make_resource(self.owner, 'Geometry')):
+            SavedResource.objects.create(user=self.viewer, resource=resource)
+        url = f'/api/users/{self.viewer.id}/saved_resources/'
+        response = self.client_for(self.viewer).get(url)
+        self.assertEqual(response.status_code, 200)
+        with override_settings(ROOT_URLCONF='educational_resource_exchange.urls'):
+            expected = self.client_for(self.viewer).get(url).json()
+        self.assertEqual(response.json(), expected)
+        self.assertEqual([row['title'] for row in expected], ['Geometry', 'Algebra Fundamentals'])
+
+        self.assertEqual(self.client_for(self.owner).get(url).status_code, 403)
+        self.assertEqual(self.client_for(self.owner).get('/api/users/999999/saved_resources/').status_code, 404)
+
+
+class AsyncActionBenchmarkTests(TransactionTestCase):
+    """Runs with real commits: each benchmarked request gets its own thread and connection"""
+
+    def setUp(self):
+        friend_cache.clear()
+        file_url_cache.clear()
+        response_cache.clear()
+        token_cache.clear()
+
+    def test_compares_sync_and_async_paths(self):
+        dataset = BudgetDataset(scale=8)
+        # One client: concurrent writes to SQLite's shared in-memory test database can fail with 'table is locked'
+        results = benchmark.compare_async_actions(requests=4, concurrency=1, latency=0.001, targets=dataset)
+        self.assertEqual(set(results), {f'{route} ({mode})' for mode in ('sync', 'async') for route in
+                                        ('resource-download', 'resource-create', 'user-saved-resources')})
+        for name, result in results.items():
+            self.assertEqual((result.requests, result.errors), (4, 0), name)
+            self.assertIsNone(result.queries)
+        # Four timed uploads and one warm-up per mode
+        self.assertEqual(Resource.objects.filter(title='Benchmark upload').count(), 10)
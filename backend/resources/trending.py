@@ -0,0 +1,155 @@
+# resources/trending.py
+"""
+Trending resources.
+
+A resource's trending score is the sum of weight * 2 ** (-age / half-life)
+over its downloads and ratings. Time decays every score by the same factor,
+so TrendingScore stores each one scaled to a fixed epoch:
+
+    stored = sum(weight * exp(rate * (event_time - epoch)))
+    score(now) = stored * exp(-rate * (now - epoch))
+
+The ranking by stored value is the ranking by current score, and nothing
+has to be recomputed as time passes. refresh() reads only the Download
+and Rating rows above the id watermarks in TrendingState. It adds their
+terms to the scores of the resources they touch and advances the
+watermarks, so its cost follows the number of new events rather than the
+history.
+
+Once the epoch falls REBASE_AFTER half-lives behind, a single UPDATE
+rescales every row to a new epoch, which keeps the exponentials within
+float range. Rows that have decayed below MIN_SCORE are then dropped.
+
+Watermarks are ids rather than times. Downloads written late by the queued
+sink are still counted, with their own timestamps. A rating counts once,
+when it is created; re-rating edits the row in place and is not picked up.
+A transaction that commits a lower id after a refresh has passed it is
+missed; `refresh_trending --rebuild` replays everything.
+"""
+import math
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 72,
+    'DOWNLOAD_WEIGHT': 1.0,
+    'RATING_WEIGHT': 2.0,     # for a five-star rating; fewer stars count proportionally less
+    'BATCH_SIZE': 5000,       # events folded in per transaction
+    'REBASE_AFTER': 30,       # half-lives between epoch moves
+    'MIN_SCORE': 0.01,        # current score below which a row is dropped at a rebase
+}
+
+
+def _config(key):
+    return getattr(settings, 'TRENDING', {}).get(key, DEFAULTS[key])
+
+
+def decay_rate():
+    """Per-second decay constant for the configured half-life"""
+    return math.log(2) / (_config('HALF_LIFE_HOURS') * 3600)
+
+
+def _locked_state(now):
+    from .models import TrendingState
+    TrendingState.objects.get_or_create(pk=1, defaults={'epoch': now})
+    return TrendingState.objects.select_for_update().get(pk=1)
+
+
+def decay_factor(now=None):
+    """Multiplier turning stored scores into current scores"""
+    from .models import TrendingState
+    epoch = TrendingState.objects.filter(pk=1).values_list('epoch', flat=True).first()
+    if epoch is None:
+        return 1.0
+    now = now or timezone.now()
+    return math.exp(-decay_rate() * (now - epoch).total_seconds())
+
+
+def _add_scores(increments):
+    """Add {resource_id: amount} to the stored scores"""
+    from .models import TrendingScore
+    existing = TrendingScore.objects.in_bulk(list(increments))
+    for resource_id, row in existing.items():
+        row.score += increments[resource_id]
+    TrendingScore.objects.bulk_update(existing.values(), ['score'], batch_size=1000)
+    TrendingScore.objects.bulk_create([
+        TrendingScore(resource_id=resource_id, score=amount)
+        for resource_id, amount in increments.items() if resource_id not in existing
+    ], batch_size=1000)
+
+
+def _sources():
+    """(model, watermark on TrendingState, columns read, weight of a row) per event table"""
+    from .models import Download, Rating
+    return [
+        (Download, 'last_download_id', ('id', 'resource_id', 'downloaded_at'),
+         lambda row: _config('DOWNLOAD_WEIGHT')),
+        (Rating, 'last_rating_id', ('id', 'resource_id', 'created_at', 'rating'),
+         lambda row: _config('RATING_WEIGHT') * row[3] / 5),
+    ]
+
+
+def _fold_batch(model, watermark, columns, weight, now):
+    """Fold the next batch of one event table into the scores; returns the number of events read"""
+    with transaction.atomic():
+        state = _locked_state(now)
+        rows = list(model.objects.filter(id__gt=getattr(state, watermark))
+                    .order_by('id').values_list(*columns)[:_config('BATCH_SIZE')])
+        if not rows:
+            return 0
+        rate = decay_rate()
+        increments = defaultdict(float)
+        for row in rows:
+            increments[row[1]] += weight(row) * math.exp(rate * (row[2] - state.epoch).total_seconds())
+        _add_scores(increments)
+        setattr(state, watermark, rows[-1][0])
+        state.save(update_fields=[watermark])
+        return len(rows)
+
+
+def rebase(now=None):
+    """Rescale every stored score to a new epoch at now and drop rows that have decayed away"""
+    from .models import TrendingScore
+    now = now or timezone.now()
+    with transaction.atomic():
+        state = _locked_state(now)
+        factor = math.exp(-decay_rate() * (now - state.epoch).total_seconds())
+        TrendingScore.objects.update(score=F('score') * factor)
+        TrendingScore.objects.filter(score__lt=_config('MIN_SCORE')).delete()
+        state.epoch = now
+        state.save(update_fields=['epoch'])
+
+
+def refresh(now=None):
+    """Fold every event recorded since the last refresh into the scores; returns the number of events"""
+    from .models import TrendingState
+    now = now or timezone.now()
+    with transaction.atomic():
+        epoch = _locked_state(now).epoch
+    half_life = _config('HALF_LIFE_HOURS') * 3600
+    if (now - epoch).total_seconds() > _config('REBASE_AFTER') * half_life:
+        rebase(now)
+
+    folded = 0
+    for model, watermark, columns, weight in _sources():
+        while True:
+            count = _fold_batch(model, watermark, columns, weight, now)
+            folded += count
+            if count < _config('BATCH_SIZE'):
+                break
+    TrendingState.objects.filter(pk=1).update(refreshed_at=now)
+    return folded
+
+
+def reset(now=None):
+    """Forget every score and watermark; the next refresh() replays the whole history"""
+    from .models import TrendingScore, TrendingState
+    now = now or timezone.now()
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingState.objects.update_or_create(pk=1, defaults={
+            'epoch': now, 'last_download_id': 0, 'last_rating_id': 0, 'refreshed_at': None,
+        })
@@ -0,0 +1,179 @@
+# resources/uploads.py
+"""
+Resumable chunked uploads.
+
+A client opens an UploadSession with the file's size and the Resource
+fields, then PUTs the file in CHUNK_SIZE pieces, each with its byte offset
+and SHA-256. Chunks are streamed from the request straight into a part
+file under DIRECTORY, so a worker never holds more than one read block in
+memory. After an interruption the client asks the session for its offset
+and carries on from there. When the last byte lands the part file is
+handed to the resource storage and the Resource is created.
+
+A session left alone for EXPIRES_AFTER seconds is refused further chunks.
+purge_expired() (the purge_upload_sessions command) deletes such sessions
+together with their part files, and any part file whose session is gone.
+"""
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULTS = {
+    'DIRECTORY': os.path.join(tempfile.gettempdir(), 'edushare-uploads'),
+    'CHUNK_SIZE': 8 * 1024 * 1024,           # bytes per chunk the client must send
+    'MAX_SIZE': 2 * 1024 * 1024 * 1024,      # largest file a session may announce
+    'EXPIRES_AFTER': 24 * 60 * 60,           # seconds an idle session is kept
+}
+
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    """A chunk was rejected; status is the HTTP status to answer with"""
+
+    def __init__(self, detail, status):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _config(key):
+    return getattr(settings, 'UPLOAD_SESSIONS', {}).get(key, DEFAULTS[key])
+
+
+def max_size():
+    """Largest file, in bytes, a session may announce"""
+    return _config('MAX_SIZE')
+
+
+def chunk_size():
+    """Bytes per chunk new sessions ask the client for"""
+    return _config('CHUNK_SIZE')
+
+
+def part_path(session):
+    return os.path.join(_config('DIRECTORY'), f'{session.pk}.part')
+
+
+def _expiry_cutoff():
+    return timezone.now() - timedelta(seconds=_config('EXPIRES_AFTER'))
+
+
+def is_expired(session):
+    return session.updated_at < _expiry_cutoff()
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_chunk(session, offset, stream, length, checksum):
+    """
+    Append length bytes from stream at offset, verifying the chunk's SHA-256.
+    The session must be locked (select_for_update) by the caller.
+    """
+    if session.status != 'active':
+        raise UploadError('This upload is already complete', 409)
+    if offset != session.offset:
+        raise UploadError(f'Expected offset {session.offset}', 409)
+    remaining = session.size - offset
+    if length > remaining or (length != session.chunk_size and length != remaining):
+        raise UploadError(f'Chunks must be {session.chunk_size} bytes except the last', 400)
+
+    os.makedirs(_config('DIRECTORY'), exist_ok=True)
+    path = part_path(session)
+    digest = hashlib.sha256()
+    received = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as handle:
+        handle.seek(offset)
+        while received < length:
+            block = stream.read(min(READ_BLOCK, length - received))
+            if not block:
+                break
+            handle.write(block)
+            digest.update(block)
+            received += len(block)
+        if received != length or (checksum and digest.hexdigest() != checksum.lower()):
+            # Drop the partial chunk so the client can resend it from the same offset
+            handle.truncate(offset)
+            if received != length:
+                raise UploadError('The chunk was cut short', 400)
+            raise UploadError('Chunk checksum does not match', 400)
+
+    session.offset = offset + length
+    session.save(update_fields=['offset', 'updated_at'])
+
+
+def complete(session):
+    """Verify the assembled file and create its Resource; the session must be locked"""
+    from .models import Resource
+    path = part_path(session)
+    if session.sha256 and _hash_file(path) != session.sha256.lower():
+        # The file cannot be trusted: start over rather than resume
+        os.remove(path)
+        session.offset = 0
+        session.save(update_fields=['offset', 'updated_at'])
+        raise UploadError('File checksum does not match; the upload was reset', 400)
+
+    with open(path, 'rb') as handle, transaction.atomic():
+        # FileField hands the open file to storage, which copies it in chunks
+        resource = Resource.objects.create(
+            user=session.user, file=File(handle, name=session.filename), **session.resource_data
+        )
+        session.status = 'complete'
+        session.resource = resource
+        session.save(update_fields=['status', 'resource', 'updated_at'])
+    os.remove(path)
+    return resource
+
+
+def _remove_part(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard(session):
+    _remove_part(part_path(session))
+    session.delete()
+
+
+def purge_expired():
+    """Delete expired sessions and stray part files; returns (sessions, files) removed"""
+    from .models import UploadSession
+    cutoff = _expiry_cutoff()
+    with transaction.atomic():
+        # Skip a session that is receiving a chunk right now
+        expired = list(UploadSession.objects.select_for_update(skip_locked=True)
+                       .filter(updated_at__lt=cutoff).values_list('pk', flat=True))
+        for pk in expired:
+            _remove_part(os.path.join(_config('DIRECTORY'), f'{pk}.part'))
+        UploadSession.objects.filter(pk__in=expired).delete()
+
+    # Parts left behind by sessions deleted some other way, e.g. with their user
+    directory = _config('DIRECTORY')
+    stale = {}
+    for name in (os.listdir(directory) if os.path.isdir(directory) else []):
+        path = os.path.join(directory, name)
+        try:
+            pk = uuid.UUID(name.removesuffix('.part'))
+        except ValueError:
+            continue
+        if name.endswith('.part') and os.path.getmtime(path) < cutoff.timestamp():
+            stale[pk] = path
+    known = set(UploadSession.objects.filter(pk__in=stale).values_list('pk', flat=True))
+    orphans = [path for pk, path in stale.items() if pk not in known]
+    for path in orphans:
+        _remove_part(path)
+    return len(expired), len(orphans)
@@ -1,18 +1,29 @@
 # resources/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, ResourceViewSet, FriendshipViewSet, DownloadViewSet
+from .views import UserViewSet, ResourceViewSet, FriendshipViewSet, DownloadViewSet, UploadSessionViewSet, FeedViewSet
 from .auth import CustomAuthToken
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'resources', ResourceViewSet)
 router.register(r'friendships', FriendshipViewSet)
 router.register(r'downloads', DownloadViewSet, basename="downloads")
+router.register(r'uploads', UploadSessionViewSet, basename="uploads")
+router.register(r'feed', FeedViewSet, basename="feed")
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/login/', CustomAuthToken.as_view(), name='auth-login'),
 ]
 
-urlpatterns.append(path('downloads/clear/', DownloadViewSet.as_view({'delete': 'clear'}), name='downloads-clear'))
\ No newline at end of file
+urlpatterns.append(path('downloads/clear/', DownloadViewSet.as_view({'delete': 'clear'}), name='downloads-clear'))
+
+# Async-native versions of the actions that wait on storage. asgi_urls.py puts them ahead
+# of the router when ASYNC_ACTIONS is on (see async_views.py)
+async_urlpatterns = [
+    path('resources/', async_views.ResourceCollectionView.as_view()),
+    path('resources/<int:pk>/download/', async_views.ResourceDownloadView.as_view()),
+    path('users/<int:pk>/saved_resources/', async_views.SavedResourcesView.as_view()),
+]
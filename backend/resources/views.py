@@ -1,37 +1,145 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, mixins, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
-from .models import User, Resource, Rating, Download, Friendship
+from django.urls import reverse
+from .models import User, Resource, Rating, Download, Friendship, SavedResource, UploadSession, Activity
 from .serializers import (
     UserSerializer, ResourceSerializer, RatingSerializer, 
-    DownloadSerializer, FriendshipSerializer
+    DownloadSerializer, FriendshipSerializer, UploadSessionSerializer, ActivitySerializer
 )
 from .permissions import IsOwnerOrFriendIfPrivate, IsOwnerOrReadOnly
-from django.conf import settings  # To access settings.DEBUG and Cloudinary config
-import cloudinary.utils
+from .pagination import KeysetPagination, DownloadKeysetPagination, KeysetListMixin, MergedKeysetPagination
+from .search import FullTextSearchFilter, RANK_ORDERING
+from .friends import friend_cache, get_friend_ids
+from .social_graph import suggest_friends
+from .counters import increment_download_count, increment_download_counts
+from .events import get_download_sink
+from .file_urls import file_url, resolve_many
+from .storage import serves_locally
+from .streaming import check_link, serve_file, sign_link
+from . import feed, trending, uploads
+from .file_urls import file_url_cache
+from .response_cache import response_cache
+from .conditional import (
+    conditional_list, conditional_object, rating_state, resource_state, user_state
+)
+from django.conf import settings  # To access settings.DEBUG
 import os
-import cloudinary.uploader
 import logging
 
 logger = logging.getLogger(__name__)
 
-class UserViewSet(viewsets.ModelViewSet):
+# Most ids one bulk request may name
+MAX_BULK_IDS = 100
+
+# Default and largest number of resources a ranking endpoint returns
+DEFAULT_RANKING_LIMIT = 20
+MAX_RANKING_LIMIT = 100
+
+
+def ranking_limit(raw):
+    if raw is None:
+        return DEFAULT_RANKING_LIMIT
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError({'limit': 'Must be an integer'})
+    if not 1 <= limit <= MAX_RANKING_LIMIT:
+        raise ValidationError({'limit': f'Must be between 1 and {MAX_RANKING_LIMIT}'})
+    return limit
+
+
+def requested_ids(raw):
+    """Resource ids from a JSON list or a comma-separated string, in order, duplicates dropped"""
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, (list, tuple)) or not raw:
+        raise ValidationError({'ids': 'Provide a non-empty list of resource ids'})
+    if len(raw) > MAX_BULK_IDS:
+        raise ValidationError({'ids': f'At most {MAX_BULK_IDS} ids per request'})
+    try:
+        ids = [int(value) for value in raw]
+    except (TypeError, ValueError):
+        raise ValidationError({'ids': 'Resource ids must be integers'})
+    return list(dict.fromkeys(ids))
+
+
+def _subquery_total(queryset, group_field, aggregate):
+    """Correlated subquery returning one aggregate for the outer row, or 0"""
+    grouped = queryset.order_by().values(group_field).annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(grouped, output_field=IntegerField()), 0)
+
+
+def annotate_user_stats(queryset):
+    """
+    Annotate the statistics UserSerializer shows (upload count, received rating
+    totals and friend count) so a page of users costs one query instead of three per user
+    """
+    user_resources = Resource.objects.filter(user=OuterRef('pk'))
+    accepted = Friendship.objects.filter(status='accepted')
+    return queryset.annotate(
+        total_uploads=_subquery_total(user_resources, 'user', Count('id')),
+        received_rating_count=_subquery_total(user_resources, 'user', Sum('rating_count')),
+        received_rating_sum=_subquery_total(user_resources, 'user', Sum('rating_sum')),
+        friend_count=(
+            _subquery_total(accepted.filter(requester=OuterRef('pk')), 'requester', Count('id')) +
+            _subquery_total(accepted.filter(addressee=OuterRef('pk')), 'addressee', Count('id'))
+        ),
+    )
+
+
+def visible_resources(user, friend_ids):
+    """Resources of public users, the user's own and their friends'"""
+    return Resource.objects.filter(
+        Q(user__is_private=False) |               # Resources from public users
+        Q(user=user) |                            # User's own resources
+        Q(user_id__in=friend_ids)                 # Resources from friends
+    )
+
+
+def annotate_viewer_state(queryset, user):
+    """
+    Annotate whether the viewer saved each resource and how they rated it, so
+    ResourceSerializer renders bookmark and rating state without per-row queries
+    """
+    return queryset.annotate(
+        is_saved=Exists(SavedResource.objects.filter(user_id=user.pk, resource=OuterRef('pk'))),
+        my_rating=Subquery(
+            Rating.objects.filter(user_id=user.pk, resource=OuterRef('pk')).values('rating')[:1]
+        ),
+    )
+
+
+class UserViewSet(KeysetListMixin, viewsets.ModelViewSet):
     """
     API endpoint for users
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['username', 'email', 'institution']
     
+    def get_queryset(self):
+        return annotate_user_stats(User.objects.all())
+    
     def get_permissions(self):
         if self.action == 'create':
             return [permissions.AllowAny()]
         return super().get_permissions()
     
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        return conditional_object(request, user, user_state,
+                                  lambda: Response(self.get_serializer(user).data))
+    
     @action(detail=True, methods=['get'])
     def resources(self, request, pk=None):
         """Get resources uploaded by a user"""
@@ -44,9 +152,11 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        resources = Resource.objects.filter(user=user)
-        serializer = ResourceSerializer(resources, many=True)
-        return Response(serializer.data)
+        resources = list(annotate_viewer_state(
+            Resource.objects.filter(user=user).select_related('user'), request.user
+        ))
+        return conditional_list(request, resources, resource_state,
+                                lambda: Response(ResourceSerializer(resources, many=True).data))
     
     @action(detail=True, methods=['get'])
     def ratings(self, request, pk=None):
@@ -60,9 +170,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        ratings = Rating.objects.filter(user=user)
-        serializer = RatingSerializer(ratings, many=True)
-        return Response(serializer.data)
+        ratings = Rating.objects.filter(user=user).select_related('user', 'resource')
+        return self.keyset_response(ratings, RatingSerializer, state_func=rating_state)
     
     @action(detail=True, methods=['get'])
     def downloads(self, request, pk=None):
@@ -76,9 +185,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        downloads = Download.objects.filter(user=user)
-        serializer = DownloadSerializer(downloads, many=True)
-        return Response(serializer.data)
+        downloads = Download.objects.filter(user=user).select_related('user', 'resource__user')
+        return self.keyset_response(downloads, DownloadSerializer, DownloadKeysetPagination)
     
     @action(detail=True, methods=['get'])
     def friends(self, request, pk=None):
@@ -92,23 +200,32 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        # Get all accepted friendships
-        friendships = Friendship.objects.filter(
-            (Q(requester=user) | Q(addressee=user)),
-            status='accepted'
-        )
-        
-        # Extract the friend user objects
-        friends = []
-        for friendship in friendships:
-            if friendship.requester == user:
-                friends.append(friendship.addressee)
-            else:
-                friends.append(friendship.requester)
+        # Friends come from the cached accepted-friend set, in either direction
+        friends = annotate_user_stats(User.objects.filter(id__in=get_friend_ids(user.id)))
                 
         serializer = UserSerializer(friends, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def suggestions(self, request, pk=None):
+        """People the user may know, by mutual friends and shared institution (see social_graph.py)"""
+        user = self.get_object()
+        if request.user.id != user.id:
+            return Response(
+                {"detail": "You cannot view another user's suggestions"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        ranked, truncated = suggest_friends(user, ranking_limit(request.query_params.get('limit')))
+        users = annotate_user_stats(User.objects.filter(id__in=[c for c, _, _ in ranked])).in_bulk()
+        data = []
+        for candidate, mutual, shared_institution in ranked:
+            if candidate in users:
+                row = UserSerializer(users[candidate]).data
+                row['mutual_friends'] = mutual
+                row['shared_institution'] = shared_institution
+                data.append(row)
+        return Response({'results': data, 'truncated': truncated})
+    
     @action(detail=True, methods=['get'])
     def saved_resources(self, request, pk=None):
         """Get resources saved by a user"""
@@ -121,16 +238,17 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        saved_ids = SavedResource.objects.filter(user=user).values_list('resource_id', flat=True)
-        resources = Resource.objects.filter(id__in=saved_ids)
+        # One join, most recently saved first
+        resources = annotate_viewer_state(
+            Resource.objects.filter(saved_by__user=user).select_related('user'), user
+        ).order_by('-saved_by__saved_at', '-saved_by__id')
         
         serializer = ResourceSerializer(resources, many=True)
         return Response(serializer.data)
 
 
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Resource, SavedResource
-# Make sure to import DjangoFilterBackend and the new SavedResource model
+# Make sure to import DjangoFilterBackend
 
 class ResourceViewSet(viewsets.ModelViewSet):
     """
@@ -139,8 +257,8 @@ class ResourceViewSet(viewsets.ModelViewSet):
     queryset = Resource.objects.all()
     serializer_class = ResourceSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
-    search_fields = ['title', 'description', 'subject', 'grade_level', 'resource_type']
+    pagination_class = KeysetPagination
+    filter_backends = [FullTextSearchFilter, DjangoFilterBackend]
     filterset_fields = ['subject', 'grade_level', 'resource_type']  # Add this line
 
     def get_queryset(self):
@@ -152,39 +270,182 @@ class ResourceViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         
-        # Get the user's friends (users with accepted friendship)
-        friends = User.objects.filter(
-            Q(friendship_requests_sent__addressee=user, friendship_requests_sent__status='accepted') |
-            Q(friendship_requests_received__requester=user, friendship_requests_received__status='accepted')
-        ).distinct()
-        
         # Return filtered resources
-        return Resource.objects.filter(
-            Q(user__is_private=False) |  # Resources from public users
-            Q(user=user) |              # User's own resources
-            Q(user__in=friends)         # Resources from friends
+        return annotate_viewer_state(
+            visible_resources(user, get_friend_ids(user.id)).select_related('user'), user
+        )
+    
+    def get_keyset_ordering(self, queryset):
+        """Page search results by relevance instead of recency"""
+        if 'search_rank' in queryset.query.annotations:
+            return RANK_ORDERING
+        return None
+    
+    def visibility_partitions(self):
+        user = self.request.user
+        return response_cache.partitions_for(user, get_friend_ids(user.id))
+    
+    def personalize(self, data):
+        """Replace a cached response's is_saved/my_rating with this viewer's; returns (data, state)"""
+        rows = data if isinstance(data, list) else data.get('results', [data])
+        ids = [row['id'] for row in rows]
+        state = {}
+        if ids:
+            viewer_rows = annotate_viewer_state(Resource.objects.filter(id__in=ids), self.request.user)
+            state = {pk: (saved, rating)
+                     for pk, saved, rating in viewer_rows.values_list('id', 'is_saved', 'my_rating')}
+        for row in rows:
+            row['is_saved'], row['my_rating'] = state.get(row['id'], (False, None))
+        return data, tuple(sorted(state.items()))
+    
+    def list(self, request, *args, **kwargs):
+        return response_cache.fetch(request, self.visibility_partitions(), self._uncached_list,
+                                    self.personalize)
+    
+    def _uncached_list(self):
+        request = self.request
+        if 'ids' in request.query_params:
+            return self._lookup_ids(requested_ids(request.query_params['ids']))
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        def build():
+            serializer = self.get_serializer(rows, many=True)
+            if page is None:
+                return Response(serializer.data)
+            return self.get_paginated_response(serializer.data)
+
+        return conditional_list(request, rows, resource_state, build,
+                                self.paginator if page is not None else None)
+    
+    def _lookup_ids(self, ids):
+        """GET ?ids=1,2,3: the visible resources among ids, in the order asked for"""
+        found = self.get_queryset().in_bulk(ids)
+        rows = [found[pk] for pk in ids if pk in found]
+        return conditional_list(self.request, rows, resource_state, lambda: Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'not_found': [pk for pk in ids if pk not in found],
+        }))
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Visible resources ranked by time-decayed downloads and ratings (see trending.py)"""
+        queryset = self.get_queryset().filter(trending__isnull=False)
+        for field in ('subject', 'grade_level'):
+            value = request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        resources = list(
+            queryset.annotate(trending_score=F('trending__score'))
+            .order_by('-trending__score', '-id')[:ranking_limit(request.query_params.get('limit'))]
+        )
+        factor = trending.decay_factor()
+        data = self.get_serializer(resources, many=True).data
+        for row, resource in zip(data, resources):
+            row['trending_score'] = round(resource.trending_score * factor, 4)
+        return Response({'results': data})
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Visible resources most often downloaded by the same users (see similarity.py)"""
+        resource = self.get_object()
+        resources = list(
+            self.get_queryset().filter(neighbour_of__resource=resource)
+            .annotate(similarity=F('neighbour_of__score'))
+            .order_by('neighbour_of__rank')[:ranking_limit(request.query_params.get('limit'))]
         )
+        data = self.get_serializer(resources, many=True).data
+        for row, neighbour in zip(data, resources):
+            row['similarity'] = round(neighbour.similarity, 4)
+        return Response({'results': data})
+    
+    def retrieve(self, request, *args, **kwargs):
+        return response_cache.fetch(request, self.visibility_partitions(), self._uncached_retrieve,
+                                    self.personalize)
+    
+    def _uncached_retrieve(self):
+        resource = self.get_object()
+        return conditional_object(self.request, resource, resource_state,
+                                  lambda: Response(self.get_serializer(resource).data))
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss counters of this process's caches"""
+        return Response({
+            'responses': response_cache.stats(),
+            'friend_sets': {'hits': friend_cache.hits, 'misses': friend_cache.misses},
+            'file_urls': {'hits': file_url_cache.hits, 'misses': file_url_cache.misses},
+        })
         
     def perform_create(self, serializer):
-        resource = serializer.save(user=self.request.user)
-        print(f"FILE URL: {resource.file.url}")  # Check this appears
+        serializer.save(user=self.request.user)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def download(self, request, pk=None):
         """Download a resource and track it"""
         resource = self.get_object()
         
-        # Create download record
-        Download.objects.create(user=request.user, resource=resource)
+        # Record the download (inline or queued, see events.py)
+        get_download_sink().record(request.user.id, resource.id)
         
-        # Increment download count
-        resource.download_count += 1
-        resource.save()
+        # Increment download count atomically (or buffer it, see counters.py)
+        increment_download_count(resource.pk)
         
-        # Return download URL
         return Response({
-            'download_url': resource.file.url
+            'download_url': self._download_url(resource)
         })
+
+    def _download_url(self, resource):
+        # Local files are streamed by the file action through a signed link, since the
+        # browser opens the URL without the API token
+        if serves_locally(resource.file.storage):
+            url = reverse('resource-file', kwargs={'pk': resource.pk})
+            return self.request.build_absolute_uri(f'{url}?token={sign_link(resource)}')
+        return file_url(resource.file)
+
+    def _bulk_ids(self):
+        data = self.request.data
+        raw = ','.join(data.getlist('ids')) if hasattr(data, 'getlist') else data.get('ids')
+        return requested_ids(raw)
+
+    def _visible_ids(self, ids):
+        return set(self.get_queryset().filter(id__in=ids).values_list('id', flat=True))
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_download(self, request):
+        """Record a download of each visible resource in ids and return their download URLs"""
+        ids = self._bulk_ids()
+        with transaction.atomic():
+            found = self.get_queryset().in_bulk(ids)
+            visible = [pk for pk in ids if pk in found]
+            get_download_sink().record_many(request.user.id, visible)
+            increment_download_counts(visible)
+        resolve_many([found[pk].file for pk in visible])
+        return Response({'results': [
+            {'id': pk, 'status': 'recorded', 'download_url': self._download_url(found[pk])}
+            if pk in found else {'id': pk, 'status': 'not_found'}
+            for pk in ids
+        ]})
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def file(self, request, pk=None):
+        """Stream a locally stored file (signed link or authenticated request)"""
+        token = request.query_params.get('token')
+        if token:
+            resource = get_object_or_404(Resource, pk=pk)
+            if not check_link(token, resource):
+                return Response({"detail": "This download link is invalid or has expired"},
+                                status=status.HTTP_403_FORBIDDEN)
+        elif request.user.is_authenticated:
+            resource = self.get_object()
+        else:
+            return Response({"detail": "Authentication credentials were not provided."},
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+        if not serves_locally(resource.file.storage):
+            return HttpResponseRedirect(file_url(resource.file))
+        return serve_file(request, resource.file)
         
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def rate(self, request, pk=None):
@@ -215,15 +476,23 @@ class ResourceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Create or update rating
-        rating, created = Rating.objects.update_or_create(
-            user=request.user,
-            resource=resource,
-            defaults={
-                'rating': rating_value,
-                'comment': request.data.get('comment', '')
-            }
-        )
+        with transaction.atomic():
+            # Lock the resource row so concurrent ratings apply their deltas one at a time
+            Resource.objects.select_for_update().only('id').get(pk=resource.pk)
+            previous = Rating.objects.filter(
+                user=request.user, resource=resource
+            ).values_list('rating', flat=True).first()
+            
+            # Create or update rating
+            rating, created = Rating.objects.update_or_create(
+                user=request.user,
+                resource=resource,
+                defaults={
+                    'rating': rating_value,
+                    'comment': request.data.get('comment', '')
+                }
+            )
+            resource.apply_rating_change(previous, rating_value)
         
         serializer = RatingSerializer(rating)
         return Response(serializer.data)
@@ -232,9 +501,9 @@ class ResourceViewSet(viewsets.ModelViewSet):
     def ratings(self, request, pk=None):
         """Get ratings for a resource"""
         resource = self.get_object()
-        ratings = Rating.objects.filter(resource=resource)
-        serializer = RatingSerializer(ratings, many=True)
-        return Response(serializer.data)
+        ratings = list(Rating.objects.filter(resource=resource).select_related('user', 'resource'))
+        return conditional_list(request, ratings, rating_state,
+                                lambda: Response(RatingSerializer(ratings, many=True).data))
         
     # Add these new actions for saving/unsaving resources
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -273,6 +542,40 @@ class ResourceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_save(self, request):
+        """Save every visible resource in ids for the current user"""
+        ids = self._bulk_ids()
+        with transaction.atomic():
+            visible = self._visible_ids(ids)
+            saved = set(SavedResource.objects.filter(user=request.user, resource_id__in=visible)
+                        .values_list('resource_id', flat=True))
+            SavedResource.objects.bulk_create(
+                [SavedResource(user=request.user, resource_id=pk) for pk in ids if pk in visible - saved],
+                ignore_conflicts=True,
+            )
+        return Response({'results': [
+            {'id': pk, 'status': 'not_found' if pk not in visible else
+             'already_saved' if pk in saved else 'saved'}
+            for pk in ids
+        ]})
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_unsave(self, request):
+        """Remove every visible resource in ids from the current user's saved resources"""
+        ids = self._bulk_ids()
+        with transaction.atomic():
+            visible = self._visible_ids(ids)
+            saved = SavedResource.objects.filter(user=request.user, resource_id__in=visible)
+            removed = set(saved.values_list('resource_id', flat=True))
+            if removed:
+                saved.filter(resource_id__in=removed).delete()
+        return Response({'results': [
+            {'id': pk, 'status': 'not_found' if pk not in visible else
+             'unsaved' if pk in removed else 'not_saved'}
+            for pk in ids
+        ]})
+
 
 class FriendshipViewSet(viewsets.ModelViewSet):
     """
@@ -285,7 +588,9 @@ class FriendshipViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Only show friendships relevant to the current user"""
         user = self.request.user
-        return Friendship.objects.filter(Q(requester=user) | Q(addressee=user))
+        return Friendship.objects.filter(
+            Q(requester=user) | Q(addressee=user)
+        ).select_related('requester', 'addressee')
     
     def perform_create(self, serializer):
         """Create a new friendship request"""
@@ -364,9 +669,10 @@ class FriendshipViewSet(viewsets.ModelViewSet):
 class DownloadViewSet(viewsets.ModelViewSet):
     serializer_class = DownloadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DownloadKeysetPagination
 
     def get_queryset(self):
-        return Download.objects.filter(user=self.request.user)
+        return Download.objects.filter(user=self.request.user).select_related('user', 'resource__user')
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -383,4 +689,72 @@ class DownloadViewSet(viewsets.ModelViewSet):
     def clear(self, request):
         """Delete all download records for the current user"""
         Download.objects.filter(user=request.user).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FeedViewSet(viewsets.GenericViewSet):
+    """Uploads and ratings of the current user's friends, newest first (see feed.py)"""
+    serializer_class = ActivitySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MergedKeysetPagination
+
+    def list(self, request):
+        friend_ids = get_friend_ids(request.user.id)
+        paginator = self.pagination_class()
+        rows = paginator.paginate_rows(
+            request, lambda after, limit: feed.read(request.user, friend_ids, after, limit), Activity
+        )
+        return paginator.get_paginated_response(self.get_serializer(rows, many=True).data)
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads: POST opens a session, PUT sends one chunk with
+    Upload-Offset and Upload-Checksum ("sha256 <hex>") headers, GET reports
+    the offset to resume from and DELETE abandons the upload.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def update(self, request, pk=None):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({"detail": "Upload-Offset and Content-Length headers are required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        algorithm, _, checksum = request.headers.get('Upload-Checksum', '').partition(' ')
+        if algorithm and algorithm.lower() != 'sha256':
+            return Response({"detail": "Only sha256 checksums are supported"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # The lock keeps a retried chunk from being written twice at once
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if uploads.is_expired(session):
+                return Response({"detail": "This upload session has expired"}, status=status.HTTP_410_GONE)
+            try:
+                # Read the raw body as a stream; request.data would load the whole chunk
+                uploads.write_chunk(session, offset, request.stream, length, checksum)
+                resource = uploads.complete(session) if session.offset == session.size else None
+            except uploads.UploadError as error:
+                response = Response({"detail": error.detail}, status=error.status)
+                response['Upload-Offset'] = str(session.offset)
+                return response
+
+        if resource is not None:
+            return Response(ResourceSerializer(resource, context={'request': request}).data,
+                            status=status.HTTP_201_CREATED)
+        response = Response(UploadSessionSerializer(session).data)
+        response['Upload-Offset'] = str(session.offset)
+        return response
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
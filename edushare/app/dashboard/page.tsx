@@ -98,8 +98,8 @@ export default function DashboardPage() {
         const [userRes, uploadsRes, downloadsRes, ratingsGivenRes, friendsRes] = await Promise.all([
           fetch(`${config.apiUrl}/api/users/${userId}/`, { headers }),
           fetch(`${config.apiUrl}/api/users/${userId}/resources/`, { headers }),
-          fetch(`${config.apiUrl}/api/users/${userId}/downloads/`, { headers }),
-          fetch(`${config.apiUrl}/api/users/${userId}/ratings/`, { headers }),
+          fetch(`${config.apiUrl}/api/users/${userId}/downloads/?paginate=false`, { headers }),
+          fetch(`${config.apiUrl}/api/users/${userId}/ratings/?paginate=false`, { headers }),
           fetch(`${config.apiUrl}/api/friendships/`, { headers }),
         ]);
 
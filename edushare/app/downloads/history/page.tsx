@@ -89,7 +89,7 @@ export default function DownloadsHistoryPage() {
 
     try {
       // Fetch all downloads for the user
-      const response = await fetch(`${config.apiUrl}/api/users/${userId}/downloads/`, { headers })
+      const response = await fetch(`${config.apiUrl}/api/users/${userId}/downloads/?paginate=false`, { headers })
 
       if (!response.ok) {
         throw new Error("Failed to fetch downloads")
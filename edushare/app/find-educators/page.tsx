@@ -48,10 +48,11 @@ export default function FindEducatorsPage() {
     }
     
     try {
-      let endpoint = `${config.apiUrl}/api/users/`
+      // The API paginates by cursor now; keep the full list until this page uses cursors
+      let endpoint = `${config.apiUrl}/api/users/?paginate=false`
       
       if (searchQuery) {
-        endpoint += `?search=${encodeURIComponent(searchQuery)}`
+        endpoint += `&search=${encodeURIComponent(searchQuery)}`
       }
       
       const response = await fetch(endpoint, {
@@ -236,7 +236,7 @@ export default function UserProfilePage() {
           setUploadedResources(resourcesData);
         }
         
-        const ratingsRes = await fetch(`${config.apiUrl}/api/users/${profileUserId}/ratings/`, { headers });
+        const ratingsRes = await fetch(`${config.apiUrl}/api/users/${profileUserId}/ratings/?paginate=false`, { headers });
         if (ratingsRes.ok) {
           const ratingsData = await ratingsRes.json();
           setRatingsGiven(ratingsData);
@@ -244,7 +244,7 @@ export default function UserProfilePage() {
         
         if (viewingOwnProfile) {
           try {
-            const downloadsRes = await fetch(`${config.apiUrl}/api/users/${profileUserId}/downloads/`, { headers });
+            const downloadsRes = await fetch(`${config.apiUrl}/api/users/${profileUserId}/downloads/?paginate=false`, { headers });
             if (downloadsRes.ok) {
               const downloadsData = await downloadsRes.json();
               setDownloadedResources(downloadsData);
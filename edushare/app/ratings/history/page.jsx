@@ -69,7 +69,7 @@ export default function RatingsHistoryPage() {
 
     try {
       // Fetch all ratings for the user
-      const response = await fetch(`${config.apiUrl}/api/users/${userId}/ratings/`, { headers })
+      const response = await fetch(`${config.apiUrl}/api/users/${userId}/ratings/?paginate=false`, { headers })
 
       if (!response.ok) {
         throw new Error("Failed to fetch ratings")
@@ -55,6 +55,8 @@ export default function ResourcesPage( { defaultTab = "browse"}) {
     try {
       // Build query parameters for filtering
       let queryParams = new URLSearchParams()
+      // The API paginates by cursor now; keep the full list until this page uses cursors
+      queryParams.append("paginate", "false")
       
       if (searchQuery) {
         queryParams.append("search", searchQuery)